@@ -0,0 +1,215 @@
+"""
+End-to-end load test of the engine API: a scripted mix of requests replayed by concurrent clients, reported
+as throughput and latency percentiles (p50/p95/p99) per endpoint
+
+The mix is built from the bundled areas (geojson/areas/*.geojson):
+    names       GET /geojson-names
+    geojson     GET /geojson?name=<area>, half of them simplified to a random ?zoom=
+    example     GET /opt-placement-example
+    optimise    POST /optimise-polygon-coverage of an area with --optimise-options
+
+Each of --concurrency clients sends its next request as soon as its last one is answered. The requests,
+their order and their areas are drawn from --seed, so a run replays the same script as the last one with
+the same arguments. Optimisations get distinct coverage requirements (a millionth apart) so each one is
+solved rather than answered from the result cache, unless --allow-cached.
+
+By default the app runs in this process, on the harness's event loop through httpx's ASGI transport (its
+sync endpoints and optimisations in the same thread pool as under uvicorn). With --url the requests go to a
+running server instead. Run from the engine directory:
+
+    python benchmarks/loadtest.py --concurrency 8 --requests 200 --output loadtest.json
+    uvicorn main:app --workers 4 & python benchmarks/loadtest.py --url http://localhost:8000 --duration-s 60
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import time
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+
+import httpx
+import numpy as np
+
+AREAS_DIR = os.path.join(ENGINE_DIR, "geojson", "areas")
+DEFAULT_MIX = "names=4,geojson=4,example=2,optimise=1"
+ZOOMS = (2, 4, 6, 8)
+PERCENTILES = (50, 95, 99)
+REQUIREMENT_STEP = 1e-6  # between the coverage requirements of successive optimisations
+
+
+def bundled_areas():
+    """ (name, FeatureCollection) of each bundled area file """
+    areas = []
+    for path in sorted(glob.glob(os.path.join(AREAS_DIR, "*.geojson"))):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("type") == "GeometryCollection":
+            data = {"type": "FeatureCollection", "features": [{"type": "Feature", "properties": {}, "geometry": g} for g in data["geometries"]]}
+        areas.append((os.path.splitext(os.path.basename(path))[0], data))
+    return areas
+
+
+def parse_mix(mix):
+    """ 'kind=weight,...' as {kind: weight} """
+    weights = {}
+    for part in mix.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in ("names", "geojson", "example", "optimise"):
+            raise ValueError(f"unknown request kind '{kind}'")
+        weights[kind.strip()] = float(weight or 1)
+    return weights
+
+
+class Script:
+    """ the seeded sequence of requests: (endpoint label, method, path, params, JSON body) """
+
+    def __init__(self, areas, weights, optimise_options, allow_cached, seed):
+        self.areas = areas
+        self.kinds, self.weights = list(weights), list(weights.values())
+        self.optimise_options = optimise_options
+        self.allow_cached = allow_cached
+        self.rng = random.Random(seed)
+        self.optimisations = 0
+
+    def request(self, kind):
+        name, area = self.rng.choice(self.areas)
+        if kind == "names":
+            return "GET /geojson-names", "GET", "/geojson-names", None, None
+        if kind == "geojson":
+            params = {"name": name}
+            if self.rng.random() < 0.5:
+                params["zoom"] = self.rng.choice(ZOOMS)
+            return "GET /geojson", "GET", "/geojson", params, None
+        if kind == "example":
+            return "GET /opt-placement-example", "GET", "/opt-placement-example", None, None
+        options = dict(self.optimise_options)
+        if not self.allow_cached:
+            options["coverage_requirement"] = options.get("coverage_requirement", 0.70) - self.optimisations * REQUIREMENT_STEP
+        self.optimisations += 1
+        return "POST /optimise-polygon-coverage", "POST", "/optimise-polygon-coverage", None, dict(area, options=options)
+
+    def __next__(self):
+        return self.request(self.rng.choices(self.kinds, self.weights)[0])
+
+    def warmup(self):
+        """ one request of each kind in the mix, not measured """
+        return [self.request(kind) for kind in self.kinds]
+
+
+async def run_clients(client, script, concurrency, num_requests, duration_s):
+    """ (label, status code or None on a transport error, seconds, finished at) of every measured request """
+    samples = []
+    issued = 0
+    deadline = None if duration_s is None else time.perf_counter() + duration_s
+
+    def next_request():
+        nonlocal issued
+        if (num_requests is not None and issued >= num_requests) or (deadline is not None and time.perf_counter() >= deadline):
+            return None
+        issued += 1
+        return next(script)
+
+    async def client_loop():
+        while (request := next_request()) is not None:
+            label, method, path, params, body = request
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, path, params=params, json=body)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            samples.append((label, status, time.perf_counter() - start, time.perf_counter()))
+
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return samples
+
+
+def summarise(samples, elapsed):
+    """ per endpoint (and overall) request and error counts, throughput and latency percentiles in ms """
+    def stats(rows):
+        latencies = np.array([seconds for _, _, seconds, _ in rows]) * 1000
+        statuses = {}
+        for _, status, _, _ in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        return {
+            "requests": len(rows),
+            "errors": sum(1 for _, status, _, _ in rows if status is None or status >= 400),
+            "statuses": statuses,
+            "throughputPerS": round(len(rows) / elapsed, 3) if elapsed > 0 else None,
+            "meanMs": round(float(latencies.mean()), 2),
+            **{f"p{p}Ms": round(float(np.percentile(latencies, p)), 2) for p in PERCENTILES},
+            "maxMs": round(float(latencies.max()), 2),
+        }
+
+    endpoints = {}
+    for label in sorted({label for label, _, _, _ in samples}):
+        endpoints[label] = stats([row for row in samples if row[0] == label])
+    return {"endpoints": endpoints, "overall": stats(samples) if samples else None}
+
+
+async def run(args):
+    areas = bundled_areas()
+    if not areas:
+        raise SystemExit(f"no area files in {AREAS_DIR}")
+    script = Script(areas, parse_mix(args.mix), json.loads(args.optimise_options), args.allow_cached, args.seed)
+    if args.url:
+        transport, base_url = None, args.url
+    else:
+        os.chdir(ENGINE_DIR)  # main resolves its data directories relative to the engine directory
+        from main import app
+        logging.getLogger("httpx").setLevel(logging.WARNING)  # a line per request otherwise
+        transport, base_url = httpx.ASGITransport(app=app), "http://engine"
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout_s) as client:
+        for label, method, path, params, body in script.warmup():
+            response = await client.request(method, path, params=params, json=body)
+            print(f"warmup {label}: {response.status_code}", file=sys.stderr)
+        start = time.perf_counter()
+        samples = await run_clients(client, script, args.concurrency, args.requests, args.duration_s)
+        elapsed = time.perf_counter() - start
+    return samples, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="base URL of a running server, the app runs in process when not given")
+    parser.add_argument("--concurrency", type=int, default=8, help="clients sending requests at once")
+    parser.add_argument("--requests", type=int, default=None, help="measured requests (default 200 unless --duration-s)")
+    parser.add_argument("--duration-s", type=float, default=None, help="send requests for this long instead")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="relative weights of the request kinds")
+    parser.add_argument("--optimise-options", default='{"solver": "highs"}', help="JSON options of the optimisations")
+    parser.add_argument("--allow-cached", action="store_true", help="let repeated optimisations be answered from the result cache")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout-s", type=float, default=600, help="per request")
+    parser.add_argument("--output", default=None, help="write the report as JSON")
+    args = parser.parse_args()
+    if args.requests is None and args.duration_s is None:
+        args.requests = 200
+
+    samples, elapsed = asyncio.run(run(args))
+    report = {
+        "benchmark": "loadtest",
+        "target": args.url or "in-process",
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count()},
+        "config": {"concurrency": args.concurrency, "requests": args.requests, "durationS": args.duration_s, "mix": parse_mix(args.mix),
+                   "optimiseOptions": json.loads(args.optimise_options), "allowCached": args.allow_cached, "seed": args.seed},
+        "elapsedS": round(elapsed, 3),
+        **summarise(samples, elapsed),
+    }
+    for label, s in report["endpoints"].items():
+        print(f"{label}: {s['requests']} requests ({s['errors']} errors), {s['throughputPerS']}/s, "
+              f"p50 {s['p50Ms']}ms p95 {s['p95Ms']}ms p99 {s['p99Ms']}ms max {s['maxMs']}ms", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
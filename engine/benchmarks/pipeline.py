@@ -0,0 +1,197 @@
+"""
+Time and peak memory of each optimisation pipeline stage, over the bundled areas (geojson/areas/*.geojson)
+and synthetic disks of increasing size, at increasing grid resolutions
+
+Stages, as calculateOptimise runs them:
+    grid          get_grid_points_in_polygon_km, candidate sites and demand points
+    coverage      compute_coverage, the sparse covers matrix
+    build         PlacementModel, the MILP assembled from the matrix (PuLP or HiGHS)
+    solve         PlacementModel.solve (CBC or HiGHS)
+    raster        evaluate_coverage, the raster accCoverage
+    exact         exact_area_coverage, the unary_union polygon overlay
+    export        export_to_geojson
+    endToEnd      calculateOptimise, every stage plus bookkeeping
+
+Each stage's time is the median of --repeat untraced runs. Its peak memory comes from one further run under
+tracemalloc, which sees numpy and Python allocations but not GEOS or the solver's own. Run from the engine
+directory:
+
+    python benchmarks/pipeline.py --output pipeline.json
+    python benchmarks/pipeline.py --baseline pipeline.json --tolerance 0.25
+
+With --baseline, a stage is a regression when it is more than --tolerance slower (and --min-seconds slower
+in absolute terms), or needs more than --tolerance (and --min-mb) more peak memory, than the same case in
+the baseline.
+Regressions exit non-zero.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+
+import numpy as np
+import shapely
+from shapely import affinity
+from shapely.geometry import MultiPolygon, Point, shape
+from shape_optimisations.grid import get_grid_points_in_polygon_km
+from shape_optimisations.coverage import compute_coverage, create_fan_polygon
+from shape_optimisations.solvers import PlacementModel
+from shape_optimisations.raster import evaluate_coverage, exact_area_coverage
+from shape_optimisations.sensors import catalog_configurations
+from shape_optimisations.georouter import calculateOptimise, export_to_geojson, placed_sensor_sites
+
+AREAS_DIR = os.path.join(ENGINE_DIR, "geojson", "areas")
+SYNTHETIC_CENTRE = (-10.0, 60.0)  # lon, lat of the synthetic disks
+KM_PER_DEGREE = 111.195
+
+
+def bundled_areas(pattern="*"):
+    """ (name, MultiPolygon) of each area file matching pattern """
+    areas = []
+    for path in sorted(glob.glob(os.path.join(AREAS_DIR, f"{pattern}.geojson"))):
+        with open(path) as f:
+            data = json.load(f)
+        members = data.get("geometries") or [feature["geometry"] for feature in data.get("features", [])]
+        polygons = [p for g in members for p in getattr(shape(g), "geoms", [shape(g)]) if p.geom_type == "Polygon"]
+        areas.append((os.path.splitext(os.path.basename(path))[0], MultiPolygon(polygons)))
+    return areas
+
+
+def synthetic_area(diameter_km):
+    """ disk of the given diameter around SYNTHETIC_CENTRE, as a MultiPolygon """
+    lon, lat = SYNTHETIC_CENTRE
+    disk = Point(0, 0).buffer(diameter_km / 2 / KM_PER_DEGREE, 64)
+    disk = affinity.scale(disk, xfact=1 / np.cos(np.radians(lat)), origin=(0, 0))
+    return (f"disk{int(diameter_km)}km", MultiPolygon([affinity.translate(disk, lon, lat)]))
+
+
+def measure(fn, repeat):
+    """ (result, median seconds over repeat runs, peak MB of one traced run) """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, statistics.median(samples), peak / 2 ** 20
+
+
+def run_case(name, area, resolution_km, args):
+    configurations = catalog_configurations()
+    stages = {}
+
+    def record(stage, fn, repeat=args.repeat):
+        result, seconds, peak_mb = measure(fn, repeat)
+        stages[stage] = {"seconds": round(seconds, 5), "peakMB": round(peak_mb, 3)}
+        return result
+
+    lons, lats = record("grid", lambda: get_grid_points_in_polygon_km(area, resolution_km))
+    coverage = record("coverage", lambda: compute_coverage(lons, lats, configurations))
+    limits = {"time_limit_s": args.time_limit_s}
+    model = record("build", lambda: PlacementModel(coverage, solver=args.solver))
+    # the solve is the expensive stage, it is timed once (repeat 1) before its traced run
+    solution = record("solve", lambda: model.solve(args.max_sensors, args.coverage_requirement, limits=limits), repeat=1)
+    sites = placed_sensor_sites(solution["placed"], lons, lats, configurations)
+    fans = [create_fan_polygon(loc.x, loc.y, config["range_km"], config["azimuth_degree"], config["fan_degree"]) for loc, config in sites]
+    record("raster", lambda: evaluate_coverage(area, fans))
+    record("exact", lambda: exact_area_coverage(area, fans))
+    placed = [{"location": loc, "config": config} for loc, config in sites]
+    record("export", lambda: export_to_geojson(filename=None, op_area=None, placed_sensors=placed))
+
+    record("endToEnd", lambda: calculateOptimise(area, solver=args.solver, resolution_km=resolution_km, max_sensors=args.max_sensors,
+                                                 coverage_requirement=args.coverage_requirement, limits=limits), repeat=1)
+    return {
+        "area": name,
+        "resolutionKm": resolution_km,
+        "areaDeg2": round(area.area, 3),
+        "candidates": coverage.num_locations,
+        "demandPoints": coverage.num_demand,
+        "nonZeros": coverage.nnz,
+        "status": solution["status"],
+        "numSensors": int(solution["placed"].sum()),
+        "stages": stages,
+    }
+
+
+def compare(results, baseline, tolerance, min_seconds, min_mb):
+    """ regressions of results against a baseline run, matched by (area, resolutionKm, stage) """
+    reference = {(case["area"], case["resolutionKm"]): case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in results["cases"]:
+        base = reference.get((case["area"], case["resolutionKm"]))
+        if base is None:
+            continue
+        for stage, now in case["stages"].items():
+            before = base["stages"].get(stage)
+            if before is None:
+                continue
+            slower = now["seconds"] - before["seconds"]
+            if now["seconds"] > before["seconds"] * (1 + tolerance) and slower > min_seconds:
+                regressions.append({"area": case["area"], "resolutionKm": case["resolutionKm"], "stage": stage, "metric": "seconds",
+                                    "baseline": before["seconds"], "current": now["seconds"]})
+            if before["peakMB"] > 0 and now["peakMB"] > before["peakMB"] * (1 + tolerance) and now["peakMB"] - before["peakMB"] > min_mb:
+                regressions.append({"area": case["area"], "resolutionKm": case["resolutionKm"], "stage": stage, "metric": "peakMB",
+                                    "baseline": before["peakMB"], "current": now["peakMB"]})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--areas", default="*", help="glob of bundled area names, '' for none")
+    parser.add_argument("--synthetic-km", type=float, nargs="*", default=[250, 500, 1000], help="diameters of the synthetic disks")
+    parser.add_argument("--resolutions", type=float, nargs="+", default=[60, 45, 30], help="grid spacings (km)")
+    parser.add_argument("--solver", choices=["pulp", "highs"], default="pulp")
+    parser.add_argument("--max-sensors", type=int, default=99)
+    parser.add_argument("--coverage-requirement", type=float, default=0.70)
+    parser.add_argument("--time-limit-s", type=float, default=120, help="per solve")
+    parser.add_argument("--repeat", type=int, default=3, help="untraced runs per stage (the solve stages run once)")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    parser.add_argument("--baseline", default=None, help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown / memory growth")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="ignore slowdowns smaller than this")
+    parser.add_argument("--min-mb", type=float, default=1.0, help="ignore peak memory growth smaller than this")
+    args = parser.parse_args()
+
+    areas = (bundled_areas(args.areas) if args.areas else []) + [synthetic_area(d) for d in args.synthetic_km]
+    cases = []
+    for name, area in areas:
+        for resolution_km in args.resolutions:
+            case = run_case(name, area, resolution_km, args)
+            cases.append(case)
+            timings = ", ".join(f"{stage} {s['seconds']:.3f}s/{s['peakMB']:.1f}MB" for stage, s in case["stages"].items())
+            print(f"{name} @ {resolution_km}km ({case['candidates']} sites, {case['nonZeros']} nnz): {timings}", file=sys.stderr)
+
+    results = {
+        "benchmark": "pipeline",
+        "solver": args.solver,
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor(), "cpus": os.cpu_count()},
+        "shapely": shapely.__version__,
+        "numpy": np.__version__,
+        "cases": cases,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            results["regressions"] = compare(results, json.load(f), args.tolerance, args.min_seconds, args.min_mb)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if results.get("regressions"):
+        for r in results["regressions"]:
+            print(f"Regression: {r['area']} @ {r['resolutionKm']}km {r['stage']} {r['metric']} {r['baseline']} -> {r['current']}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Cold import time of the engine app (main:app), as paid by every worker start and --reload
+
+Each sample imports main in a fresh interpreter, run from the engine directory:
+
+    python benchmarks/startup.py --runs 5 --max-seconds 2.0 --output startup.json
+
+Exits non-zero if the median exceeds --max-seconds
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def time_cold_import():
+    out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=ENGINE_DIR, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(top=10):
+    """ the modules with the largest cumulative import time, from python -X importtime """
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ENGINE_DIR, capture_output=True, text=True, check=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return [{"module": name, "seconds": us / 1e6} for us, name in sorted(rows, reverse=True)[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail if the median cold import is slower")
+    parser.add_argument("--output", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    samples = [time_cold_import() for _ in range(args.runs)]
+    result = {
+        "benchmark": "startup",
+        "runs": args.runs,
+        "medianSeconds": statistics.median(samples),
+        "minSeconds": min(samples),
+        "maxSeconds": max(samples),
+        "samples": samples,
+        "slowestImports": slowest_imports(),
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.max_seconds is not None and result["medianSeconds"] > args.max_seconds:
+        print(f"Median cold import {result['medianSeconds']:.3f}s exceeds {args.max_seconds}s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
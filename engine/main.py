@@ -1,10 +1,15 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-import os, json, time
-import geopandas as gpd
+from fastapi.responses import FileResponse
+from typing import Optional
+import os, json, logging
 # from shape_optimisations.shape_optimisations import geoJsonDemo
-from shape_optimisations import georouter
+from shape_optimisations import georouter, jobs, sweep, sessions, assets, environment, metrics, batch, tiles
+from shape_optimisations.catalog import AreaCatalog, etag_matches, parse_bbox
+from shape_optimisations.encoding import compressed_response, dumps
+
+# ENGINE_LOG_LEVEL=DEBUG also logs request and result payloads, which is costly for large areas
+logging.basicConfig(level=os.environ.get("ENGINE_LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
 app = FastAPI()
 
@@ -15,33 +20,74 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# request latency histograms, exported with the optimisation metrics at /metrics
+app.add_middleware(metrics.RequestMetricsMiddleware)
 
 app.include_router(georouter.router)
+app.include_router(jobs.router)
+app.include_router(sweep.router)
+app.include_router(batch.router)
+app.include_router(sessions.router)
+app.include_router(assets.router)
+app.include_router(environment.router)
+app.include_router(metrics.router)
+app.include_router(tiles.router)
 
 GEOJSON_DIR = "geojson/areas"
 
-# returns named of pre-loaded AOOs
+COLOURED_POLYGONS_PATH = os.path.join("geojson", "lookup_mocks", "exampleColouredPolygons.geojson")
+
+# pre-loaded AOOs, parsed and indexed once, re-read when their files change (see shape_optimisations/catalog.py)
+area_catalog = AreaCatalog(GEOJSON_DIR)
+
+""" pre-loaded AOO as a vector tile layer, area:{name} """
+def area_layer(name):
+    area = area_catalog.get(name) if name else None
+    if area is None:
+        return None
+    features = area.members if area.kind == 'FeatureCollection' else [{'type': 'Feature', 'properties': {}, 'geometry': g} for g in area.members]
+    return area.etag, features
+
+""" the example coloured polygons as a vector tile layer, coloured-polygons """
+def coloured_polygons_layer(name):
+    if name or not os.path.exists(COLOURED_POLYGONS_PATH):
+        return None
+    stat = os.stat(COLOURED_POLYGONS_PATH)
+    with open(COLOURED_POLYGONS_PATH) as f:
+        return (stat.st_mtime_ns, stat.st_size), json.load(f)['features']
+
+tiles.layer_sources['area'] = area_layer
+tiles.layer_sources['coloured-polygons'] = coloured_polygons_layer
+
+""" 304 when the client already holds the ETag's version, otherwise the (compressed) body """
+def conditional_response(request, content, etag, media_type):
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return compressed_response(request, content, media_type=media_type, headers=headers)
+
+# returns named of pre-loaded AOOs, only those intersecting bbox=west,south,east,north when given
 @app.get("/geojson-names")
-def list_geojson_files():
-    files = [f for f in os.listdir(GEOJSON_DIR) if f.endswith(".geojson")]
-    return [os.path.splitext(f)[0] for f in files]  # return names without extension
+def list_geojson_files(request: Request, bbox: Optional[str] = None):
+    names, etag = area_catalog.names(parse_bbox(bbox))
+    return conditional_response(request, dumps(names), etag, "application/json")
 
-# returns geojson of pre-loaded AOOs
+# returns geojson of pre-loaded AOOs, bbox= keeps the features intersecting it and zoom= simplifies them
+# to about half a pixel at that web-mercator zoom level
 @app.get("/geojson")
-def get_geojson(name: str):
-    path = os.path.join(GEOJSON_DIR, f"{name}.geojson")
-    if not os.path.exists(path):
+def get_geojson(request: Request, name: str, bbox: Optional[str] = None, zoom: Optional[int] = Query(default=None, ge=0, le=24)):
+    area = area_catalog.get(name)
+    if area is None:
         raise HTTPException(status_code=404, detail="GeoJSON not found")
-    return FileResponse(path, media_type="application/geo+json")
+    content, etag = area.query(parse_bbox(bbox), zoom)
+    return conditional_response(request, content, etag, "application/geo+json")
     
-# example of returning polygons that can be coloured using arbitrary attributes
+# example of returning polygons that can be coloured using arbitrary attributes (tiled at /tiles/coloured-polygons/{z}/{x}/{y})
 @app.get("/coloured-polygons")
 def run_fill_operation():
-    time.sleep(2)
-    path = os.path.join("geojson", "lookup_mocks", "exampleColouredPolygons.geojson")
-    if not os.path.exists(path):
+    if not os.path.exists(COLOURED_POLYGONS_PATH):
         raise HTTPException(status_code=404, detail="GeoJSON not found")
-    return FileResponse(path, media_type="application/geo+json")
+    return FileResponse(COLOURED_POLYGONS_PATH, media_type="application/geo+json")
 
 # Serves an example polygon to be consumed by UI (not currently used)
 @app.get("/polygon")
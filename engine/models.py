@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Dict, Any, Literal, Annotated
 
 class Asset(BaseModel):
     id: str
@@ -8,3 +8,68 @@ class Asset(BaseModel):
     location: Dict[str, float]  # { "lat": ..., "lon": ... }
     geometry: Optional[Dict[str, Any]] = None  # GeoJSON-style shape
     metadata: Optional[Dict[str, Any]] = None
+
+
+class SensorType(BaseModel):
+    """ a kind of sensor in the fleet, placeable at any of its azimuths """
+    name: str
+    range_km: float = Field(gt=0)
+    fan_degree: float = Field(gt=0, le=360)
+    azimuths: List[float] = Field(min_length=1)  # degrees clockwise from north
+    cost: float = Field(default=1.0, ge=0)  # per placed unit, minimised by the optimiser
+
+
+class OptimiseOptions(BaseModel):
+    """ optional 'options' member of the FeatureCollection POSTed to /optimise-polygon-coverage """
+    solver: Literal['pulp', 'highs', 'greedy'] = 'pulp'  # MILP backends of shape_optimisations.solvers, or the greedy heuristic
+    sensor_catalog: Optional[List[SensorType]] = Field(default=None, min_length=1)  # defaults to sensors.DEFAULT_SENSOR_CATALOG
+    resolution_km: float = Field(default=60, ge=1)  # grid spacing of candidate sites and demand points
+    candidate_resolution_km: Optional[float] = Field(default=None, ge=1)  # candidate site spacing, defaults to resolution_km
+    demand_resolution_km: Optional[float] = Field(default=None, ge=1)  # demand point spacing, defaults to resolution_km
+    refine_levels: int = Field(default=0, ge=0, le=4)  # coarse-to-fine levels, each halves both spacings near the coverage boundary
+    max_sensors: int = Field(default=99, ge=0)
+    coverage_requirement: float = Field(default=0.70, ge=0, le=1)  # fraction of grid points to cover
+    encourage_overlapping: bool = False
+    warm_start: bool = False  # seed the MILP with the greedy heuristic's placement
+    presolve: bool = True  # drop dominated placements and merge identical demand points before building the MILP
+    time_limit_s: Optional[float] = Field(default=None, gt=0)  # solver wall-clock limit, the best placement so far is returned
+    gap_rel: Optional[float] = Field(default=None, ge=0)  # stop once within this relative gap of the bound
+    threads: Optional[int] = Field(default=None, ge=1)  # CBC threads (the highs backend ignores it)
+    raster_resolution_km: float = Field(default=5, ge=0.5)  # cell size of the raster used for accCoverage
+    exact_area: bool = False  # accCoverage from the exact polygon overlay instead (validation, slower with many sensors)
+    decompose: Literal['off', 'proportional', 'exact'] = 'off'  # solve disjoint parts of the area separately, see shape_optimisations.decompose
+    exclude_asset_types: Optional[List[str]] = None  # asset store types no sensor may be placed in, see shape_optimisations.assets
+    exclusion_buffer_km: float = Field(default=0, ge=0)  # nor within this distance of them
+    existing_asset_types: Optional[List[str]] = None  # asset store types that are sensors already in place, their coverage counts
+    simplify_tolerance_km: Optional[float] = Field(default=None, ge=0)  # area simplification before sampling, defaults to a fraction of the finest spacing, 0 keeps every vertex
+
+
+class BatchArea(BaseModel):
+    """ one operational area of a batch """
+    name: Optional[str] = None  # echoed on its result lines, defaults to its index
+    geojson: Dict[str, Any]  # FeatureCollection, GeometryCollection (as the bundled area files), Feature or geometry
+
+
+class BatchRequest(BaseModel):
+    """ body POSTed to /optimise-polygon-coverage/batch, every area is optimised with every option set """
+    areas: List[BatchArea] = Field(min_length=1)
+    option_sets: List[OptimiseOptions] = Field(default_factory=lambda: [OptimiseOptions()], min_length=1)
+    workers: Optional[int] = Field(default=None, ge=1)  # worker processes, at most ENGINE_BATCH_WORKERS
+
+
+class HeatmapOptions(BaseModel):
+    """ optional 'options' member of the body POSTed to /coverage-heatmap """
+    resolution_km: float = Field(default=5, ge=0.5)  # raster cell size
+    exact: bool = False  # also report the exact polygon overlay coverage
+
+
+class SweepOptions(BaseModel):
+    """ 'sweep' member of the FeatureCollection POSTed to /optimise-polygon-coverage/sweep, exactly one of the lists """
+    coverage_requirements: Optional[List[Annotated[float, Field(ge=0, le=1)]]] = Field(default=None, min_length=1, max_length=50)  # cheapest placement for each, within options.max_sensors
+    max_sensors: Optional[List[Annotated[int, Field(ge=0)]]] = Field(default=None, min_length=1, max_length=50)  # most coverage for each sensor budget
+
+    @model_validator(mode='after')
+    def one_parameter(self):
+        if (self.coverage_requirements is None) == (self.max_sensors is None):
+            raise ValueError("give exactly one of 'coverage_requirements' or 'max_sensors'")
+        return self
@@ -0,0 +1,202 @@
+import time
+import numpy as np
+import shapely
+from fastapi import HTTPException
+from shapely.geometry import MultiPolygon, shape
+
+"""
+Operational area ingestion: posted GeoJSON features to one valid MultiPolygon, simplified before sampling
+
+    parse     the rings of every Polygon and MultiPolygon feature (holes included, other geometry types
+              are ignored) become one coordinate array, built into all rings and then all polygons by two
+              vectorised shapely calls, which also close rings left open (as hand-drawn Cesium polygons
+              can be). Should a geometry be malformed, the features are read one at a time instead to
+              report which one. This is several times faster than shapely's own from_geojson (or
+              building each Polygon), whose JSON parsing dominates on detailed coastlines
+    repair    invalid polygons (self-intersections, bow-ties, touching holes) go through make_valid and
+              keep their polygonal parts, overlapping features are dissolved so no area counts twice
+    simplify  Douglas-Peucker to SIMPLIFY_FRACTION of the finest spacing the optimisation samples the area
+              at (candidate, demand and raster grids), so no grid point moves in or out of the area by more
+              than a small part of a cell. The plain algorithm is several times faster than its topology
+              preserving variant, the few polygons it leaves invalid are repaired as above
+
+Every point test of the grid and raster steps is a point-in-polygon test against the area, and the exact
+area coverage overlays the area itself, both cost more the more vertices it has: coastlines traced from
+imported data can carry thousands of vertices per grid cell.
+"""
+
+SIMPLIFY_FRACTION = 0.05
+KM_PER_DEGREE = 111.195  # of latitude, a tolerance in degrees is tighter still along longitude
+PROBE_POINTS = 2048  # point tests timed on both areas to estimate the time the simplification saves
+
+
+def _polygon_parts(geoms):
+    """ the Polygon parts of an array of geometries, non-empty """
+    parts = shapely.get_parts(geoms)
+    parts = parts[shapely.get_type_id(parts) == shapely.GeometryType.POLYGON]
+    return parts[~shapely.is_empty(parts)]
+
+
+def _repaired(parts):
+    """ parts with every invalid polygon replaced by the polygonal parts make_valid gives it, and how many were """
+    invalid = ~shapely.is_valid(parts)
+    if invalid.any():
+        parts = np.concatenate([parts[~invalid], _polygon_parts(shapely.make_valid(parts[invalid]))])
+    return parts, int(invalid.sum())
+
+
+def _parse_bulk(geometries):
+    """ Polygons of the polygonal geometries, their x, y (any z dropped) in one array """
+    rings, ring_polygon, polygon = [], [], 0
+    for geometry in geometries:
+        polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+        for rings_of_polygon in polygons:
+            for ring in rings_of_polygon:
+                rings.append(np.asarray(ring, dtype=float)[:, :2])
+                ring_polygon.append(polygon)
+            polygon += 1
+    if not rings:
+        return np.array([], dtype=object)
+    ring_index = np.repeat(np.arange(len(rings)), [len(ring) for ring in rings])
+    return shapely.polygons(shapely.linearrings(np.concatenate(rings), indices=ring_index), indices=ring_polygon)
+
+
+def _parse_one_by_one(geometries):
+    parsed = []
+    for i, geometry in enumerate(geometries):
+        try:
+            parsed.append(shape(geometry))
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"polygon feature {i} is not valid GeoJSON: {e}")
+    return _polygon_parts(np.array(parsed, dtype=object))
+
+
+def as_feature_collection(geojson):
+    """ a FeatureCollection, GeometryCollection (as the bundled area files), Feature or bare geometry as a FeatureCollection """
+    kind = geojson.get('type')
+    if kind == 'FeatureCollection':
+        return geojson
+    if kind == 'GeometryCollection':
+        geometries = geojson.get('geometries') or []
+    else:
+        geometries = [geojson.get('geometry') if kind == 'Feature' else geojson]
+    return {'type': 'FeatureCollection', 'features': [{'type': 'Feature', 'properties': {}, 'geometry': g} for g in geometries]}
+
+
+def parse_polygons(geojson):
+    """
+    Polygons of a posted FeatureCollection, repaired and dissolved
+
+    Args:
+        geojson (dict): FeatureCollection, only its features' geometries are read
+
+    Returns:
+        tuple(np.ndarray, dict): valid, non-overlapping Polygons (with their holes) and a report of the
+        'features', 'ignored' (non-polygonal) features, 'repaired' polygons and 'dissolved' overlaps
+    """
+    features = geojson.get('features') or []
+    geometries = [(f.get('geometry') or {}) if isinstance(f, dict) else {} for f in features]
+    geometries = [g for g in geometries if g.get('type') in ('Polygon', 'MultiPolygon')]
+    try:
+        parts = _polygon_parts(_parse_bulk(geometries))
+    except (TypeError, ValueError, IndexError, KeyError, shapely.errors.GEOSException):
+        parts = _parse_one_by_one(geometries)
+
+    parts, repaired = _repaired(parts)
+
+    # features drawn over each other are merged, their shared area would otherwise be sampled twice
+    dissolved = 0
+    if len(parts) > 1:
+        tree = shapely.STRtree(parts)
+        left, right = tree.query(parts, predicate='intersects')
+        pairs = left < right
+        overlapping = shapely.area(shapely.intersection(parts[left[pairs]], parts[right[pairs]])) > 0
+        if overlapping.any():
+            merged = np.unique(np.concatenate([left[pairs][overlapping], right[pairs][overlapping]]))
+            keep = np.ones(len(parts), dtype=bool)
+            keep[merged] = False
+            parts = np.concatenate([parts[keep], _polygon_parts(shapely.union_all(parts[merged]))])
+            dissolved = int(overlapping.sum())
+
+    report = {
+        'features': len(features),
+        'ignored': len(features) - len(geometries),
+        'repaired': repaired,
+        'dissolved': dissolved,
+    }
+    return parts, report
+
+
+def sampling_spacings_km(options):
+    """ spacings (km) the optimisation samples the area at: candidate sites, (finest) demand points, raster cells """
+    return [
+        options.candidate_resolution_km or options.resolution_km,
+        (options.demand_resolution_km or options.resolution_km) / 2 ** options.refine_levels,
+        options.raster_resolution_km,
+    ]
+
+
+def simplification_tolerance_km(options):
+    """ SIMPLIFY_FRACTION of the finest sampling spacing, or options.simplify_tolerance_km when set """
+    if options.simplify_tolerance_km is not None:
+        return options.simplify_tolerance_km
+    return SIMPLIFY_FRACTION * min(sampling_spacings_km(options))
+
+
+def _point_test_seconds(area, xs, ys):
+    """ seconds to prepare the area (done once per sampling) and to test the points against it """
+    start = time.perf_counter()
+    shapely.prepare(area)
+    prepared = time.perf_counter()
+    shapely.contains_xy(area, xs, ys)
+    return prepared - start, time.perf_counter() - prepared
+
+
+def _grid_tests(area, spacings_km):
+    """ about how many point tests sampling the area's bounding box at each spacing takes """
+    min_lon, min_lat, max_lon, max_lat = area.bounds
+    height_km = (max_lat - min_lat) * KM_PER_DEGREE
+    width_km = (max_lon - min_lon) * KM_PER_DEGREE * np.cos(np.radians((min_lat + max_lat) / 2))
+    return sum((height_km / s + 1) * (width_km / s + 1) for s in spacings_km)
+
+
+def simplify_area(area, tolerance_km, spacings_km=()):
+    """
+    Simplifies an area for sampling, keeping it valid (holes narrower than the tolerance can close)
+
+    Args:
+        area (shapely.MultiPolygon): as geojson_to_multipolygon
+        tolerance_km (float): largest distance a boundary may move, 0 keeps the area as is
+        spacings_km (iterable of float): spacings the area is then sampled at, to estimate the time saved
+
+    Returns:
+        tuple(shapely.MultiPolygon, dict): the simplified area and a report of 'verticesIn', 'verticesOut',
+        'toleranceKm', 'simplifyTime' and 'estimatedTimeSaved' (seconds of grid and raster point tests,
+        extrapolated from PROBE_POINTS tests timed on both areas, less the simplification itself, so
+        negative when it cost more than it saved there)
+    """
+    vertices_in = int(shapely.get_num_coordinates(area))
+    report = {'verticesIn': vertices_in, 'verticesOut': vertices_in, 'toleranceKm': round(tolerance_km, 4), 'simplifyTime': 0.0, 'estimatedTimeSaved': 0.0}
+    if tolerance_km <= 0 or area.is_empty:
+        return area, report
+
+    start = time.perf_counter()
+    parts, _ = _repaired(_polygon_parts(shapely.simplify(shapely.get_parts(area), tolerance_km / KM_PER_DEGREE, preserve_topology=False)))
+    simplified = MultiPolygon(list(parts))
+    simplify_time = time.perf_counter() - start
+    if shapely.get_num_coordinates(simplified) == vertices_in:
+        # nothing within the tolerance to remove
+        report['simplifyTime'] = round(simplify_time, 4)
+        return area, report
+
+    rng = np.random.default_rng(0)
+    min_lon, min_lat, max_lon, max_lat = area.bounds
+    xs, ys = rng.uniform(min_lon, max_lon, PROBE_POINTS), rng.uniform(min_lat, max_lat, PROBE_POINTS)
+    (prepare_before, tests_before), (prepare_after, tests_after) = _point_test_seconds(area, xs, ys), _point_test_seconds(simplified, xs, ys)
+    saved = prepare_before - prepare_after + (tests_before - tests_after) / PROBE_POINTS * _grid_tests(area, spacings_km)
+    report.update(
+        verticesOut=int(shapely.get_num_coordinates(simplified)),
+        simplifyTime=round(simplify_time, 4),
+        estimatedTimeSaved=round(saved - simplify_time, 4),
+    )
+    return simplified, report
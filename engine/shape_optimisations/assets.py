@@ -0,0 +1,589 @@
+import os
+import gc
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+import shapely
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
+from shapely.geometry import box, mapping, shape
+from models import Asset
+from shape_optimisations.coverage import create_fan_polygon, EARTH_RADIUS_KM
+from shape_optimisations.sensors import DEFAULT_SENSOR_CATALOG
+from shape_optimisations.catalog import bbox_geometry, parse_bbox
+from shape_optimisations.encoding import compressed_response, dumps, loads
+
+router = APIRouter()
+
+"""
+In-memory registry of assets (existing sensors, platforms, exclusion features...)
+
+Assets are validated against models.Asset on ingest but stored as columns, not one object per asset:
+ids, names and metadata as object arrays, types as integer codes into a table of type names,
+locations as float arrays and geometries as one shapely array (the location Point where an asset has no
+geometry) indexed by an STRtree. Every ingest builds a new set of columns and swaps it in, so queries
+read a consistent snapshot without taking the lock.
+
+Queries:
+    bbox       - assets whose geometry intersects a box (STRtree)
+    radius     - assets whose location is within a great-circle distance (latitude band, then haversine)
+    intersects - assets whose geometry intersects a posted geometry (STRtree)
+
+The optimiser uses the store through two options (see georouter.calculateOptimise): candidate sites in
+(or within a buffer of) assets of the exclude_asset_types are dropped, and assets of the
+existing_asset_types are sensors already in place, their coverage counts towards the requirement.
+"""
+
+ASSET_MAX = int(os.environ.get("ENGINE_ASSET_MAX", 1_000_000))
+QUERY_LIMIT = 1000  # assets returned by a query unless ?limit= says otherwise
+KM_PER_DEGREE = EARTH_RADIUS_KM * np.pi / 180
+
+_ASSET_LIST = TypeAdapter(List[Asset])
+
+
+class AssetIngestError(ValueError):
+    """ a record that is not a valid asset, position is its index (or NDJSON line number) """
+
+    def __init__(self, position, detail):
+        super().__init__(f"asset {position}: {detail}")
+        self.position = position
+        self.detail = detail
+
+
+class AssetStoreFull(Exception):
+    pass
+
+
+def feature_to_asset(feature):
+    """
+    models.Asset fields of a GeoJSON Feature: 'id', 'name' and 'type' from its properties (the id may also
+    be the feature's), the location from a 'location' property or else the geometry (a Point, or any other
+    geometry's representative point), the other properties become the metadata
+    """
+    properties = dict(feature.get('properties') or {})
+    geometry = feature.get('geometry')
+    asset = {
+        'id': properties.pop('id', feature.get('id')),
+        'name': properties.pop('name', None),
+        'type': properties.pop('type', None),
+        'location': properties.pop('location', None),
+    }
+    if asset['id'] is not None:
+        asset['id'] = str(asset['id'])
+    if asset['name'] is None:
+        asset['name'] = asset['id']
+    if geometry and geometry.get('type') == 'Point':
+        if asset['location'] is None:
+            lon, lat = geometry['coordinates'][:2]
+            asset['location'] = {'lat': lat, 'lon': lon}
+    elif geometry:
+        asset['geometry'] = geometry
+        if asset['location'] is None:
+            point = shape(geometry).representative_point()
+            asset['location'] = {'lat': point.y, 'lon': point.x}
+    asset['metadata'] = properties or None
+    return asset
+
+
+@contextmanager
+def _gc_paused():
+    # a bulk ingest allocates hundreds of thousands of acyclic objects, each burst of which would otherwise
+    # trigger a collection scanning all the previous ones again (two thirds of the ingest time at 100k)
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def parse_assets(body, ndjson=False):
+    """
+    Validated asset records of an ingest body
+
+    Args:
+        body (bytes): NDJSON (one Asset or GeoJSON Feature per line) or JSON (a FeatureCollection, a list of
+                      Assets or Features, or a single one)
+        ndjson (bool): parse body as NDJSON
+
+    Returns:
+        list[tuple(Asset, shapely geometry | None)]: validated asset and parsed geometry of each record, only
+                                                    held until the store has copied them into its columns
+
+    Raises:
+        AssetIngestError: for the first invalid record, nothing is ingested
+    """
+    with _gc_paused():
+        return _parse_assets(body, ndjson)
+
+
+def _parse_assets(body, ndjson):
+    if ndjson:
+        items = []
+        for number, line in enumerate(body.splitlines(), start=1):
+            if line.strip():
+                try:
+                    items.append((number, loads(line)))
+                except ValueError as e:
+                    raise AssetIngestError(number, f"invalid JSON ({e})")
+    else:
+        try:
+            data = loads(body)
+        except ValueError as e:
+            raise AssetIngestError(0, f"invalid JSON ({e})")
+        if isinstance(data, dict) and data.get('type') == 'FeatureCollection':
+            data = data.get('features', [])
+        items = list(enumerate(data if isinstance(data, list) else [data]))
+
+    for i, (position, item) in enumerate(items):
+        if not isinstance(item, dict):
+            raise AssetIngestError(position, "expected a JSON object")
+        if item.get('type') == 'Feature':
+            try:
+                items[i] = (position, feature_to_asset(item))
+            except (KeyError, TypeError, ValueError, AttributeError, shapely.errors.ShapelyError) as e:
+                raise AssetIngestError(position, f"invalid geometry ({e})")
+    # one validation call for the batch, several times faster than one per record
+    try:
+        assets = _ASSET_LIST.validate_python([item for _, item in items])
+    except ValidationError as e:
+        errors = e.errors()
+        first = errors[0]['loc'][0]
+        raise AssetIngestError(items[first][0], [{'loc': err['loc'][1:], 'msg': err['msg']} for err in errors if err['loc'][0] == first])
+
+    records = []
+    for (position, _), asset in zip(items, assets):
+        if 'lat' not in asset.location or 'lon' not in asset.location:
+            raise AssetIngestError(position, "location needs 'lat' and 'lon'")
+        try:
+            geometry = shape(asset.geometry) if asset.geometry else None
+        except (KeyError, TypeError, ValueError, AttributeError, shapely.errors.ShapelyError) as e:
+            raise AssetIngestError(position, f"invalid geometry ({e})")
+        records.append((asset, geometry))
+    return records
+
+
+def haversine_km(lon, lat, lons, lats):
+    """ great-circle distances (km) from (lon, lat) to each of lons, lats """
+    lon, lat, lons, lats = np.radians(lon), np.radians(lat), np.radians(lons), np.radians(lats)
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _metadata_range_km(metadata):
+    """ the 'range_km' of an asset's metadata, NaN when it has none """
+    try:
+        return float((metadata or {})['range_km'])
+    except (KeyError, TypeError, ValueError):
+        return np.nan
+
+
+def _object_array(values):
+    # element-wise, np.array would nest lists or dicts
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+class _AssetColumns:
+    """ immutable columnar snapshot of the store, with its STRtree and id -> row map """
+
+    def __init__(self, ids, names, type_names, type_codes, lons, lats, geometries, has_geometry, metadata, range_km):
+        self.ids, self.names, self.metadata = ids, names, metadata
+        self.type_names, self.type_codes = type_names, type_codes
+        self.lons, self.lats = lons, lats
+        self.geometries, self.has_geometry = geometries, has_geometry
+        self.range_km = range_km  # metadata 'range_km' (NaN when not given), bounds how far an existing sensor reaches
+        self.max_range_km = float(np.nanmax(range_km)) if np.isfinite(range_km).any() else 0.0
+        self.rows = {asset_id: i for i, asset_id in enumerate(ids)}
+        self.tree = shapely.STRtree(geometries)
+        # rows whose geometry is not their location Point, so the tree does not index their location
+        self.shaped = np.flatnonzero(has_geometry)
+
+    @classmethod
+    def empty(cls):
+        return cls.from_records([])
+
+    @classmethod
+    def from_records(cls, records):
+        """ columns of parse_assets records, the last of any repeated id is kept """
+        last = {asset.id: i for i, (asset, _) in enumerate(records)}
+        records = [records[i] for i in sorted(last.values())]
+        type_names = list(dict.fromkeys(asset.type for asset, _ in records))
+        type_index = {name: code for code, name in enumerate(type_names)}
+        lons = np.array([asset.location['lon'] for asset, _ in records], dtype=float)
+        lats = np.array([asset.location['lat'] for asset, _ in records], dtype=float)
+        geometries = shapely.points(lons, lats) if len(records) else np.array([], dtype=object)
+        has_geometry = np.array([geometry is not None for _, geometry in records], dtype=bool)
+        for i in np.flatnonzero(has_geometry):
+            geometries[i] = records[i][1]
+        return cls(
+            _object_array([asset.id for asset, _ in records]),
+            _object_array([asset.name for asset, _ in records]),
+            type_names,
+            np.array([type_index[asset.type] for asset, _ in records], dtype=np.int32),
+            lons, lats, geometries, has_geometry,
+            _object_array([asset.metadata for asset, _ in records]),
+            np.array([_metadata_range_km(asset.metadata) for asset, _ in records], dtype=float),
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def take(self, rows):
+        """ columns of the given rows (type table unchanged) """
+        return _AssetColumns(self.ids[rows], self.names[rows], self.type_names, self.type_codes[rows], self.lons[rows], self.lats[rows],
+                             self.geometries[rows], self.has_geometry[rows], self.metadata[rows], self.range_km[rows])
+
+    def merge(self, batch):
+        """ these columns with the batch appended, rows whose id the batch has are replaced """
+        kept = np.fromiter((asset_id not in batch.rows for asset_id in self.ids), dtype=bool, count=len(self))
+        type_names = self.type_names + [name for name in batch.type_names if name not in self.type_names]
+        type_index = {name: code for code, name in enumerate(type_names)}
+        batch_codes = np.array([type_index[name] for name in batch.type_names], dtype=np.int32)[batch.type_codes] if len(batch) else batch.type_codes
+        return _AssetColumns(
+            np.concatenate([self.ids[kept], batch.ids]),
+            np.concatenate([self.names[kept], batch.names]),
+            type_names,
+            np.concatenate([self.type_codes[kept], batch_codes]),
+            np.concatenate([self.lons[kept], batch.lons]),
+            np.concatenate([self.lats[kept], batch.lats]),
+            np.concatenate([self.geometries[kept], batch.geometries]),
+            np.concatenate([self.has_geometry[kept], batch.has_geometry]),
+            np.concatenate([self.metadata[kept], batch.metadata]),
+            np.concatenate([self.range_km[kept], batch.range_km]),
+        )
+
+    def of_types(self, rows, types):
+        """ the rows whose type is one of types (all rows when types is None) """
+        if types is None:
+            return rows
+        codes = [code for code, name in enumerate(self.type_names) if name in set(types)]
+        return rows[np.isin(self.type_codes[rows], codes)]
+
+    def record(self, i):
+        """ models.Asset fields of row i """
+        return {
+            'id': self.ids[i],
+            'name': self.names[i],
+            'type': self.type_names[self.type_codes[i]],
+            'location': {'lat': float(self.lats[i]), 'lon': float(self.lons[i])},
+            'geometry': mapping(self.geometries[i]) if self.has_geometry[i] else None,
+            'metadata': self.metadata[i],
+        }
+
+    def feature(self, i):
+        """ GeoJSON Feature of row i, its geometry or location Point """
+        return {
+            'type': 'Feature',
+            'id': self.ids[i],
+            'geometry': mapping(self.geometries[i]),
+            'properties': {**(self.metadata[i] or {}), 'id': self.ids[i], 'name': self.names[i], 'type': self.type_names[self.type_codes[i]]},
+        }
+
+
+def sensor_configuration(metadata, catalog=None):
+    """
+    Placement configuration of an existing sensor asset, from its metadata: 'azimuth_degree', plus
+    'range_km' and 'fan_degree' or a 'sensor_type' of the catalog to take them from
+
+    Returns:
+        dict | None: configuration as sensors.catalog_configurations (cost 0, it is already paid for),
+                     None when the metadata does not describe a sensor
+    """
+    metadata = metadata or {}
+    catalog = DEFAULT_SENSOR_CATALOG if catalog is None else catalog
+    sensor = next((s for s in catalog if s.name == metadata.get('sensor_type')), None)
+    try:
+        azimuth = float(metadata['azimuth_degree'])
+        range_km = float(metadata.get('range_km', sensor.range_km if sensor else None))
+        fan_degree = float(metadata.get('fan_degree', sensor.fan_degree if sensor else None))
+    except (KeyError, TypeError, ValueError):
+        return None
+    if range_km <= 0 or not 0 < fan_degree <= 360:
+        return None
+    return {'sensor_type': metadata.get('sensor_type'), 'azimuth_degree': azimuth, 'fan_degree': fan_degree, 'range_km': range_km, 'cost': 0.0}
+
+
+def sites_near(lons, lats, zones, buffer_km=0.0):
+    """
+    Flags the sites inside, or within buffer_km of, any of the zones
+
+    Distances are measured in a sinusoidal projection centred on the sites, which keeps them within a few
+    percent over an operational area
+
+    Args:
+        lons, lats (np.ndarray): site coordinates
+        zones (list[shapely geometry]): lon/lat geometries
+        buffer_km (float): distance around the zones that is also flagged
+
+    Returns:
+        np.ndarray[bool]: per site
+    """
+    lons, lats = np.asarray(lons, dtype=float), np.asarray(lats, dtype=float)
+    near = np.zeros(len(lons), dtype=bool)
+    if len(lons) == 0 or len(zones) == 0:
+        return near
+    lon0 = np.mean(lons)
+
+    def to_km(coords):
+        x = ((coords[:, 0] - lon0 + 180) % 360 - 180) * np.cos(np.radians(coords[:, 1]))
+        return np.column_stack([x, coords[:, 1]]) * KM_PER_DEGREE
+
+    sites = shapely.points(to_km(np.column_stack([lons, lats])))
+    tree = shapely.STRtree(shapely.transform(np.asarray(zones, dtype=object), to_km))
+    if buffer_km > 0:
+        hits = tree.query(sites, predicate='dwithin', distance=buffer_km)
+    else:
+        hits = tree.query(sites, predicate='intersects')
+    near[hits[0]] = True
+    return near
+
+
+def assets_digest(assets):
+    """ hash of an optimiser_assets context for the result cache key, None for no context """
+    if assets is None:
+        return None
+    digest = hashlib.sha256()
+    for zone in assets['exclusion_zones']:
+        digest.update(shapely.to_wkb(shapely.normalize(zone)))
+    for loc, config in assets['existing_sensors']:
+        digest.update(repr((round(loc.x, 7), round(loc.y, 7), sorted(config.items()))).encode())
+    return digest.digest()
+
+
+def _widened(bounds, margin_km):
+    """ (west, south, east, north) box widened by margin_km on every side """
+    west, south, east, north = bounds
+    margin = margin_km / KM_PER_DEGREE
+    lon_margin = margin / max(np.cos(np.radians(min(max(abs(south), abs(north)) + margin, 89.0))), 1e-6)
+    return box(west - lon_margin, south - margin, east + lon_margin, north + margin)
+
+
+class AssetStore:
+    """
+    Columnar, spatially indexed assets, replaced by id on re-ingest
+
+    Args:
+        max_assets (int): ingests that would grow the store past this are refused
+    """
+
+    def __init__(self, max_assets=ASSET_MAX):
+        self.max_assets = max_assets
+        self._columns = _AssetColumns.empty()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._columns)
+
+    def ingest(self, records, replace=False):
+        """
+        Args:
+            records (list): parse_assets records
+            replace (bool): drop every stored asset first
+
+        Returns:
+            tuple(int, int): assets ingested, assets now stored
+        """
+        with _gc_paused():
+            batch = _AssetColumns.from_records(records)
+        with self._lock:
+            merged = batch if replace else self._columns.merge(batch)
+            if len(merged) > self.max_assets:
+                raise AssetStoreFull(f"the store holds at most {self.max_assets} assets")
+            self._columns = merged
+        return len(batch), len(merged)
+
+    def delete(self, asset_id):
+        with self._lock:
+            columns = self._columns
+            if asset_id not in columns.rows:
+                return False
+            self._columns = columns.take(np.flatnonzero(columns.ids != asset_id))
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._columns = _AssetColumns.empty()
+
+    def get(self, asset_id):
+        columns = self._columns
+        i = columns.rows.get(asset_id)
+        return None if i is None else columns.record(i)
+
+    def summary(self):
+        """ number of assets, in total and per type """
+        columns = self._columns
+        counts = np.bincount(columns.type_codes, minlength=len(columns.type_names))
+        return {'total': len(columns), 'types': {name: int(n) for name, n in zip(columns.type_names, counts) if n}}
+
+    def bbox(self, bbox, types=None):
+        """ (columns, rows) of the assets whose geometry intersects (west, south, east, north) """
+        columns = self._columns
+        rows = np.sort(columns.tree.query(bbox_geometry(bbox), predicate='intersects'))
+        return columns, columns.of_types(rows, types)
+
+    def intersecting(self, geometry, types=None):
+        """ (columns, rows) of the assets whose geometry intersects a shapely geometry """
+        columns = self._columns
+        rows = np.sort(columns.tree.query(geometry, predicate='intersects'))
+        return columns, columns.of_types(rows, types)
+
+    def radius(self, lon, lat, radius_km, types=None):
+        """ (columns, rows, distances km) of the assets whose location is within radius_km, nearest first """
+        columns = self._columns
+        band = np.flatnonzero(np.abs(columns.lats - lat) <= radius_km / KM_PER_DEGREE)
+        rows = columns.of_types(band, types)
+        distances = haversine_km(lon, lat, columns.lons[rows], columns.lats[rows])
+        within = distances <= radius_km
+        rows, distances = rows[within], distances[within]
+        order = np.argsort(distances, kind='stable')
+        return columns, rows[order], distances[order]
+
+    def exclusion_zones(self, bounds, types, buffer_km=0.0):
+        """ geometries of the assets of the types that intersect bounds, widened by buffer_km """
+        columns = self._columns
+        rows = columns.of_types(np.sort(columns.tree.query(_widened(bounds, buffer_km), predicate='intersects')), types)
+        return list(columns.geometries[rows])
+
+    def existing_sensors(self, area, types, catalog=None):
+        """
+        Sensors already in place around an area: assets of the types whose fan (see sensor_configuration)
+        intersects it. The STRtree narrows them to the assets within reach of the area before any fan is built
+
+        Returns:
+            tuple(list[tuple(Point, dict)], int): (location, configuration) of each, and the number of assets
+            of the types within reach whose metadata does not describe a sensor
+        """
+        columns = self._columns
+        catalog = DEFAULT_SENSOR_CATALOG if catalog is None else catalog
+        # only assets located within the longest range (of the catalog or any asset's metadata) of the area can reach it
+        window = _widened(area.bounds, max([s.range_km for s in catalog] + [columns.max_range_km]))
+        near = columns.tree.query(window, predicate='intersects')
+        shaped = columns.shaped[shapely.contains_xy(window, columns.lons[columns.shaped], columns.lats[columns.shaped])]
+        rows = columns.of_types(np.union1d(near[~columns.has_geometry[near]], shaped), types)
+        west, south, east, north = area.bounds
+        sensors, unusable = [], 0
+        for i in rows:
+            config = sensor_configuration(columns.metadata[i], catalog)
+            if config is None:
+                unusable += 1
+                continue
+            # bounding box reach of the fan before building it
+            reach = config['range_km'] / KM_PER_DEGREE
+            lon_reach = reach / max(np.cos(np.radians(min(abs(columns.lats[i]) + reach, 89.0))), 1e-6)
+            if not (south - reach <= columns.lats[i] <= north + reach and west - lon_reach <= columns.lons[i] <= east + lon_reach):
+                continue
+            lon, lat = float(columns.lons[i]), float(columns.lats[i])
+            if create_fan_polygon(lon, lat, config['range_km'], config['azimuth_degree'], config['fan_degree']).intersects(area):
+                sensors.append((shapely.Point(lon, lat), config))
+        return sensors, unusable
+
+    def optimiser_assets(self, area, options):
+        """
+        Exclusion zones and existing sensors for an optimisation of the area, None when the options use
+        neither exclude_asset_types nor existing_asset_types
+
+        Returns:
+            dict | None: {'exclusion_zones', 'exclusion_buffer_km', 'existing_sensors', 'unusable'}, picklable
+                         so it can be handed to a job worker
+        """
+        if not options.exclude_asset_types and not options.existing_asset_types:
+            return None
+        zones = self.exclusion_zones(area.bounds, options.exclude_asset_types, options.exclusion_buffer_km) if options.exclude_asset_types else []
+        existing, unusable = self.existing_sensors(area, options.existing_asset_types, options.sensor_catalog) if options.existing_asset_types else ([], 0)
+        return {'exclusion_zones': zones, 'exclusion_buffer_km': options.exclusion_buffer_km, 'existing_sensors': existing, 'unusable': unusable}
+
+
+asset_store = AssetStore()
+
+
+""" query response: the matching assets as Asset records or a GeoJSON FeatureCollection, at most limit of them """
+def _query_response(request, columns, rows, limit, format, distances=None):
+    shown = rows[:limit]
+    if format == 'geojson':
+        features = [columns.feature(i) for i in shown]
+        if distances is not None:
+            for feature, distance in zip(features, distances):
+                feature['properties']['distanceKm'] = round(float(distance), 3)
+        body = {'type': 'FeatureCollection', 'features': features, 'count': len(rows), 'truncated': len(rows) > limit}
+    else:
+        assets = [columns.record(i) for i in shown]
+        if distances is not None:
+            for asset, distance in zip(assets, distances):
+                asset['distanceKm'] = round(float(distance), 3)
+        body = {'count': len(rows), 'truncated': len(rows) > limit, 'assets': assets}
+    return compressed_response(request, dumps(body))
+
+# bulk ingest: NDJSON (Content-Type application/x-ndjson, one Asset or GeoJSON Feature per line), or JSON (a
+# FeatureCollection, a list of Assets/Features, or one). Assets replace stored ones with the same id, ?replace=true
+# drops every stored asset first. Nothing is ingested if any record is invalid (422, with its position)
+@router.post("/assets")
+async def ingest_assets(request: Request, replace: bool = False):
+    content_type = request.headers.get('content-type', '')
+    body = await request.body()
+    try:
+        records = parse_assets(body, ndjson='ndjson' in content_type or 'jsonl' in content_type)
+        ingested, total = asset_store.ingest(records, replace=replace)
+    except AssetIngestError as e:
+        raise HTTPException(status_code=422, detail={'position': e.position, 'error': e.detail})
+    except AssetStoreFull as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return {'ingested': ingested, 'total': total}
+
+# number of stored assets, in total and per type
+@router.get("/assets")
+def get_asset_summary():
+    return asset_store.summary()
+
+# assets whose geometry intersects bbox=west,south,east,north, optionally only those of the given ?type= (repeatable)
+@router.get("/assets/bbox")
+def query_assets_bbox(request: Request, bbox: str, type: Optional[List[str]] = Query(default=None), limit: int = Query(default=QUERY_LIMIT, ge=0),
+                      format: Literal['assets', 'geojson'] = 'assets'):
+    columns, rows = asset_store.bbox(parse_bbox(bbox), type)
+    return _query_response(request, columns, rows, limit, format)
+
+# assets whose location is within radius_km of lon, lat, nearest first, each with its distanceKm
+@router.get("/assets/radius")
+def query_assets_radius(request: Request, lon: float = Query(ge=-180, le=180), lat: float = Query(ge=-90, le=90), radius_km: float = Query(gt=0),
+                        type: Optional[List[str]] = Query(default=None), limit: int = Query(default=QUERY_LIMIT, ge=0),
+                        format: Literal['assets', 'geojson'] = 'assets'):
+    columns, rows, distances = asset_store.radius(lon, lat, radius_km, type)
+    return _query_response(request, columns, rows, limit, format, distances[:limit])
+
+# assets whose geometry intersects the posted GeoJSON (a geometry, Feature or FeatureCollection, e.g. an operational area)
+@router.post("/assets/intersecting")
+async def query_assets_intersecting(request: Request, type: Optional[List[str]] = Query(default=None), limit: int = Query(default=QUERY_LIMIT, ge=0),
+                                    format: Literal['assets', 'geojson'] = 'assets'):
+    data = await request.json()
+    try:
+        if data.get('type') == 'FeatureCollection':
+            geometry = shapely.union_all([shape(f['geometry']) for f in data.get('features', []) if f.get('geometry')])
+        else:
+            geometry = shape(data['geometry'] if data.get('type') == 'Feature' else data)
+    except (KeyError, TypeError, ValueError, AttributeError, shapely.errors.ShapelyError) as e:
+        raise HTTPException(status_code=422, detail=f"invalid GeoJSON geometry ({e})")
+    columns, rows = asset_store.intersecting(geometry, type)
+    return _query_response(request, columns, rows, limit, format)
+
+@router.get("/assets/{asset_id}")
+def get_asset(asset_id: str):
+    asset = asset_store.get(asset_id)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return JSONResponse(asset)
+
+@router.delete("/assets/{asset_id}")
+def delete_asset(asset_id: str):
+    if not asset_store.delete(asset_id):
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return {"id": asset_id, "status": "deleted"}
+
+@router.delete("/assets")
+def clear_assets():
+    asset_store.clear()
+    return {"status": "cleared", "total": 0}
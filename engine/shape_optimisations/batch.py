@@ -0,0 +1,229 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Literal, Optional
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import iterate_in_threadpool
+from pydantic import ValidationError
+from models import BatchRequest, OptimiseOptions
+from shape_optimisations.georouter import optimise_feature_collection, geojson_to_multipolygon, is_cacheable
+from shape_optimisations.areas import as_feature_collection
+from shape_optimisations.assets import asset_store, assets_digest
+from shape_optimisations.cache import result_cache, result_cache_key
+from shape_optimisations.coverage import preload_templates
+from shape_optimisations.encoding import compact_result, dumps
+from shape_optimisations.metrics import observe_optimisation
+from shape_optimisations.sensors import catalog_configurations
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+"""
+Batch optimisation of many operational areas, each with many option sets, across a process pool
+
+Every (area, option set) pair is one run of optimise_feature_collection. Runs are spread over a pool of
+worker processes started from a forkserver with the optimisation modules preloaded. Each worker builds the
+fan templates of every sensor catalog in the batch once, when it starts, rather than in its first run.
+Results are yielded (streamed as NDJSON lines by the endpoint and the CLI) in the order they complete.
+
+Runs already in the result cache are answered without a worker, runs with the same cache key within a
+batch are solved once, and fresh results are cached and recorded in the metrics of the calling process
+(as jobs.py does, a worker's own cache and metrics die with it). The pool lives as long as its batch:
+a client disconnecting cancels the runs not yet started, those running finish first.
+
+    python -m shape_optimisations.batch geojson/areas/*.geojson --options '[{"solver": "highs"}]' > results.ndjson
+"""
+
+BATCH_WORKERS = int(os.environ.get("ENGINE_BATCH_WORKERS", os.cpu_count() or 1))
+BATCH_MAX_RUNS = int(os.environ.get("ENGINE_BATCH_MAX_RUNS", 500))
+POLL_S = 0.5  # how often a waiting batch checks whether it was cancelled
+
+DONE, FAILED = "success", "failed"
+
+
+def _init_worker(catalogs):
+    """ worker process start: the shared, read-only fan templates of each catalog, built once per worker """
+    for catalog in catalogs:
+        preload_templates(catalog_configurations(catalog))
+
+
+def _catalogs(runs):
+    """ distinct sensor catalogs (None for the default) of the runs' options """
+    catalogs = {}
+    for data in runs:
+        catalog = OptimiseOptions(**(data.get('options') or {})).sensor_catalog
+        catalogs.setdefault(json.dumps([s.model_dump() for s in catalog] if catalog else None, sort_keys=True), catalog)
+    return list(catalogs.values())
+
+
+def _prepare(data):
+    """ (options, assets, cache key) of a run, looked up here as the workers have no asset store """
+    options = OptimiseOptions(**(data.get('options') or {}))
+    area = geojson_to_multipolygon(data)
+    if area.is_empty:
+        raise ValueError("the area has no polygons")
+    assets = asset_store.optimiser_assets(area, options)
+    return options, assets, result_cache_key(area, options, assets_digest(assets))
+
+
+def run_batch(runs, workers=BATCH_WORKERS, cancel=None):
+    """
+    Optimises each run across a pool of worker processes
+
+    Args:
+        runs (list[dict]): FeatureCollections with their 'options', as POSTed to /optimise-polygon-coverage
+        workers (int): worker processes (no more than there are runs)
+        cancel (threading.Event | None): stops the batch once set, runs not yet started are dropped
+
+    Yields:
+        tuple(int, str, dict | str, bool): run index, DONE or FAILED, the optimisation response or the
+        error, and whether it came from the result cache, in completion order
+    """
+    solving = {}  # cache key -> (options, [run indices])
+    arguments = {}
+    for i, data in enumerate(runs):
+        try:
+            options, assets, key = _prepare(data)
+        except Exception as e:
+            yield i, FAILED, str(getattr(e, 'detail', e)), False
+            continue
+        cached = result_cache.get(key)
+        if cached is not None:
+            yield i, DONE, cached, True
+        elif key in solving:
+            solving[key][1].append(i)
+        else:
+            solving[key] = (options, [i])
+            arguments[key] = (data, None, assets)
+    if not solving:
+        return
+
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["shape_optimisations.georouter"])
+    pool = ProcessPoolExecutor(max_workers=max(1, min(workers, len(solving))), mp_context=context,
+                               initializer=_init_worker, initargs=(_catalogs(runs),))
+    try:
+        pending = {pool.submit(optimise_feature_collection, *arguments[key]): key for key in solving}
+        while pending:
+            finished, _ = wait(pending, timeout=POLL_S, return_when=FIRST_COMPLETED)
+            if cancel is not None and cancel.is_set():
+                return
+            for future in finished:
+                key = pending.pop(future)
+                options, indices = solving[key]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    for i in indices:
+                        yield i, FAILED, repr(e), False
+                    continue
+                observe_optimisation(result['stats'])
+                if is_cacheable(result, options):
+                    result_cache.put(key, result)
+                for i in indices:
+                    yield i, DONE, result, False
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def batch_runs(batch):
+    """ the run of every (area, option set) pair of a BatchRequest, and the (area name, option set index) of each """
+    runs, labels = [], []
+    for i, area in enumerate(batch.areas):
+        collection = as_feature_collection(area.geojson)
+        for j, options in enumerate(batch.option_sets):
+            runs.append({**collection, 'options': options.model_dump(exclude_unset=True)})
+            labels.append((area.name if area.name is not None else str(i), j))
+    return runs, labels
+
+
+def batch_lines(batch, workers=BATCH_WORKERS, format='geojson', precision=None, cancel=None):
+    """
+    NDJSON lines of a batch: one per run as it completes, its 'run', 'area', 'optionSet' and 'cached' plus the
+    optimisation response (or 'status' failed and its 'detail'), then a summary line with 'status' done
+    """
+    start = time.perf_counter()
+    runs, labels = batch_runs(batch)
+    failed = cached_runs = 0
+    for i, status, payload, cached in run_batch(runs, workers, cancel):
+        area, option_set = labels[i]
+        line = {'run': i, 'area': area, 'optionSet': option_set, 'cached': cached}
+        if status == DONE:
+            line.update(compact_result(payload, precision) if format == 'compact' else payload)
+        else:
+            logger.warning("Batch run %d (%s, option set %d) failed: %s", i, area, option_set, payload)
+            line.update(status=FAILED, detail=payload)
+        failed += status == FAILED or line['status'] == FAILED
+        cached_runs += cached
+        yield dumps(line) + b"\n"
+    yield dumps({'status': 'done', 'runs': len(runs), 'failed': failed, 'cached': cached_runs, 'workers': workers,
+                 'totalTime': round(time.perf_counter() - start, 4)}) + b"\n"
+
+
+def parse_batch(data):
+    try:
+        batch = BatchRequest(**data)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+    if len(batch.areas) * len(batch.option_sets) > BATCH_MAX_RUNS:
+        raise HTTPException(status_code=422, detail=f"{len(batch.areas)} areas x {len(batch.option_sets)} option sets is more than {BATCH_MAX_RUNS} runs")
+    return batch
+
+# body: {"areas": [{"name", "geojson"}], "option_sets": [options as /optimise-polygon-coverage], "workers"}, every
+# area is optimised with every option set and the results stream back as NDJSON lines as they complete
+# (?format=compact and ?precision= as /optimise-polygon-coverage)
+@router.post("/optimise-polygon-coverage/batch")
+async def batch_optimise_polygon_coverage(request: Request, format: Literal['geojson', 'compact'] = 'geojson', precision: Optional[int] = Query(default=None, ge=0, le=9)):
+    batch = parse_batch(await request.json())
+    workers = min(batch.workers or BATCH_WORKERS, BATCH_WORKERS)
+    logger.info("Batch of %d areas x %d option sets on %d workers", len(batch.areas), len(batch.option_sets), workers)
+    cancel = threading.Event()
+
+    async def stream():
+        try:
+            async for line in iterate_in_threadpool(batch_lines(batch, workers, format, precision, cancel)):
+                yield line
+        finally:
+            # client gone (or batch done), runs not yet started are dropped
+            cancel.set()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
+
+
+def _read_area(path):
+    with open(path) as f:
+        return {'name': os.path.splitext(os.path.basename(path))[0], 'geojson': json.load(f)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="optimise many areas with many option sets, run from the engine directory")
+    parser.add_argument("areas", nargs="+", help="GeoJSON files, e.g. geojson/areas/*.geojson")
+    parser.add_argument("--options", default="[{}]", help="JSON list of option sets (or a path to one), each run against every area")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--format", choices=["geojson", "compact"], default="geojson")
+    parser.add_argument("--precision", type=int, default=None)
+    parser.add_argument("--output", default=None, help="NDJSON file, defaults to stdout")
+    args = parser.parse_args()
+    logging.basicConfig(level=os.environ.get("ENGINE_LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if os.path.exists(args.options):
+        with open(args.options) as f:
+            args.options = f.read()
+    try:
+        batch = BatchRequest(areas=[_read_area(path) for path in args.areas], option_sets=json.loads(args.options))
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for line in batch_lines(batch, args.workers, args.format, args.precision):
+            output.write(line)
+            output.flush()
+    finally:
+        if args.output:
+            output.close()
@@ -0,0 +1,166 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import shapely
+
+"""
+Content-addressed cache of optimisation results
+
+Results are keyed by a hash of the normalised operational area plus every parameter that affects the
+solve, so a re-submitted area (even with its rings started at a different vertex, reversed, or with
+sub-centimetre coordinate noise) is answered without re-running the grid, coverage and MILP steps.
+
+Two tiers:
+    memory - LRU, evicted by the serialised size of the stored results
+    disk   - optional (ENGINE_RESULT_CACHE_DIR), one JSON file per key, survives restarts
+"""
+
+RESULT_CACHE_MB = float(os.environ.get("ENGINE_RESULT_CACHE_MB", 64))
+RESULT_CACHE_DIR = os.environ.get("ENGINE_RESULT_CACHE_DIR")
+RESULT_CACHE_DISK_MB = float(os.environ.get("ENGINE_RESULT_CACHE_DISK_MB", 1024))
+GEOMETRY_PRECISION_DEG = 1e-7  # ~1cm, coordinates are snapped to this grid before hashing
+CACHE_VERSION = 6  # bump when the optimisation output changes so stale disk entries are ignored
+
+
+def canonical_geometry_wkb(geom):
+    """ WKB of the geometry snapped to GEOMETRY_PRECISION_DEG and normalised (ring order/start/orientation) """
+    return shapely.to_wkb(shapely.normalize(shapely.set_precision(geom, GEOMETRY_PRECISION_DEG)))
+
+
+def result_cache_key(geom, options, extra=None):
+    """
+    Args:
+        geom (shapely geometry): operational area
+        options (pydantic.BaseModel): every solver parameter (resolution, sensors, requirements...)
+        extra (bytes | None): anything else the result depends on (e.g. assets.assets_digest)
+
+    Returns:
+        str: sha256 hex digest
+    """
+    digest = hashlib.sha256()
+    digest.update(f"v{CACHE_VERSION}".encode())
+    digest.update(canonical_geometry_wkb(geom))
+    digest.update(json.dumps(options.model_dump(mode="json"), sort_keys=True).encode())
+    if extra is not None:
+        digest.update(extra)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    Two tier LRU of JSON-serialisable results
+
+    Args:
+        max_bytes (int): memory tier budget, measured as serialised JSON size
+        disk_dir (str | None): directory of the disk tier, disabled when None
+        max_disk_bytes (int): disk tier budget, least recently written files are removed first
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, max_disk_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()  # key -> (result, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counts = {"memoryHits": 0, "diskHits": 0, "misses": 0, "evictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _remember(self, key, result, size):
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (result, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._counts["evictions"] += 1
+
+    def _read(self, key):
+        """ (result, serialised size) of the key's disk tier file, None when there is none or it is unreadable """
+        if not self.disk_dir or not os.path.exists(self._path(key)):
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                raw = f.read()
+            return json.loads(raw), len(raw)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._counts["memoryHits"] += 1
+                return self._entries[key][0]
+        read = self._read(key)
+        if read is not None:
+            with self._lock:
+                self._counts["diskHits"] += 1
+                self._remember(key, *read)
+            return read[0]
+        with self._lock:
+            self._counts["misses"] += 1
+        return None
+
+    def peek(self, key):
+        """ the cached result like get, without counting it or refreshing its recency (e.g. for other layers reading a result) """
+        with self._lock:
+            if key in self._entries:
+                return self._entries[key][0]
+        read = self._read(key)
+        return None if read is None else read[0]
+
+    def put(self, key, result):
+        raw = json.dumps(result).encode()
+        with self._lock:
+            self._remember(key, result, len(raw))
+        if self.disk_dir:
+            tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(raw)
+            os.replace(tmp_path, self._path(key))
+            self._prune_disk()
+
+    def _prune_disk(self):
+        files = [os.path.join(self.disk_dir, f) for f in os.listdir(self.disk_dir) if f.endswith(".json")]
+        sized = sorted((os.stat(f).st_mtime, os.stat(f).st_size, f) for f in files)
+        total = sum(size for _, size, _ in sized)
+        for _, size, path in sized:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._counts,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                maxBytes=self.max_bytes,
+                diskEnabled=bool(self.disk_dir),
+            )
+
+
+result_cache = ResultCache(
+    max_bytes=int(RESULT_CACHE_MB * 1024 * 1024),
+    disk_dir=RESULT_CACHE_DIR,
+    max_disk_bytes=int(RESULT_CACHE_DISK_MB * 1024 * 1024),
+)
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+import shapely
+from fastapi import HTTPException
+from shapely.geometry import box, mapping, shape
+from shape_optimisations.encoding import dumps
+
+"""
+Catalog of the pre-loaded operational areas (GEOJSON_DIR)
+
+Every file is read and parsed once, its member geometries (the geometries of a GeometryCollection, the
+features of a FeatureCollection) indexed with an STRtree, and a content hash kept as its ETag. The
+directory is re-scanned at most every CATALOG_REFRESH_S seconds, only files whose size or mtime changed
+are parsed again.
+
+Queries can be limited to the members intersecting a bbox (the Cesium viewport) and simplified to a
+tolerance of SIMPLIFY_PIXELS web-mercator pixels at a zoom level, the simplified geometries are kept
+per zoom.
+"""
+
+CATALOG_REFRESH_S = float(os.environ.get("ENGINE_CATALOG_REFRESH_S", 2))
+SIMPLIFY_PIXELS = 0.5
+TILE_SIZE_PX = 256
+
+
+def zoom_tolerance(zoom):
+    """ simplification tolerance (degrees) of SIMPLIFY_PIXELS at a web-mercator zoom level """
+    return SIMPLIFY_PIXELS * 360 / (TILE_SIZE_PX * 2 ** zoom)
+
+
+def bbox_geometry(bbox):
+    """ (west, south, east, north) as a shapely geometry, a west > east box crosses the antimeridian """
+    west, south, east, north = bbox
+    if west > east:
+        return shapely.union(box(west, south, 180, north), box(-180, south, east, north))
+    return box(west, south, east, north)
+
+
+def parse_bbox(bbox):
+    """ 'west,south,east,north' query parameter as a tuple of floats """
+    if bbox is None:
+        return None
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="bbox must be 'west,south,east,north' in degrees")
+    if south > north:
+        raise HTTPException(status_code=422, detail="bbox south is above north")
+    return (west, south, east, north)
+
+
+def _etag(*parts):
+    return '"' + hashlib.sha256("|".join(str(p) for p in parts).encode()).hexdigest()[:32] + '"'
+
+
+class CatalogArea:
+    """ one parsed area file: raw bytes, ETag, member geometries and their index """
+
+    def __init__(self, name, path, stamp, raw):
+        self.name, self.path, self.stamp, self.raw = name, path, stamp, raw
+        self.etag = '"' + hashlib.sha256(raw).hexdigest()[:32] + '"'
+        data = json.loads(raw)
+        self.kind = data['type']
+        if self.kind == 'FeatureCollection':
+            self.members = data.get('features', [])
+            geometries = [m.get('geometry') for m in self.members]
+        elif self.kind == 'GeometryCollection':
+            self.members = data.get('geometries', [])
+            geometries = self.members
+        else:
+            # a single Feature or geometry is served as a collection of one
+            self.kind = 'FeatureCollection' if self.kind == 'Feature' else 'GeometryCollection'
+            self.members = [data]
+            geometries = [data.get('geometry') if data['type'] == 'Feature' else data]
+        self.geometries = np.array([shape(g) if g else shapely.Polygon() for g in geometries], dtype=object)
+        self.tree = shapely.STRtree(self.geometries)
+        self.extent = box(*shapely.total_bounds(self.geometries)) if len(self.geometries) else shapely.Polygon()
+        self._simplified = {}
+
+    def simplified(self, zoom):
+        if zoom not in self._simplified:
+            self._simplified[zoom] = shapely.simplify(self.geometries, zoom_tolerance(zoom), preserve_topology=True)
+        return self._simplified[zoom]
+
+    def query(self, bbox=None, zoom=None):
+        """
+        Args:
+            bbox (tuple | None): (west, south, east, north), only the members intersecting it are returned
+            zoom (int | None): simplify the members for this zoom level
+
+        Returns:
+            tuple(bytes, str): the GeoJSON body and its ETag
+        """
+        if bbox is None and zoom is None:
+            return self.raw, self.etag
+        idx = np.arange(len(self.members)) if bbox is None else np.sort(self.tree.query(bbox_geometry(bbox), predicate='intersects'))
+        geometries = self.simplified(zoom) if zoom is not None else None
+        members = []
+        for i in idx:
+            member = self.members[i]
+            if geometries is not None:
+                geometry = mapping(geometries[i])
+                member = dict(member, geometry=geometry) if self.kind == 'FeatureCollection' else geometry
+            members.append(member)
+        key = 'features' if self.kind == 'FeatureCollection' else 'geometries'
+        return dumps({'type': self.kind, key: members}), _etag(self.etag, bbox, zoom)
+
+
+class AreaCatalog:
+    """
+    Parsed, indexed GeoJSON files of a directory, re-scanned for changes at most every refresh_s
+
+    Args:
+        directory (str): directory of *.geojson files, the file name without extension is the area name
+        refresh_s (float): seconds between directory scans
+    """
+
+    def __init__(self, directory, refresh_s=CATALOG_REFRESH_S):
+        self.directory = directory
+        self.refresh_s = refresh_s
+        self._areas = {}
+        self._names = []
+        self._names_etag = _etag()
+        self._tree = None
+        self._checked = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.refresh_s:
+            return
+        with self._lock:
+            if self._checked is not None and now - self._checked < self.refresh_s:
+                return
+            areas = {}
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if not entry.name.endswith(".geojson") or not entry.is_file():
+                        continue
+                    name = os.path.splitext(entry.name)[0]
+                    stat = entry.stat()
+                    stamp = (stat.st_mtime_ns, stat.st_size)
+                    area = self._areas.get(name)
+                    if area is None or area.stamp != stamp:
+                        with open(entry.path, 'rb') as f:
+                            area = CatalogArea(name, entry.path, stamp, f.read())
+                    areas[name] = area
+            if areas.keys() != self._areas.keys() or any(areas[n] is not self._areas[n] for n in areas):
+                self._areas = areas
+                self._names = sorted(areas)
+                self._names_etag = _etag(*(areas[n].etag for n in self._names), *self._names)
+                self._tree = shapely.STRtree([areas[n].extent for n in self._names]) if areas else None
+            self._checked = now
+
+    def names(self, bbox=None):
+        """
+        Returns:
+            tuple(list[str], str): area names (those with a member intersecting bbox, when given) and their ETag
+        """
+        self._refresh()
+        names, tree, areas = self._names, self._tree, self._areas
+        if bbox is None or tree is None:
+            return list(names), self._names_etag
+        window = bbox_geometry(bbox)
+        hits = [names[i] for i in np.sort(tree.query(window, predicate='intersects'))]
+        hits = [n for n in hits if len(areas[n].tree.query(window, predicate='intersects'))]
+        return hits, _etag(self._names_etag, bbox)
+
+    def get(self, name):
+        """ CatalogArea of the name, None if there is no such file """
+        self._refresh()
+        return self._areas.get(name)
+
+
+def etag_matches(if_none_match, etag):
+    """ whether an If-None-Match header matches the ETag (weak comparison, as for GET) """
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return '*' in tags or etag in [t[2:] if t.startswith('W/') else t for t in tags]
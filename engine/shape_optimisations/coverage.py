@@ -0,0 +1,232 @@
+from functools import lru_cache
+import numpy as np
+import shapely
+from shapely.geometry import Polygon
+
+"""
+Bulk sensor coverage calculations
+
+Coverage fans are built for every (location, configuration) pair in one vectorised pass and tested
+against all demand points with a single STRtree query, rather than a Python loop of
+Polygon.contains(Point) calls. The fan geometry is identical to create_fan_polygon so the coverage
+results match the original polygon test exactly
+
+Fans are translated and scaled copies of a cached unit template per (range, azimuth, fan angle), so
+the arc trig is only ever evaluated once per sensor configuration. The longitude scaling by
+1/cos(latitude) is applied per centre rather than per latitude band, which keeps it exact
+"""
+
+EARTH_RADIUS_KM = 6371
+FAN_ARC_POINTS = 20
+
+
+@lru_cache(maxsize=1024)
+def fan_template(range_km, orientation_deg, fan_angle_deg):
+    """
+    Arc offsets (in degrees, before longitude scaling) of a fan centred on (0, 0)
+
+    Returns:
+        np.ndarray: read-only shape (FAN_ARC_POINTS, 2) of (d_lon * cos(lat), d_lat)
+    """
+    range_deg = (range_km / EARTH_RADIUS_KM) * (180 / np.pi)
+    angles = np.linspace(orientation_deg - fan_angle_deg / 2,
+                         orientation_deg + fan_angle_deg / 2,
+                         FAN_ARC_POINTS)
+    template = np.stack([range_deg * np.sin(np.radians(angles)), range_deg * np.cos(np.radians(angles))], axis=-1)
+    template.flags.writeable = False
+    return template
+
+
+def configuration_key(config):
+    return (float(config['range_km']), float(config['azimuth_degree']), float(config['fan_degree']))
+
+
+@lru_cache(maxsize=128)
+def _stacked_templates(config_keys):
+    templates = np.stack([fan_template(*key) for key in config_keys])
+    templates.flags.writeable = False
+    return templates
+
+
+def preload_templates(configurations):
+    """ builds and caches the stacked fan templates of the configurations, e.g. once per worker process """
+    return _stacked_templates(tuple(configuration_key(c) for c in configurations))
+
+
+def _place_templates(center_lon, center_lat, templates):
+    """ translates templates (..., FAN_ARC_POINTS, 2) to centres broadcast against their leading axes """
+    center_lon = np.asarray(center_lon, dtype=float)[..., None]
+    center_lat = np.asarray(center_lat, dtype=float)[..., None]
+    d_lon = templates[..., 0] / np.cos(np.radians(center_lat))
+    arc = np.stack([center_lon + d_lon, center_lat + templates[..., 1]], axis=-1)
+    center = np.stack(np.broadcast_arrays(center_lon, center_lat), axis=-1)
+    center = np.broadcast_to(center, arc.shape[:-2] + (1, 2))
+    return np.concatenate([center, arc], axis=-2)
+
+
+def fan_polygon_coords(center_lon, center_lat, range_km, orientation_deg, fan_angle_deg):
+    """
+    Fan ring coordinates for one sensor configuration at one or many centres
+
+    Returns:
+        np.ndarray: shape (..., FAN_ARC_POINTS + 1, 2) of (lon, lat) vertices, centre first
+    """
+    template = fan_template(float(range_km), float(orientation_deg), float(fan_angle_deg))
+    return _place_templates(center_lon, center_lat, template)
+
+
+def create_fan_polygon(center_lon, center_lat, range_km, orientation_deg, fan_angle_deg):
+    return Polygon(fan_polygon_coords(center_lon, center_lat, range_km, orientation_deg, fan_angle_deg))
+
+
+def create_fan_polygons(lons, lats, configurations):
+    """
+    Builds the fan for every (location, configuration) pair
+
+    Returns:
+        np.ndarray: shapely Polygons of shape (len(lons), len(configurations)), location major
+    """
+    templates = _stacked_templates(tuple(configuration_key(c) for c in configurations))
+    lons = np.asarray(lons, dtype=float)[:, None]
+    lats = np.asarray(lats, dtype=float)[:, None]
+    return shapely.polygons(_place_templates(lons, lats, templates[None]))
+
+
+class CoverageMatrix:
+    """
+    Sparse (COO) coverage between demand points (rows) and placement columns, where column
+    l * num_configs + j is configuration j placed at candidate location l
+
+    covers[i, l, j] of the original dense tensor is 1 exactly when (i, l * num_configs + j) is stored
+
+    A presolved matrix (see presolve.py) keeps only some of those columns, numbered 0.. in their original
+    order, and column_location gives the candidate location of each
+    """
+
+    def __init__(self, rows, cols, num_demand, num_locations, num_configs, column_location=None):
+        order = np.lexsort((cols, rows))
+        self.rows = np.asarray(rows, dtype=np.int64)[order]
+        self.cols = np.asarray(cols, dtype=np.int64)[order]
+        self.num_demand = num_demand
+        self.num_locations = num_locations
+        self.num_configs = num_configs
+        self._column_location = None if column_location is None else np.asarray(column_location, dtype=np.int64)
+
+    @property
+    def num_columns(self):
+        if self._column_location is not None:
+            return len(self._column_location)
+        return self.num_locations * self.num_configs
+
+    @property
+    def column_location(self):
+        """candidate location of each placement column"""
+        if self._column_location is not None:
+            return self._column_location
+        return np.arange(self.num_columns) // max(self.num_configs, 1)
+
+    @property
+    def shape(self):
+        return (self.num_demand, self.num_columns)
+
+    @property
+    def nnz(self):
+        return len(self.rows)
+
+    def row_pointers(self):
+        """CSR row pointers into cols, so row i covers cols[indptr[i]:indptr[i + 1]]"""
+        return np.concatenate([[0], np.cumsum(np.bincount(self.rows, minlength=self.num_demand))])
+
+    def to_scipy(self):
+        """scipy.sparse CSR matrix (scipy is only needed by the matrix-native solver backends)"""
+        from scipy.sparse import csr_matrix
+        data = np.ones(self.nnz)
+        return csr_matrix((data, self.cols, self.row_pointers()), shape=self.shape)
+
+    def cover_counts(self, placed):
+        """number of placed columns (bool per column) covering each demand point"""
+        return np.bincount(self.rows[placed[self.cols]], minlength=self.num_demand)
+
+    def to_dense(self):
+        """Dense (demand, location, config) tensor in the layout calculateOptimise originally built"""
+        covers = np.zeros((self.num_demand, self.num_locations, self.num_configs))
+        covers[self.rows, self.cols // self.num_configs, self.cols % self.num_configs] = 1
+        return covers
+
+
+def compute_coverage(candidate_lons, candidate_lats, configurations, demand_lons=None, demand_lats=None):
+    """
+    Computes which demand points each (candidate location, configuration) fan contains
+
+    Demand points default to the candidate locations themselves. Fans are built in bulk and the demand
+    points indexed with an STRtree so the 'contains' predicate only runs on bounding-box candidates
+
+    Returns:
+        CoverageMatrix
+    """
+    if demand_lons is None:
+        demand_lons, demand_lats = candidate_lons, candidate_lats
+    candidate_lons = np.asarray(candidate_lons, dtype=float)
+    demand_points = shapely.points(np.asarray(demand_lons, dtype=float), np.asarray(demand_lats, dtype=float))
+    num_locations, num_configs = len(candidate_lons), len(configurations)
+
+    if num_locations == 0 or num_configs == 0 or len(demand_points) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return CoverageMatrix(empty, empty, len(demand_points), num_locations, num_configs)
+
+    fans = create_fan_polygons(candidate_lons, candidate_lats, configurations).ravel()
+    tree = shapely.STRtree(demand_points)
+    fan_idx, demand_idx = tree.query(fans, predicate='contains')
+    return CoverageMatrix(demand_idx, fan_idx, len(demand_points), num_locations, num_configs)
+
+
+def update_coverage(coverage, candidate_lons, candidate_lats, configurations, demand_lons, demand_lats, old_candidate, old_demand):
+    """
+    CoverageMatrix for edited candidate and demand point sets, from the coverage of the previous sets
+
+    Entries between points both sets share are copied over, only new candidate locations (against every
+    demand point) and new demand points (against the kept candidates within sensor range) are tested
+
+    Args:
+        coverage (CoverageMatrix): coverage of the previous sets, with the same configurations
+        old_candidate (np.ndarray): previous index of each candidate location, -1 where it is new
+        old_demand (np.ndarray): previous index of each demand point, -1 where it is new
+
+    Returns:
+        CoverageMatrix
+    """
+    candidate_lons, candidate_lats = np.asarray(candidate_lons, dtype=float), np.asarray(candidate_lats, dtype=float)
+    demand_lons, demand_lats = np.asarray(demand_lons, dtype=float), np.asarray(demand_lats, dtype=float)
+    num_configs = len(configurations)
+    kept_candidates, new_candidates = np.flatnonzero(old_candidate >= 0), np.flatnonzero(old_candidate < 0)
+    kept_demand, new_demand = np.flatnonzero(old_demand >= 0), np.flatnonzero(old_demand < 0)
+
+    location_map = np.full(coverage.num_locations, -1)
+    location_map[old_candidate[kept_candidates]] = kept_candidates
+    demand_map = np.full(coverage.num_demand, -1)
+    demand_map[old_demand[kept_demand]] = kept_demand
+    locations, rows = location_map[coverage.cols // num_configs], demand_map[coverage.rows]
+    keep = (locations >= 0) & (rows >= 0)
+    all_rows = [rows[keep]]
+    all_cols = [locations[keep] * num_configs + coverage.cols[keep] % num_configs]
+
+    def add(part, candidate_idx, demand_idx):
+        all_rows.append(demand_idx[part.rows])
+        all_cols.append(candidate_idx[part.cols // num_configs] * num_configs + part.cols % num_configs)
+
+    if len(new_candidates):
+        add(compute_coverage(candidate_lons[new_candidates], candidate_lats[new_candidates], configurations, demand_lons, demand_lats),
+            new_candidates, np.arange(len(demand_lons)))
+    if len(new_demand) and len(kept_candidates):
+        # kept candidates whose fan bounding box (widest range, longitude scaled at the centre) reaches a new point
+        range_deg = max(c['range_km'] for c in configurations) / EARTH_RADIUS_KM * (180 / np.pi)
+        lons, lats = candidate_lons[kept_candidates], candidate_lats[kept_candidates]
+        lon_range = range_deg / np.cos(np.radians(lats))
+        boxes = shapely.box(lons - lon_range, lats - range_deg, lons + lon_range, lats + range_deg)
+        reaching, _ = shapely.STRtree(shapely.points(demand_lons[new_demand], demand_lats[new_demand])).query(boxes)
+        near = kept_candidates[np.unique(reaching)]
+        if len(near):
+            add(compute_coverage(candidate_lons[near], candidate_lats[near], configurations, demand_lons[new_demand], demand_lats[new_demand]),
+                near, new_demand)
+
+    return CoverageMatrix(np.concatenate(all_rows), np.concatenate(all_cols), len(demand_lons), len(candidate_lons), num_configs)
@@ -0,0 +1,290 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from shape_optimisations.coverage import CoverageMatrix
+from shape_optimisations.solvers import solve_placement, solve_max_coverage
+
+"""
+Decomposition of the placement problem into independent components
+
+Demand points and candidate locations that no sensor fan links (e.g. the parts of a MultiPolygon
+further apart than any sensor range) form separate connected components of the coverage graph, and
+the MILP only couples them through the two global rows: total coverage >= requirement and total
+sensors <= max_sensors.
+
+The coordinating step allocates those budgets exactly. Each component k has a curve
+g_k(s) = most demand points coverable with s sensors, and the monolithic optimum is the smallest total
+S whose best split (a max-plus knapsack over the curves) reaches the coverage requirement. The curves
+are only evaluated where needed: every component first solves for its own share of the requirement
+(in parallel) which gives an incumbent, then optimistic (upper bound) curves propose cheaper splits
+whose unknown points are evaluated with small max-coverage solves, until no split below the incumbent
+can reach the requirement. The per-component placements of the final split are merged into the result.
+
+Proving that bound takes extra solves, so on small inputs the exact mode is slower than the monolithic
+model, it pays off when components are large (MILP time grows faster than linearly) and run in parallel.
+The 'proportional' mode stops after the first, parallel round and reports the bound instead.
+
+This is exact when every sensor costs the same, every demand point counts the same and overlap is not
+rewarded, otherwise (or with a single component) the monolithic solve is used.
+"""
+
+DECOMPOSE_WORKERS = int(os.environ.get("ENGINE_DECOMPOSE_WORKERS", os.cpu_count() or 1))
+
+
+def coverage_components(coverage):
+    """
+    Connected components of the bipartite demand point / candidate location coverage graph
+
+    Returns:
+        tuple(np.ndarray, np.ndarray): component label per demand point and per candidate location
+    """
+    num_demand = coverage.num_demand
+    u = coverage.rows
+    v = num_demand + coverage.cols // coverage.num_configs
+    labels = np.arange(num_demand + coverage.num_locations)
+    while True:
+        previous = labels.copy()
+        m = np.minimum(labels[u], labels[v])
+        np.minimum.at(labels, u, m)
+        np.minimum.at(labels, v, m)
+        labels = labels[labels]  # pointer jumping
+        if np.array_equal(labels, previous):
+            break
+    _, labels = np.unique(labels, return_inverse=True)
+    return labels[:num_demand], labels[num_demand:]
+
+
+def sub_coverage(coverage, demand_idx, location_idx):
+    """ the CoverageMatrix restricted to one component, rows/locations renumbered in the given order """
+    demand_map = np.full(coverage.num_demand, -1)
+    demand_map[demand_idx] = np.arange(len(demand_idx))
+    location_map = np.full(coverage.num_locations, -1)
+    location_map[location_idx] = np.arange(len(location_idx))
+    keep = demand_map[coverage.rows] >= 0
+    rows = demand_map[coverage.rows[keep]]
+    cols = coverage.cols[keep]
+    cols = location_map[cols // coverage.num_configs] * coverage.num_configs + cols % coverage.num_configs
+    return CoverageMatrix(rows, cols, len(demand_idx), len(location_idx), coverage.num_configs)
+
+
+def _top_fan_points(coverage, max_sensors):
+    """ top[s] = points covered by the s largest fans at distinct locations, counted with overlaps """
+    per_column = np.bincount(coverage.cols, minlength=coverage.num_columns)
+    per_location = np.sort(per_column.reshape(coverage.num_locations, coverage.num_configs).max(axis=1))[::-1]
+    top = np.zeros(max_sensors + 1)
+    counts = np.cumsum(per_location[:max_sensors])
+    top[1:len(counts) + 1] = counts
+    top[len(counts) + 1:] = counts[-1] if len(counts) else 0
+    return top
+
+
+def _best_allocation(curves):
+    """
+    Max-plus knapsack over per-component curves (curve[s] = points covered with s sensors)
+
+    Returns:
+        tuple(np.ndarray, list[np.ndarray]): best[t] most points coverable with t sensors in total, and the
+        per-component choices used to recover an allocation with _allocation
+    """
+    total = len(curves[0]) - 1
+    best = np.zeros(total + 1)
+    choices = []
+    for curve in curves:
+        combined = np.empty(total + 1)
+        choice = np.zeros(total + 1, dtype=np.int64)
+        for t in range(total + 1):
+            candidates = best[t - np.arange(t + 1)] + curve[:t + 1]
+            choice[t] = int(np.argmax(candidates))
+            combined[t] = candidates[choice[t]]
+        best = combined
+        choices.append(choice)
+    return best, choices
+
+
+def _allocation(choices, t):
+    allocation = []
+    for choice in reversed(choices):
+        allocation.append(int(choice[t]))
+        t -= choice[t]
+    return allocation[::-1]
+
+
+def _first_reaching(best, required, limit):
+    """ smallest total t <= limit with best[t] >= required, or None """
+    reaching = np.flatnonzero(best[:limit + 1] >= required)
+    return int(reaching[0]) if len(reaching) else None
+
+
+def solve_decomposed(coverage, max_sensors, coverage_requirement, encourage_overlapping=False, solver='pulp', column_costs=None, mode='exact', demand_weights=None,
+                     initial_placement=None, limits=None, progress=None, presolve=True, workers=DECOMPOSE_WORKERS):
+    """
+    solve_placement, split into independent components where that is exact
+
+    Args:
+        mode (str): 'exact' closes the allocation search (same optimum as the monolithic model),
+                    'proportional' stops at the incumbent where each component covers its own share, which
+                    is always feasible, reported 'Optimal' only when the bound proves it
+        initial_placement (np.ndarray | None): a feasible placement, its part in each component is a first
+                                               incumbent
+        limits (dict | None): as solve_placement, 'time_limit_s' bounds the whole search (each component solve
+                              gets the time left) and 'gap_rel' stops it once the incumbent is within that gap
+                              of the bound, the incumbent is then returned with status 'Feasible'
+        progress (callable | None): as solve_placement, called with the incumbent and bound (in sensors) as the
+                                    allocation search improves them
+        (others as solve_placement)
+
+    Returns:
+        dict: as solve_placement, plus 'components' (the number of independent components found) and
+              'lower_bound' (fewest sensors any placement could need), 'gap' is measured against it
+    """
+    limits = limits or {}
+    unit_costs = column_costs is None or np.all(np.asarray(column_costs) == 1)
+    unit_weights = demand_weights is None or np.all(np.asarray(demand_weights) == 1)
+    demand_labels, location_labels = coverage_components(coverage)
+    # components without demand points never need a sensor
+    component_ids = np.unique(demand_labels)
+
+    if len(component_ids) < 2 or encourage_overlapping or not unit_costs or not unit_weights:
+        solution = solve_placement(coverage, max_sensors, coverage_requirement, encourage_overlapping, solver=solver, column_costs=column_costs,
+                                   initial_placement=initial_placement, limits=limits, progress=progress, demand_weights=demand_weights, presolve=presolve)
+        solution['components'] = len(component_ids)
+        solution['lower_bound'] = None
+        return solution
+
+    build_start = time.perf_counter()
+    deadline = None if limits.get('time_limit_s') is None else build_start + limits['time_limit_s']
+    max_sensors = int(max_sensors)
+    components = []
+    for k in component_ids:
+        demand_idx = np.flatnonzero(demand_labels == k)
+        location_idx = np.flatnonzero(location_labels == k)
+        components.append({
+            'demand_idx': demand_idx,
+            'location_idx': location_idx,
+            'coverage': sub_coverage(coverage, demand_idx, location_idx),
+            'points': {0: (0, None)},  # sensors -> (points covered, solution), achievable placements
+            'exact': {0},              # sensor counts whose points are the proven maximum g_k(s)
+        })
+        components[-1]['top_fans'] = _top_fan_points(components[-1]['coverage'], max_sensors)
+    required = int(np.ceil(coverage_requirement * coverage.num_demand - 1e-9))
+    build_time = time.perf_counter() - build_start
+
+    def lower_curve(c):
+        """ points certainly coverable with s sensors (from the placements found so far) """
+        curve = np.zeros(max_sensors + 1)
+        for s, (points, _) in c['points'].items():
+            if s <= max_sensors:
+                curve[s] = max(curve[s], points)
+        return np.maximum.accumulate(curve)
+
+    def upper_curve(c):
+        """
+        points possibly coverable with s sensors: at most n_k, at most the s largest fans (one per location)
+        combined, non-decreasing, and subadditive (g(a + b) <= g(a) + g(b)) around the proven points
+        """
+        curve = np.full(max_sensors + 1, float(len(c['demand_idx'])))
+        curve = np.minimum(curve, c['top_fans'][:max_sensors + 1])
+        for s in c['exact']:
+            if s <= max_sensors:
+                curve[s] = min(curve[s], c['points'][s][0])
+        for s in range(2, max_sensors + 1):
+            curve[s] = min(curve[s], np.min(curve[1:s] + curve[s - 1:0:-1]))
+        return np.maximum(np.minimum.accumulate(curve[::-1])[::-1], lower_curve(c))
+
+    def record(c, solution, exact, sensors=None):
+        sensors = int(solution['placed'].sum()) if sensors is None else sensors
+        points = int(solution['covered'].sum())
+        if sensors not in c['points'] or c['points'][sensors][0] < points:
+            c['points'][sensors] = (points, solution)
+        if exact:
+            c['exact'].add(sensors)
+
+    def sub_limits():
+        """ the limits of one component solve, with whatever is left of the time limit """
+        if deadline is None:
+            return limits
+        return dict(limits, time_limit_s=max(deadline - time.perf_counter(), 0.01))
+
+    if initial_placement is not None:
+        # the initial placement restricted to each component is an achievable point of its curve
+        for c in components:
+            placed = np.asarray(initial_placement, dtype=bool).reshape(-1, coverage.num_configs)[c['location_idx']].ravel()
+            record(c, {'placed': placed, 'covered': c['coverage'].cover_counts(placed) > 0}, exact=False)
+
+    status = None
+    reported = None
+    out_of_time = False
+    solve_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(components)))) as pool:
+        # incumbent: every component covers its own share of the requirement
+        share = [min(len(c['demand_idx']), int(np.ceil(coverage_requirement * len(c['demand_idx']) - 1e-9))) for c in components]
+        futures = [pool.submit(solve_placement, c['coverage'], max_sensors, (r - 1e-6) / len(c['demand_idx']), solver=solver, limits=sub_limits(), presolve=presolve)
+                   for c, r in zip(components, share)]
+        for c, future in zip(components, futures):
+            solution = future.result()
+            if solution['status'] in ('Optimal', 'Feasible'):
+                record(c, solution, exact=False)
+
+        # branch and bound over the sensor allocation: stop once no total below the incumbent can reach the
+        # requirement even on the optimistic curves, otherwise evaluate the optimistic allocation exactly
+        while status is None:
+            best_lower, lower_choices = _best_allocation([lower_curve(c) for c in components])
+            incumbent = _first_reaching(best_lower, required, max_sensors)
+            limit = max_sensors if incumbent is None else incumbent - 1
+            best_upper, upper_choices = _best_allocation([upper_curve(c) for c in components])
+            candidate = _first_reaching(best_upper, required, limit)
+            lower_bound = candidate if candidate is not None else incumbent
+            if progress is not None and incumbent is not None and (incumbent, lower_bound) != reported:
+                reported = (incumbent, lower_bound)
+                progress('progress', {'objective': incumbent, 'bound': lower_bound, 'gap': (incumbent - lower_bound) / max(incumbent, 1),
+                                      'elapsed': round(time.perf_counter() - solve_start, 3)})
+            if candidate is None:
+                status = 'Infeasible' if incumbent is None else 'Optimal'
+                break
+            within_gap = incumbent is not None and limits.get('gap_rel') is not None and (incumbent - lower_bound) / max(incumbent, 1) <= limits['gap_rel']
+            out_of_time = out_of_time or (deadline is not None and time.perf_counter() >= deadline)
+            if (mode == 'proportional' and incumbent is not None) or within_gap or out_of_time:
+                status = 'Feasible' if incumbent is not None else 'Not Solved'
+                break
+            allocation = _allocation(upper_choices, candidate)
+            unknown = [(c, s) for c, s in zip(components, allocation) if s not in c['exact']]
+            futures = [(c, s, pool.submit(solve_max_coverage, c['coverage'], s, solver, presolve=presolve, limits=sub_limits())) for c, s in unknown]
+            for c, s, future in futures:
+                solution = future.result()
+                if solution['status'] == 'Optimal':
+                    record(c, solution, exact=True, sensors=s)
+                elif deadline is not None:
+                    # stopped by the time limit, what it placed still counts
+                    out_of_time = True
+                    if solution['status'] == 'Feasible':
+                        record(c, solution, exact=False)
+                else:
+                    status = solution['status']
+                    break
+    solve_time = time.perf_counter() - solve_start
+
+    placed = np.zeros(coverage.num_columns, dtype=bool)
+    covered = np.zeros(coverage.num_demand, dtype=bool)
+    if status in ('Optimal', 'Feasible'):
+        for c, sensors in zip(components, _allocation(lower_choices, incumbent)):
+            # the best placement found with at most this many sensors
+            s = max((s for s in c['points'] if s <= sensors), key=lambda s: c['points'][s][0])
+            solution = c['points'][s][1]
+            if solution is None:
+                continue
+            local_cols = np.flatnonzero(solution['placed'])
+            global_cols = c['location_idx'][local_cols // coverage.num_configs] * coverage.num_configs + local_cols % coverage.num_configs
+            placed[global_cols] = True
+            covered[c['demand_idx'][solution['covered']]] = True
+
+    return {
+        'placed': placed,
+        'covered': covered,
+        'status': status,
+        'build_time': build_time,
+        'solve_time': solve_time,
+        'gap': None if incumbent is None or lower_bound is None else (incumbent - lower_bound) / max(incumbent, 1),
+        'components': len(components),
+        'lower_bound': lower_bound,
+    }
@@ -0,0 +1,160 @@
+import gzip
+import json
+import numpy as np
+from fastapi import Response
+from shape_optimisations.coverage import FAN_ARC_POINTS, EARTH_RADIUS_KM
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+"""
+Response encoding of optimisation results
+
+GeoJSON stays the default body. The compact format replaces the 'geojson' member with parametric sensor
+records instead of a Point and a 21-vertex fan Polygon per sensor:
+
+    "sensors": {
+        "configs": [{"sensorType", "rangeKm", "azimuthDeg", "fanDeg"}, ...],   shared configuration table
+        "fields": ["lon", "lat", "config"],
+        "records": [[lon, lat, config index], ...],
+        "scale": null | 10^precision,   coordinates are integers of degrees * scale when quantized
+        "fan": {"arcPoints": 20, "earthRadiusKm": 6371},
+        "existing": [record index, ...]   only when the placement includes sensors already in place
+    }
+
+A client rebuilds a fan as coverage.create_fan_polygon does: the centre, then arcPoints vertices at
+bearings evenly spaced from azimuthDeg - fanDeg / 2 to azimuthDeg + fanDeg / 2, each offset by
+r = rangeKm / earthRadiusKm (radians) as (r * sin(bearing) / cos(lat), r * cos(bearing)) in degrees.
+
+Bodies are serialised with orjson when it is installed (stdlib json otherwise) and compressed with brotli
+(if installed) or gzip, whichever the request's Accept-Encoding prefers.
+"""
+
+COMPRESS_MIN_BYTES = 1024  # smaller bodies are sent as is
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+
+def compact_placement(geojson, precision=None):
+    """
+    Parametric sensor records of an export_to_geojson FeatureCollection
+
+    Args:
+        geojson (dict): 'Sensor Placement' points and their 'Coverage Area' fans
+        precision (int | None): decimal places kept of each coordinate, stored as integers (None keeps floats)
+
+    Returns:
+        dict: the 'sensors' member described in the module docstring
+    """
+    features = geojson.get('features', [])
+    fans = {f['properties']['sensor_id']: f['properties'] for f in features if f['properties'].get('type') == 'Coverage Area'}
+    configs, config_index, records, existing = [], {}, [], []
+    scale = None if precision is None else 10 ** precision
+    for feature in features:
+        properties = feature['properties']
+        if properties.get('type') != 'Sensor Placement':
+            continue
+        fan = fans[properties['id']]
+        config = (fan.get('sensor_type'), fan['range_km'], fan['orientation_deg'], fan['fan_angle_deg'])
+        if config not in config_index:
+            config_index[config] = len(configs)
+            configs.append({'sensorType': config[0], 'rangeKm': config[1], 'azimuthDeg': config[2], 'fanDeg': config[3]})
+        lon, lat = feature['geometry']['coordinates'][:2]
+        if scale is not None:
+            lon, lat = int(round(lon * scale)), int(round(lat * scale))
+        if properties.get('existing'):
+            existing.append(len(records))
+        records.append([lon, lat, config_index[config]])
+    sensors = {
+        'configs': configs,
+        'fields': ['lon', 'lat', 'config'],
+        'records': records,
+        'scale': scale,
+        'fan': {'arcPoints': FAN_ARC_POINTS, 'earthRadiusKm': EARTH_RADIUS_KM},
+    }
+    if existing:
+        sensors['existing'] = existing
+    return sensors
+
+
+def compact_result(result, precision=None):
+    """ copy of an optimisation response body with every 'geojson' placement (also those of a sweep's 'front') made compact """
+    def convert(body):
+        body = dict(body)
+        if 'geojson' in body:
+            body['sensors'] = compact_placement(body.pop('geojson'), precision)
+        return body
+    compact = convert(result)
+    if 'front' in compact:
+        compact['front'] = [convert(point) for point in compact['front']]
+    compact['format'] = 'compact'
+    return compact
+
+
+def dumps(body):
+    """ JSON bytes of a response body (numpy scalars and arrays allowed) """
+    if orjson is not None:
+        return orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(body, separators=(',', ':'), default=lambda o: o.tolist() if isinstance(o, (np.ndarray, np.generic)) else str(o)).encode()
+
+
+def loads(content):
+    """ parsed JSON of a request body or line (bytes or str) """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def negotiate_encoding(accept_encoding):
+    """ 'br', 'gzip' or None, the supported coding the Accept-Encoding header ranks highest (br on ties) """
+    offered = {}
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            offered[coding.strip().lower()] = q
+    supported = (['br'] if brotli is not None else []) + ['gzip']
+    ranked = [(offered.get(coding, offered.get('*', 0.0)), -i, coding) for i, coding in enumerate(supported)]
+    q, _, coding = max(ranked)
+    return coding if q > 0 else None
+
+
+def compressed_response(request, content, status_code=200, media_type='application/json', headers=None):
+    """ Response of already serialised content, compressed as the request's Accept-Encoding prefers """
+    headers = dict(headers or {}, Vary='Accept-Encoding')
+    coding = negotiate_encoding(request.headers.get('accept-encoding')) if len(content) >= COMPRESS_MIN_BYTES else None
+    if coding == 'br':
+        content = brotli.compress(content, quality=BROTLI_QUALITY)
+    elif coding == 'gzip':
+        content = gzip.compress(content, compresslevel=GZIP_LEVEL)
+    if coding is not None:
+        headers['Content-Encoding'] = coding
+    return Response(content=content, status_code=status_code, media_type=media_type, headers=headers)
+
+
+def encoded_response(request, body, status_code=200, format='geojson', precision=None):
+    """
+    Response for an optimisation result, in the requested format and compressed as the client accepts
+
+    Args:
+        request (fastapi.Request): for its Accept-Encoding header
+        body (dict): response body, with GeoJSON placements
+        format (str): 'geojson' (as is) or 'compact' (see compact_result)
+        precision (int | None): coordinate decimal places kept by the compact format
+    """
+    if format == 'compact':
+        body = compact_result(body, precision)
+    return compressed_response(request, dumps(body), status_code=status_code)
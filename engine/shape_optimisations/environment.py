@@ -0,0 +1,658 @@
+import os
+import re
+import json
+import time
+import zlib
+import shutil
+import struct
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+import numpy as np
+from typing import Optional
+from fastapi import APIRouter, Request, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from shape_optimisations.catalog import parse_bbox, etag_matches, _etag
+from shape_optimisations.encoding import compressed_response, dumps
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+"""
+Environmental rasters (e.g. the Copernicus salinity product of scratchNotebooks/salinityDataPrep.ipynb)
+
+NetCDF files in ENV_DATA_DIR are ingested chunk by chunk (one time step, depth level and CHUNK_ROWS
+latitude rows at a time, never the whole variable) into a cache directory per dataset:
+
+    <ENV_CACHE_DIR>/<dataset>/meta.json          coordinates, variables, shapes, value ranges, source stamp
+    <ENV_CACHE_DIR>/<dataset>/<variable>.L0.npy  float32 (time, depth, lat, lon), NaN where there is no data
+    <ENV_CACHE_DIR>/<dataset>/<variable>.L1.npy  2x2 cell means of L0, and so on until a level fits in
+                                                 OVERVIEW_MIN cells
+
+The .npy files are opened memory-mapped, so a request only pages in the cells it reads, and the
+overview pyramid gives every zoom level a source no finer than it needs. A file is (re-)ingested when
+first requested after it changed, or ahead of time with
+
+    python -m shape_optimisations.environment ingest <file.nc>
+
+Slices are served as compact JSON grids (a bbox window at the finest level that fits max_cells per
+side) or as 256 px web-mercator PNG tiles, kept in an LRU of ENV_TILE_CACHE_MB.
+
+NetCDF4/HDF5 files (as Copernicus distributes) are read with xarray when it is installed
+(pip install xarray netCDF4), NetCDF3 files also with scipy.io. A small synthetic NetCDF3 dataset for
+development and testing can be written with
+
+    python -m shape_optimisations.environment synthetic environmentalData/synthetic.nc
+"""
+
+ENV_DATA_DIR = os.environ.get("ENGINE_ENV_DATA_DIR", "environmentalData")
+ENV_CACHE_DIR = os.environ.get("ENGINE_ENV_CACHE_DIR", os.path.join(ENV_DATA_DIR, ".cache"))
+ENV_TILE_CACHE_MB = float(os.environ.get("ENGINE_ENV_TILE_CACHE_MB", 64))
+CHUNK_ROWS = 256  # latitude rows read from the source per chunk
+OVERVIEW_MIN = 256  # overview levels are added until one fits in this many cells per side
+TILE_SIZE_PX = 256
+META_VERSION = 1
+
+DIMENSION_ROLES = {
+    'time': ('time', 't', 'time_counter'),
+    'depth': ('depth', 'deptht', 'lev', 'level', 'z'),
+    'lat': ('latitude', 'lat', 'nav_lat', 'y'),
+    'lon': ('longitude', 'lon', 'nav_lon', 'x'),
+}
+
+# viridis, sampled at 9 evenly spaced stops and interpolated into a 256 entry lookup table
+_VIRIDIS_STOPS = [(68, 1, 84), (71, 44, 122), (59, 81, 139), (44, 113, 142), (33, 144, 141), (39, 173, 129), (92, 200, 99), (170, 220, 50), (253, 231, 37)]
+COLOUR_TABLE = np.stack([np.interp(np.linspace(0, 8, 256), np.arange(9), [s[c] for s in _VIRIDIS_STOPS]) for c in range(3)], axis=1).round().astype(np.uint8)
+
+
+class NetCDFReadError(ValueError):
+    pass
+
+
+def _role(dimension):
+    name = dimension.lower()
+    return next((role for role, names in DIMENSION_ROLES.items() if name in names), None)
+
+
+def _decode_times(values, units):
+    """ ISO strings of CF time values ('<unit> since <date>') """
+    match = re.match(r"\s*(\w+)\s+since\s+(\S+)(?:[ T](\S+))?", units or '')
+    if match is None:
+        return [str(v) for v in values]
+    unit = {'days': 'D', 'day': 'D', 'hours': 'h', 'hour': 'h', 'minutes': 'm', 'minute': 'm', 'seconds': 's', 'second': 's'}.get(match.group(1).lower())
+    if unit is None:
+        return [str(v) for v in values]
+    base = np.datetime64(match.group(2) + ('T' + match.group(3).rstrip('Z') if match.group(3) else ''), 's')
+    seconds = np.round(np.asarray(values, dtype=float) * np.timedelta64(1, unit) / np.timedelta64(1, 's')).astype(np.int64)
+    return [str(t) for t in base + seconds.astype('timedelta64[s]')]
+
+
+class _ScipyReader:
+    """ NetCDF3 through scipy.io.netcdf_file (memory-mapped), packing and fill values decoded here """
+
+    def __init__(self, path):
+        from scipy.io import netcdf_file
+        try:
+            self.file = netcdf_file(path, 'r', mmap=True, maskandscale=False)
+        except TypeError as e:
+            raise NetCDFReadError(f"{path} is not NetCDF3, NetCDF4/HDF5 files need xarray (pip install xarray netCDF4): {e}")
+        self.variables = self.file.variables
+
+    def dimensions(self, name):
+        return tuple(self.variables[name].dimensions)
+
+    def attribute(self, name, attribute):
+        value = self.variables[name]._attributes.get(attribute)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def coordinate(self, name):
+        values = np.array(self.variables[name].data)
+        if _role(name) == 'time':
+            return _decode_times(values, self.attribute(name, 'units'))
+        return values.astype(float)
+
+    def read(self, name, index):
+        variable = self.variables[name]
+        raw = np.array(variable.data[index])
+        data = raw.astype(np.float32)
+        for attribute in ('_FillValue', 'missing_value'):
+            fill = variable._attributes.get(attribute)
+            if fill is not None:
+                data[raw == np.asarray(fill).astype(raw.dtype)] = np.nan
+        scale, offset = variable._attributes.get('scale_factor'), variable._attributes.get('add_offset')
+        if scale is not None:
+            data *= np.float32(scale)
+        if offset is not None:
+            data += np.float32(offset)
+        return data
+
+    def close(self):
+        # the memory map is only released once nothing refers to its variables
+        self.variables = None
+        self.file.close()
+
+
+class _XarrayReader:
+    """ any format xarray opens (NetCDF4/HDF5 included), variables are only read slice by slice """
+
+    def __init__(self, path):
+        self.dataset = _xarray().open_dataset(path)
+        self.variables = {name: None for name in self.dataset.variables}
+
+    def dimensions(self, name):
+        return tuple(self.dataset[name].dims)
+
+    def attribute(self, name, attribute):
+        return self.dataset[name].attrs.get(attribute)
+
+    def coordinate(self, name):
+        values = self.dataset[name].values
+        if np.issubdtype(values.dtype, np.datetime64):
+            return [str(t) for t in values.astype('datetime64[s]')]
+        return values.astype(float)
+
+    def read(self, name, index):
+        return np.asarray(self.dataset[name][index].values, dtype=np.float32)
+
+    def close(self):
+        self.dataset.close()
+
+
+def _xarray():
+    import xarray
+    return xarray
+
+
+def open_netcdf(path):
+    """ reader of a NetCDF file, xarray when installed, scipy.io otherwise """
+    try:
+        _xarray()
+    except ImportError:
+        return _ScipyReader(path)
+    return _XarrayReader(path)
+
+
+def _regular_axis(values, name):
+    """ (first centre, step) of an evenly spaced coordinate """
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return float(values[0]), 1.0
+    steps = np.diff(values)
+    if not np.allclose(steps, steps[0], rtol=1e-3, atol=1e-9):
+        raise NetCDFReadError(f"'{name}' is not evenly spaced, only regular lat/lon grids are supported")
+    return float(values[0]), float((values[-1] - values[0]) / (len(values) - 1))
+
+
+def _block_mean(data):
+    """ 2x2 cell means of the last two axes (NaN cells ignored, a block of NaN stays NaN), odd edges padded """
+    rows, cols = data.shape[-2:]
+    padded = np.full(data.shape[:-2] + (rows + rows % 2, cols + cols % 2), np.nan, dtype=np.float32)
+    padded[..., :rows, :cols] = data
+    blocks = padded.reshape(data.shape[:-2] + (padded.shape[-2] // 2, 2, padded.shape[-1] // 2, 2))
+    valid = ~np.isnan(blocks)
+    counts = valid.sum(axis=(-3, -1))
+    sums = np.where(valid, blocks, 0).sum(axis=(-3, -1))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan).astype(np.float32)
+
+
+def ingest_netcdf(path, cache_dir, variables=None, chunk_rows=CHUNK_ROWS):
+    """
+    Writes the memory-mapped cache (see module docstring) of a NetCDF file's gridded variables
+
+    Args:
+        path (str): NetCDF file
+        cache_dir (str): dataset cache directory, replaced once the new cache is complete
+        variables (list[str] | None): variables to ingest, defaults to every variable on the lat/lon grid
+        chunk_rows (int): latitude rows per read
+
+    Returns:
+        dict: the dataset's meta.json
+    """
+    reader = open_netcdf(path)
+    try:
+        roles = {}
+        for name in reader.variables:
+            for dimension in reader.dimensions(name):
+                role = _role(dimension)
+                if role is not None and dimension in reader.variables:
+                    roles.setdefault(role, dimension)
+        if 'lat' not in roles or 'lon' not in roles:
+            raise NetCDFReadError(f"{path} has no latitude/longitude coordinates")
+        lats, lons = reader.coordinate(roles['lat']), reader.coordinate(roles['lon'])
+        lat0, dlat = _regular_axis(lats, roles['lat'])
+        lon0, dlon = _regular_axis(lons, roles['lon'])
+        times = list(reader.coordinate(roles['time'])) if 'time' in roles else [None]
+        depths = [float(d) for d in reader.coordinate(roles['depth'])] if 'depth' in roles else [None]
+
+        coordinates = set(roles.values())
+        gridded = [name for name in reader.variables if name not in coordinates
+                   and reader.dimensions(name)[-2:] == (roles['lat'], roles['lon'])
+                   and set(reader.dimensions(name)[:-2]) <= {roles.get('time'), roles.get('depth')}]
+        variables = gridded if variables is None else [v for v in variables if v in gridded]
+        if not variables:
+            raise NetCDFReadError(f"{path} has no variables on its latitude/longitude grid")
+
+        building = f"{cache_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        shutil.rmtree(building, ignore_errors=True)
+        os.makedirs(building)
+        meta_variables = {}
+        for name in variables:
+            dimensions = reader.dimensions(name)
+            shape = (len(times), len(depths), len(lats), len(lons))
+            levels = [np.lib.format.open_memmap(os.path.join(building, f"{name}.L0.npy"), mode='w+', dtype=np.float32, shape=shape)]
+            while max(levels[-1].shape[-2:]) > OVERVIEW_MIN:
+                rows, cols = levels[-1].shape[-2:]
+                levels.append(np.lib.format.open_memmap(os.path.join(building, f"{name}.L{len(levels)}.npy"), mode='w+', dtype=np.float32,
+                                                        shape=shape[:2] + ((rows + 1) // 2, (cols + 1) // 2)))
+            low, high = np.inf, -np.inf
+            for t in range(shape[0]):
+                for d in range(shape[1]):
+                    for row in range(0, shape[2], chunk_rows):
+                        # index of this chunk in the variable's own dimensions (time and depth may be absent)
+                        index = tuple({roles.get('time'): t, roles.get('depth'): d}[dim] for dim in dimensions[:-2]) + (slice(row, row + chunk_rows), slice(None))
+                        chunk = reader.read(name, index)
+                        levels[0][t, d, row:row + chunk_rows] = chunk
+                        if not np.all(np.isnan(chunk)):
+                            low, high = min(low, float(np.nanmin(chunk))), max(high, float(np.nanmax(chunk)))
+                    for k in range(1, len(levels)):
+                        levels[k][t, d] = _block_mean(levels[k - 1][t, d])
+            for level in levels:
+                level.flush()
+            meta_variables[name] = {
+                'shape': list(shape),
+                'levels': len(levels),
+                'min': None if low > high else low,
+                'max': None if low > high else high,
+                'units': reader.attribute(name, 'units'),
+                'longName': reader.attribute(name, 'long_name'),
+            }
+            del levels
+
+        stat = os.stat(path)
+        meta = {
+            'version': META_VERSION,
+            'source': os.path.abspath(path),
+            'stamp': [stat.st_mtime_ns, stat.st_size],
+            'times': times,
+            'depths': depths,
+            'lat': {'first': lat0, 'step': dlat, 'count': len(lats)},
+            'lon': {'first': lon0, 'step': dlon, 'count': len(lons)},
+            'variables': meta_variables,
+        }
+        with open(os.path.join(building, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+    finally:
+        reader.close()
+
+    # swap the complete cache in, memory maps of the previous one stay valid until closed
+    previous = f"{cache_dir}.old-{os.getpid()}-{threading.get_ident()}"
+    if os.path.exists(cache_dir):
+        os.replace(cache_dir, previous)
+    os.replace(building, cache_dir)
+    shutil.rmtree(previous, ignore_errors=True)
+    return meta
+
+
+def web_mercator_tile_centres(z, x, y, size=TILE_SIZE_PX):
+    """ lon (per column) and lat (per row, north first) of the pixel centres of an XYZ tile """
+    n = 2 ** z
+    lons = (x + (np.arange(size) + 0.5) / size) / n * 360 - 180
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + (np.arange(size) + 0.5) / size) / n))))
+    return lons, lats
+
+
+def encode_png(rgba):
+    """ PNG bytes of an (h, w, 4) uint8 image """
+    height, width = rgba.shape[:2]
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    # filter type 0 (none) at the start of every row
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, width * 4)], axis=1).tobytes()
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b""))
+
+
+def colourise(values, vmin, vmax):
+    """ RGBA (viridis, NaN transparent) of an array of values scaled to vmin..vmax """
+    scaled = (values - vmin) / ((vmax - vmin) or 1.0)
+    index = np.clip(np.nan_to_num(scaled * 255, nan=0), 0, 255).astype(np.uint8)
+    rgba = np.empty(values.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = COLOUR_TABLE[index]
+    rgba[..., 3] = np.where(np.isnan(values), 0, 255)
+    return rgba
+
+
+class EnvironmentalDataset:
+    """ memory-mapped cache of one ingested dataset """
+
+    def __init__(self, name, cache_dir):
+        self.name, self.cache_dir = name, cache_dir
+        with open(os.path.join(cache_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.etag = _etag(name, *self.meta['stamp'])
+        self._levels = {}
+
+    def levels(self, variable):
+        if variable not in self._levels:
+            count = self.meta['variables'][variable]['levels']
+            self._levels[variable] = [np.load(os.path.join(self.cache_dir, f"{variable}.L{k}.npy"), mmap_mode='r') for k in range(count)]
+        return self._levels[variable]
+
+    def summary(self):
+        return {
+            'name': self.name,
+            'times': self.meta['times'],
+            'depths': self.meta['depths'],
+            'lat': self.meta['lat'],
+            'lon': self.meta['lon'],
+            'variables': self.meta['variables'],
+        }
+
+    def _check(self, variable, time_index, depth_index):
+        if variable not in self.meta['variables']:
+            raise KeyError(f"no variable '{variable}'")
+        if not (0 <= time_index < len(self.meta['times']) and 0 <= depth_index < len(self.meta['depths'])):
+            raise IndexError(f"time index must be below {len(self.meta['times'])} and depth index below {len(self.meta['depths'])}")
+
+    def _axis(self, axis, level):
+        """ (edge of cell 0, cell size) of an axis at an overview level """
+        first, step = self.meta[axis]['first'], self.meta[axis]['step']
+        return first - step / 2, step * 2 ** level
+
+    def grid(self, variable, time_index=0, depth_index=0, bbox=None, max_cells=256, precision=3):
+        """
+        Compact grid of a slice: the bbox window (whole grid by default) at the finest level with at most
+        max_cells cells per side, rows north first, values rounded to precision places, null where no data.
+        When even the coarsest level has more, every stride-th cell of it is returned
+        """
+        self._check(variable, time_index, depth_index)
+        levels = self.levels(variable)
+        for level, data in enumerate(levels):
+            lat_edge, lat_size = self._axis('lat', level)
+            lon_edge, lon_size = self._axis('lon', level)
+            rows, cols = data.shape[-2:]
+            if bbox is None:
+                r0, r1, c0, c1 = 0, rows, 0, cols
+            else:
+                west, south, east, north = bbox
+                r = sorted([(south - lat_edge) / lat_size, (north - lat_edge) / lat_size])
+                r0, r1 = max(0, int(np.floor(r[0]))), min(rows, int(np.ceil(r[1])))
+                c0, c1 = max(0, int(np.floor((west - lon_edge) / lon_size))), min(cols, int(np.ceil((east - lon_edge) / lon_size)))
+            if max(r1 - r0, c1 - c0) <= max_cells or level == len(levels) - 1:
+                break
+        stride = max(1, int(np.ceil(max(r1 - r0, c1 - c0) / max_cells)))
+        window = np.array(data[time_index, depth_index, r0:max(r0, r1):stride, c0:max(c0, c1):stride], dtype=float)
+        north_first = lat_size < 0
+        if not north_first:
+            window = window[::-1]
+        values = np.round(window, precision)
+        last_row = r0 + (window.shape[0] - 1) * stride
+        lat_first = lat_edge + (r0 + 0.5) * lat_size if north_first else lat_edge + (last_row + 0.5) * lat_size
+        return {
+            'dataset': self.name,
+            'variable': variable,
+            'time': self.meta['times'][time_index],
+            'depth': self.meta['depths'][depth_index],
+            'level': level,
+            'stride': stride,
+            'shape': list(window.shape),
+            'lon': {'first': lon_edge + (c0 + 0.5) * lon_size, 'step': lon_size * stride},
+            'lat': {'first': lat_first, 'step': -abs(lat_size) * stride},
+            'units': self.meta['variables'][variable]['units'],
+            'values': np.where(np.isnan(values), None, values).ravel().tolist(),
+        }
+
+    def tile(self, variable, time_index, depth_index, z, x, y, vmin=None, vmax=None):
+        """ PNG of an XYZ web-mercator tile of a slice, nearest cell of the coarsest level still finer than a pixel """
+        self._check(variable, time_index, depth_index)
+        levels = self.levels(variable)
+        pixel_deg = 360 / (TILE_SIZE_PX * 2 ** z)
+        level = 0
+        while level + 1 < len(levels) and abs(self.meta['lon']['step']) * 2 ** (level + 1) <= pixel_deg:
+            level += 1
+        data = levels[level][time_index, depth_index]
+        lons, lats = web_mercator_tile_centres(z, x, y)
+        lat_edge, lat_size = self._axis('lat', level)
+        lon_edge, lon_size = self._axis('lon', level)
+        rows = np.floor((lats - lat_edge) / lat_size).astype(np.int64)
+        # longitudes compared modulo 360, so 0..360 and -180..180 grids both line up
+        offsets = (lons - lon_edge) % 360 if lon_size > 0 else (lon_edge - lons) % 360
+        cols = np.floor(offsets / abs(lon_size)).astype(np.int64)
+        row_ok, col_ok = (rows >= 0) & (rows < data.shape[0]), (cols >= 0) & (cols < data.shape[1])
+        values = np.full((len(rows), len(cols)), np.nan, dtype=np.float32)
+        if row_ok.any() and col_ok.any():
+            values[np.ix_(row_ok, col_ok)] = data[np.ix_(rows[row_ok], cols[col_ok])]
+        info = self.meta['variables'][variable]
+        vmin = info['min'] if vmin is None else vmin
+        vmax = info['max'] if vmax is None else vmax
+        return encode_png(colourise(values, vmin if vmin is not None else 0.0, vmax if vmax is not None else 1.0))
+
+
+class TileCache:
+    """ LRU of encoded tiles, evicted by total size """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            content = self._entries.get(key)
+            if content is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return content
+
+    def put(self, key, content):
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= len(self._entries.pop(key))
+            self._entries[key] = content
+            self._bytes += len(content)
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'maxBytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+class EnvironmentCatalog:
+    """
+    NetCDF files of a directory (the file name without extension is the dataset name), ingested into
+    cache_dir on first use and again whenever the file changes
+
+    Args:
+        data_dir (str): directory of *.nc files
+        cache_dir (str): directory of the ingested caches
+    """
+
+    def __init__(self, data_dir=ENV_DATA_DIR, cache_dir=ENV_CACHE_DIR):
+        self.data_dir, self.cache_dir = data_dir, cache_dir
+        self._datasets = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def names(self):
+        if not os.path.isdir(self.data_dir):
+            return []
+        return sorted(os.path.splitext(f)[0] for f in os.listdir(self.data_dir) if f.endswith('.nc'))
+
+    def get(self, name, ingest=False):
+        """ EnvironmentalDataset of the name (ingesting it if its cache is missing or stale, or ingest is set), None if there is no such file """
+        path = os.path.join(self.data_dir, f"{name}.nc")
+        if os.path.basename(name) != name or not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        dataset = self._datasets.get(name)
+        if dataset is not None and dataset.meta['stamp'] == stamp and not ingest:
+            return dataset
+        with self._lock:
+            lock = self._locks.setdefault(name, threading.Lock())
+        with lock:
+            cache_dir = os.path.join(self.cache_dir, name)
+            dataset = None
+            if not ingest and os.path.exists(os.path.join(cache_dir, 'meta.json')):
+                dataset = EnvironmentalDataset(name, cache_dir)
+                if dataset.meta.get('version') != META_VERSION or dataset.meta['stamp'] != stamp:
+                    dataset = None
+            if dataset is None:
+                start = time.perf_counter()
+                ingest_netcdf(path, cache_dir)
+                logger.info("Ingested %s in %.2fs", path, time.perf_counter() - start)
+                dataset = EnvironmentalDataset(name, cache_dir)
+            self._datasets[name] = dataset
+            return dataset
+
+
+def write_synthetic_netcdf(path, num_times=4, depths=(0.5, 5.1, 9.6), lat_range=(50.0, 70.0), lon_range=(-30.0, 10.0), resolution_deg=0.083, seed=0):
+    """
+    Small NetCDF3 file shaped like the Copernicus salinity product: so(time, depth, latitude, longitude)
+    packed as int16 with scale_factor/add_offset, _FillValue over a few land disks, daily times in hours
+    since 1950-01-01. The field is a smooth, drifting salinity-like pattern so tiles and grids are easy to check
+    """
+    from scipy.io import netcdf_file
+    rng = np.random.default_rng(seed)
+    lats = np.arange(lat_range[0], lat_range[1] + resolution_deg / 2, resolution_deg)
+    lons = np.arange(lon_range[0], lon_range[1] + resolution_deg / 2, resolution_deg)
+    hours = 24.0 * (27000 + np.arange(num_times))
+    lon_grid, lat_grid = np.meshgrid(lons, lats)
+    land = np.zeros(lon_grid.shape, dtype=bool)
+    for _ in range(4):
+        c_lon, c_lat, radius = rng.uniform(*lon_range), rng.uniform(*lat_range), rng.uniform(1, 3)
+        land |= (lon_grid - c_lon) ** 2 + (lat_grid - c_lat) ** 2 < radius ** 2
+
+    scale, offset, fill = 0.001, 20.0, -32767
+    with netcdf_file(path, 'w', version=2) as f:
+        for name, values, units in (('time', hours, 'hours since 1950-01-01'), ('depth', np.asarray(depths, dtype=float), 'm'),
+                                    ('latitude', lats, 'degrees_north'), ('longitude', lons, 'degrees_east')):
+            f.createDimension(name, len(values))
+            variable = f.createVariable(name, 'f8' if name == 'time' else 'f4', (name,))
+            variable[:] = values
+            variable.units = units
+        so = f.createVariable('so', 'i2', ('time', 'depth', 'latitude', 'longitude'))
+        so.units = 'PSU'
+        so.long_name = 'Salinity'
+        so.scale_factor = scale
+        so.add_offset = offset
+        so._FillValue = np.int16(fill)
+        for t in range(num_times):
+            for d, depth in enumerate(depths):
+                field = 35 + 0.8 * np.sin(np.radians(lon_grid * 6 + t * 10)) * np.cos(np.radians(lat_grid * 9)) + 0.02 * depth - 0.05 * (lat_grid - 60)
+                packed = np.round((field - offset) / scale).astype(np.int16)
+                packed[land] = fill
+                so[t, d] = packed
+    return path
+
+
+environment_catalog = EnvironmentCatalog()
+tile_cache = TileCache(int(ENV_TILE_CACHE_MB * 1024 * 1024))
+
+
+def _dataset(name):
+    try:
+        dataset = environment_catalog.get(name)
+    except NetCDFReadError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if dataset is None:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    return dataset
+
+# NetCDF datasets available in ENGINE_ENV_DATA_DIR
+@router.get("/environment/datasets")
+def list_environment_datasets():
+    return environment_catalog.names()
+
+# coordinates (ISO times, depths, lat/lon grid), variables and their value ranges, ingests the file on first use
+@router.get("/environment/datasets/{name}")
+async def get_environment_dataset(name: str):
+    return (await run_in_threadpool(_dataset, name)).summary()
+
+# re-ingests the dataset's NetCDF file now rather than on its next request
+@router.post("/environment/datasets/{name}/ingest")
+async def ingest_environment_dataset(name: str):
+    def ingest():
+        try:
+            return environment_catalog.get(name, ingest=True)
+        except NetCDFReadError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+    dataset = await run_in_threadpool(ingest)
+    if dataset is None:
+        raise HTTPException(status_code=404, detail="Dataset not found")
+    return dataset.summary()
+
+# slice as a compact grid: 'values' row-major, north first, from lat.first / lon.first in lat.step / lon.step
+# degrees, the window bbox=west,south,east,north (whole grid by default) at the finest level with at most max_cells per side
+# (every stride-th cell of the coarsest level when none has few enough)
+@router.get("/environment/{name}/{variable}/grid")
+async def get_environment_grid(request: Request, name: str, variable: str, time: int = Query(default=0, ge=0), depth: int = Query(default=0, ge=0),
+                               bbox: Optional[str] = None, max_cells: int = Query(default=256, ge=1, le=2048), precision: int = Query(default=3, ge=0, le=6)):
+    dataset = await run_in_threadpool(_dataset, name)
+    try:
+        grid = await run_in_threadpool(dataset.grid, variable, time, depth, parse_bbox(bbox), max_cells, precision)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IndexError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return compressed_response(request, dumps(grid))
+
+# XYZ web-mercator PNG tile of a slice, coloured (viridis) from vmin to vmax (the variable's range by default)
+@router.get("/environment/{name}/{variable}/tiles/{z}/{x}/{y}.png")
+async def get_environment_tile(request: Request, name: str, variable: str, z: int, x: int, y: int, time: int = Query(default=0, ge=0), depth: int = Query(default=0, ge=0),
+                               vmin: Optional[float] = None, vmax: Optional[float] = None):
+    if not (0 <= z <= 24 and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    dataset = await run_in_threadpool(_dataset, name)
+    key = (name, dataset.etag, variable, time, depth, z, x, y, vmin, vmax)
+    etag = _etag(*key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    content = tile_cache.get(key)
+    if content is None:
+        try:
+            content = await run_in_threadpool(dataset.tile, variable, time, depth, z, x, y, vmin, vmax)
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        except IndexError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        tile_cache.put(key, content)
+    return Response(content=content, media_type="image/png", headers=headers)
+
+# size and hit/miss counts of the tile LRU
+@router.get("/environment/tile-cache/stats")
+def get_environment_tile_cache_stats():
+    return tile_cache.stats()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="environmental raster ingestion, run from the engine directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = commands.add_parser("ingest", help="ingest a NetCDF file into the cache")
+    ingest_parser.add_argument("path")
+    ingest_parser.add_argument("--cache-dir", default=ENV_CACHE_DIR)
+    ingest_parser.add_argument("--variables", nargs="*", default=None)
+    synthetic_parser = commands.add_parser("synthetic", help="write a small synthetic salinity NetCDF")
+    synthetic_parser.add_argument("path")
+    synthetic_parser.add_argument("--times", type=int, default=4)
+    synthetic_parser.add_argument("--resolution-deg", type=float, default=0.083)
+    args = parser.parse_args()
+    if args.command == "ingest":
+        start = time.perf_counter()
+        meta = ingest_netcdf(args.path, os.path.join(args.cache_dir, os.path.splitext(os.path.basename(args.path))[0]), args.variables)
+        print(f"ingested {', '.join(meta['variables'])} of {args.path} in {time.perf_counter() - start:.2f}s")
+    else:
+        os.makedirs(os.path.dirname(args.path) or ".", exist_ok=True)
+        write_synthetic_netcdf(args.path, num_times=args.times, resolution_deg=args.resolution_deg)
+        print(f"wrote {args.path}")
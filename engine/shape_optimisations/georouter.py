@@ -1,89 +1,58 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 import numpy as np
-from shapely.geometry import MultiPolygon, Polygon, Point, mapping
-from shapely.ops import unary_union
-import matplotlib.pyplot as plt
-from matplotlib.patches import Patch, Wedge
-import pulp
+import shapely
+from shapely.geometry import MultiPolygon, Point, mapping, shape
 import json
+import time
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Literal, Optional
+from pydantic import ValidationError
+from models import OptimiseOptions, HeatmapOptions
+from shape_optimisations.coverage import create_fan_polygon, compute_coverage
+from shape_optimisations.grid import get_grid_points_in_polygon_km
+from shape_optimisations.solvers import solve_placement, SOLVED
+from shape_optimisations.decompose import solve_decomposed
+from shape_optimisations.heuristic import greedy_placement
+from shape_optimisations.refine import refine
+from shape_optimisations.raster import evaluate_coverage, exact_area_coverage, heatmap_geojson, RASTER_RESOLUTION_KM
+from shape_optimisations.sensors import catalog_configurations
+from shape_optimisations.cache import result_cache, result_cache_key
+from shape_optimisations.encoding import encoded_response
+from shape_optimisations.assets import asset_store, assets_digest, sites_near
+from shape_optimisations.metrics import observe_optimisation
+from shape_optimisations.areas import parse_polygons, simplify_area, simplification_tolerance_km, sampling_spacings_km
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 """ 
-fudge function to coerce cesium POST json data into a shapely.geometry MultiPolygon
-exactly the type of fudge that isnt needed once API to core utils is well defined between
-vis layer and object layer (and vice versa)
+coerces cesium POST json data into a valid shapely.geometry MultiPolygon: Polygon and MultiPolygon features
+with their holes, repaired and with overlaps dissolved (see areas.py)
 """
 def geojson_to_multipolygon(geojson):
-    polygons = []
-
-    for feature in geojson.get('features', []):
-        geom = feature.get('geometry', {})
-        if geom.get('type') == 'Polygon':
-            # Extract outer ring and holes
-            coords = geom.get('coordinates', [])
-            if coords:
-                outer = coords[0]
-                holes = coords[1:] if len(coords) > 1 else []
-                polygons.append(Polygon(shell=outer, holes=holes))
-
-    return MultiPolygon([(p.exterior.coords[:], []) for p in polygons])
-
-# azimuths = [0.0, 22.5, 45.0, 67.5, 90.0, 112.5, 135.0, 157.5, 180.0, 202.5, 225.0, 247.5, 270.0, 292.5, 315.0, 337.5]
-
-azimuths = [0.0, 22.5, 45.0, 67.5, 90.0, 112.5, 135.0, 157.5, 180.0, 202.5, 225.0, 247.5, 270.0, 292.5, 315.0, 337.5]
-configurations=[]
-for a in azimuths:
-    configurations.append(    
-        {
-            'azimuth_degree': a,
-            'fan_degree': 50,
-            'range_km': 130,
-        } 
-    )
-    configurations.append(    
-        {
-            'azimuth_degree': a,
-            'fan_degree': 130,
-            'range_km': 70,
-        } 
-    )
+    return MultiPolygon(list(parse_polygons(geojson)[0]))
+
+""" 422 when no demand point of the grid falls inside the area, which has nothing to cover then """
+def require_demand_points(demand_lons, resolution_km):
+    if len(demand_lons) == 0:
+        raise HTTPException(status_code=422, detail=f"area smaller than the grid spacing ({resolution_km} km): no demand point falls inside it")
+
+""" (MultiPolygon, parse_polygons' report) of a posted FeatureCollection, which must have at least one polygon """
+def posted_area(data):
+    parts, area_stats = parse_polygons(data)
+    if len(parts) == 0:
+        raise HTTPException(status_code=422, detail="no polygons in the posted features")
+    return MultiPolygon(list(parts)), area_stats
+
+# default placement configurations, one per (sensor type, azimuth) of the default sensor catalog
+configurations = catalog_configurations()
     
 # --- Step 1: Helper functions ---
 
-def create_fan_polygon(center_lon, center_lat, range_km, orientation_deg, fan_angle_deg):
-    EARTH_RADIUS_KM = 6371
-    range_deg = (range_km / EARTH_RADIUS_KM) * (180 / np.pi)
-    angles = np.linspace(orientation_deg - fan_angle_deg / 2,
-                         orientation_deg + fan_angle_deg / 2,
-                         20)
-    arc_points = []
-    for angle in angles:
-        d_lat = range_deg * np.cos(np.radians(angle))
-        d_lon = range_deg * np.sin(np.radians(angle)) / np.cos(np.radians(center_lat))
-        arc_points.append((center_lon + d_lon, center_lat + d_lat))
-    fan_points = [(center_lon, center_lat)] + arc_points
-    return Polygon(fan_points)
-
-def get_grid_points_in_polygon_km(polygon, resolution_km=10):
-    EARTH_RADIUS_KM = 6371
-    min_lon, min_lat, max_lon, max_lat = polygon.bounds
-    grid_points = []
-    lat_step = (resolution_km / EARTH_RADIUS_KM) * (180 / np.pi)
-    current_lat = min_lat
-    while current_lat <= max_lat:
-        deg_lon_dist_km = (np.pi / 180) * EARTH_RADIUS_KM * np.cos(np.radians(current_lat))
-        lon_step = resolution_km / deg_lon_dist_km if deg_lon_dist_km > 0 else max_lon - min_lon + 1
-        current_lon = min_lon
-        while current_lon <= max_lon:
-            point = Point(current_lon, current_lat)
-            if polygon.contains(point):
-                grid_points.append(point)
-            current_lon += lon_step
-        current_lat += lat_step
-    return grid_points
-
 def export_to_geojson(filename, op_area, placed_sensors):
     """
     Exports the sensor placement results to a GeoJSON file.
@@ -92,7 +61,8 @@ def export_to_geojson(filename, op_area, placed_sensors):
         filename (str): The path for the output GeoJSON file.
         op_area (shapely.Polygon): The operational area polygon.
         placed_sensors (list): A list of dictionaries, where each dictionary
-                               contains info about a placed sensor (location, config:Dict[str,Any]).
+                               contains info about a placed sensor (location, config:Dict[str,Any]),
+                               'existing': True marks a sensor that was already in place (asset store).
     """
     features = []
 
@@ -128,9 +98,12 @@ def export_to_geojson(filename, op_area, placed_sensors):
             "properties": {
                 "type": "Sensor Placement",
                 "id": i,
+                "sensor_type": sensor['config'].get('sensor_type'),
                 "marker-symbol": "circle"
             }
         }
+        if sensor.get('existing'):
+            sensor_point_feature['properties']['existing'] = True
         features.append(sensor_point_feature)
 
         # Add Coverage Area Feature
@@ -140,6 +113,7 @@ def export_to_geojson(filename, op_area, placed_sensors):
             "properties": {
                 "type": "Coverage Area",
                 "sensor_id": i,
+                "sensor_type": sensor['config'].get('sensor_type'),
                 "range_km": sensor['config']['range_km'],
                 "orientation_deg": sensor['config']['azimuth_degree'],
                 "fan_angle_deg": sensor['config']['fan_degree'],
@@ -147,6 +121,8 @@ def export_to_geojson(filename, op_area, placed_sensors):
                 "fill-opacity": 0.5
             }
         }
+        if sensor.get('existing'):
+            coverage_area_feature['properties'].update({'existing': True, 'fill': '#808080'})
         features.append(coverage_area_feature)
 
     # Assemble the final GeoJSON FeatureCollection
@@ -160,120 +136,425 @@ def export_to_geojson(filename, op_area, placed_sensors):
         with open(filename, 'w') as f:
             json.dump(geojson_output, f)
         
-        print(f"Successfully exported data to {filename}")
+        logger.info("Successfully exported data to %s", filename)
         
     return geojson_output
 
-""" Runs optimisation over AOO and config space, returns sensor placement info"""
-def calculateOptimise(AOO):
-    # --- Step 2: Define problem parameters ---
+""" size and outcome of one solve, reported for each solve of the refinement """
+def _level_stats(coverage, solution):
+    return {
+        'candidates': coverage.num_locations,
+        'demandPoints': coverage.num_demand,
+        'nonZeros': coverage.nnz,
+        'numSensors': f"{int(solution['placed'].sum())}",
+        'variables': solution.get('variables'),
+        'constraints': solution.get('constraints'),
+        'status': solution['status'],
+        'gap': None if solution.get('gap') is None else round(solution['gap'], 6),
+        'buildTime': round(solution['build_time'], 4),
+        'solveTime': round(solution['solve_time'], 4),
+    }
 
-    locations = get_grid_points_in_polygon_km(AOO, 60)
-    num_locations = len(locations)
-    num_configs = len(configurations)
-    max_sensors = 99
-    coverage_requirement = 0.70
+""" seconds spent in each stage of calculateOptimise, a lap ends the stage running since the previous lap """
+class _Stopwatch:
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+        return self.stages[stage]
+
+""" (location Point, configuration) of every placed column """
+def placed_sensor_sites(placed, lons, lats, configurations):
+    sites = []
+    for c in np.flatnonzero(placed):
+        l, j = divmod(int(c), len(configurations))
+        sites.append((Point(lons[l], lats[l]), configurations[j]))
+    return sites
+
+""" placed sensors, estimated (demand weight) and area coverage of a solution, as reported by calculateOptimise,
+existing sensors count towards both coverages, as do the pre_covered demand points they cover (left out of the solve) """
+def evaluate_placement(AOO, solution, lons, lats, configurations, demand_weights=None, raster_resolution_km=RASTER_RESOLUTION_KM, exact_area=False,
+                       existing_sensors=None, pre_covered=0):
+    placed_sensors_polygons = []
+    placed_sensors_info = []
+    for loc, config in placed_sensor_sites(solution['placed'], lons, lats, configurations):
+        fan = create_fan_polygon(loc.x, loc.y, config['range_km'], config['azimuth_degree'], config['fan_degree'])
+        placed_sensors_polygons.append(fan)
+        placed_sensors_info.append({'location': loc, 'config': config})
+
+    logger.debug("Number of sensors placed: %d", len(placed_sensors_info))
+    for loc, config in existing_sensors or []:
+        placed_sensors_polygons.append(create_fan_polygon(loc.x, loc.y, config['range_km'], config['azimuth_degree'], config['fan_degree']))
+
+    weights = np.ones(len(solution['covered'])) if demand_weights is None else demand_weights
+    total = weights.sum() + pre_covered
+    estimated_coverage_perc = (weights[solution['covered']].sum() + pre_covered) / total if total > 0 else 0.0
+    logger.debug("Estimated coverage percentage: %.2f%%", estimated_coverage_perc * 100)
+
+    # fans are burnt into a raster over the area, the exact polygon overlay is opt-in (see raster.py)
+    raster = evaluate_coverage(AOO, placed_sensors_polygons, raster_resolution_km)
+    area_coverage_percentage = raster['coverage']
+    area_coverage = {'method': 'raster', 'resolutionKm': raster_resolution_km, 'maxOverlap': int(raster['counts'].max(initial=0))}
+    if exact_area:
+        area_coverage_percentage = exact_area_coverage(AOO, placed_sensors_polygons)
+        area_coverage.update(method='exact', raster=round(raster['coverage'] * 100, 2), exact=round(area_coverage_percentage * 100, 2))
+    logger.debug("Actual Area Coverage: %.2f%%", area_coverage_percentage * 100)
+
+    return placed_sensors_info, estimated_coverage_perc, area_coverage_percentage, area_coverage
+
+""" candidate sites in (or within the buffer of) the exclusion zones of optimiser_assets, and demand points its existing
+sensors cover, as (excluded, covered) flags, with the share of the other demand points left to cover and the assets' stats """
+def apply_assets(assets, lons, lats, demand_lons, demand_lats, coverage_requirement):
+    excluded = sites_near(lons, lats, assets['exclusion_zones'], assets['exclusion_buffer_km'])
+    covered = np.zeros(len(demand_lons), dtype=bool)
+    for loc, config in assets['existing_sensors']:
+        fan = create_fan_polygon(loc.x, loc.y, config['range_km'], config['azimuth_degree'], config['fan_degree'])
+        covered |= shapely.contains_xy(fan, demand_lons, demand_lats)
+    pre_covered = int(covered.sum())
+    remaining = len(demand_lons) - pre_covered
+    required = coverage_requirement * len(demand_lons) - pre_covered
+    stats = {'excludedSites': int(excluded.sum()), 'existingSensors': len(assets['existing_sensors']), 'preCoveredDemand': pre_covered, 'unusable': assets['unusable']}
+    return excluded, covered, min(1.0, max(0.0, required / remaining)) if remaining else 0.0, stats
 
-    # TODO: Can this variable be continuous (0.0-1.0) instead in order to give fine control over the degree of overlapping?
-    encourage_overlapping = False
+""" Runs optimisation over AOO and config space, returns sensor placement info"""
+# TODO: Can encourage_overlapping be continuous (0.0-1.0) instead in order to give fine control over the degree of overlapping?
+def calculateOptimise(AOO, solver='pulp', configurations=configurations, resolution_km=60, max_sensors=99, coverage_requirement=0.70, encourage_overlapping=False, decompose='off', warm_start=False, limits=None, progress=None,
+                      candidate_resolution_km=None, demand_resolution_km=None, refine_levels=0, raster_resolution_km=RASTER_RESOLUTION_KM, exact_area=False,
+                      assets=None, presolve=True):
+    # --- Step 2: Define problem parameters ---
+    # candidate sensor sites and demand points to cover are sampled independently, both default to resolution_km
+
+    stopwatch = _Stopwatch()
+    candidate_resolution_km = candidate_resolution_km or resolution_km
+    demand_resolution_km = demand_resolution_km or resolution_km
+    lons, lats = get_grid_points_in_polygon_km(AOO, candidate_resolution_km)
+    demand_lons, demand_lats = get_grid_points_in_polygon_km(AOO, demand_resolution_km)
+    require_demand_points(demand_lons, demand_resolution_km)
+    demand_weights = None
+    stopwatch.lap('grid')
+
+    # --- Step 2b: Apply assets ---
+    # candidate sites in (or near) exclusion zones are dropped, demand points existing sensors already cover are
+    # left out of the problem and count towards the requirement (see assets.py); refinement would add sites and
+    # demand points back without either, so it is not used
+
+    num_demand, pre_covered, existing_sensors = len(demand_lons), 0, []
+    if assets is not None:
+        refine_levels = 0
+        excluded, covered, coverage_requirement, asset_stats = apply_assets(assets, lons, lats, demand_lons, demand_lats, coverage_requirement)
+        lons, lats = lons[~excluded], lats[~excluded]
+        demand_lons, demand_lats = demand_lons[~covered], demand_lats[~covered]
+        existing_sensors, pre_covered = assets['existing_sensors'], asset_stats['preCoveredDemand']
+        stopwatch.lap('assets')
 
 
     # --- Step 3: Pre-calculate Covers matrix ---
-    covers = np.zeros((num_locations, num_locations, num_configs))
-    for l_idx, l_point in enumerate(locations):
-        for j_idx, j_key in enumerate(configurations):
-            fan_poly = create_fan_polygon(l_point.x, l_point.y, j_key['range_km'], j_key['azimuth_degree'], j_key['fan_degree'])
-            for i_idx, i_point in enumerate(locations):
-                if fan_poly.contains(i_point):
-                    covers[i_idx, l_idx, j_idx] = 1
+    # fans for every (location, configuration) are tested against all grid points in one bulk query
+    coverage = compute_coverage(lons, lats, configurations, demand_lons, demand_lats)
+    stopwatch.lap('coverage')
 
 
     # --- Step 4: Build and solve the optimization problem ---
-
-    prob = pulp.LpProblem("Sensor_Placement", pulp.LpMinimize)
-    x = pulp.LpVariable.dicts("Place", (range(num_locations), range(num_configs)), cat='Binary')
-    y = pulp.LpVariable.dicts("IsCovered", range(num_locations), cat='Binary')
-
-    y_prime = pulp.LpVariable.dicts("CoveredCount", range(num_locations), cat='Integer')
-    # Objective: Encourage sensor overlapping by subtracting the overlapping cover count
-    prob += pulp.lpSum(x[l][j] for l in range(num_locations) for j in range(num_configs)) - encourage_overlapping * pulp.lpSum(y_prime[i]-1 for i in range(num_locations)), "Objective_func"
-    # Constraint: The covered count variable (y_prime) should  be greater than or equal to the is_covered variable
-    prob += pulp.lpSum(y_prime[i] for i in range(num_locations)) >= encourage_overlapping * pulp.lpSum(y[i] for i in range(num_locations))
-
-    # Constraint: Avoid excessively overlapping the sensors, currently limit at 2
-    for i in range(num_locations):
-        prob += y_prime[i] <= 2
-
-    # Constraint: Link the covered_count variable (y_prime) to the placement variables
-    for i in range(num_locations):
-        prob += pulp.lpSum(covers[i, l, j] * x[l][j] for l in range(num_locations) for j in range(num_configs)) >= encourage_overlapping * y_prime[i]
-
-    # Constraint: Don't exceed the maximum number of available sensors
-    prob += pulp.lpSum(x[l][j] for l in range(num_locations) for j in range(num_configs)) <= max_sensors
-
-    # Constraint: Achieve the required percentage of grid point coverage
-    prob += pulp.lpSum(y[i] for i in range(num_locations)) >= coverage_requirement * num_locations
-
-    # Constraint: Link the is_covered variable to the placement variables
-    for i in range(num_locations):
-        prob += pulp.lpSum(covers[i, l, j] * x[l][j] for l in range(num_locations) for j in range(num_configs)) >= y[i]
-
-    # Constraint: Ensure at most one sensor is placed at any given location
-    for l in range(num_locations):
-        prob += pulp.lpSum(x[l][j] for j in range(num_configs)) <= 1, f"One_Sensor_Per_Location_{l}"
-
-    # Solve the problem
-    prob.solve()
+    # model is assembled from the sparse coverage matrix, see solvers.py for the formulation
+
+    def solve(coverage, costs, demand_weights, initial=None):
+        if solver == 'greedy':
+            return greedy_placement(coverage, max_sensors, coverage_requirement, column_costs=costs, demand_weights=demand_weights)
+        if decompose != 'off':
+            # disjoint parts of the area are solved as separate subproblems, see decompose.py
+            solution = solve_decomposed(coverage, max_sensors, coverage_requirement, encourage_overlapping, solver=solver, column_costs=costs, mode=decompose, demand_weights=demand_weights,
+                                        initial_placement=initial, limits=limits, progress=progress, presolve=presolve)
+        else:
+            solution = solve_placement(coverage, max_sensors, coverage_requirement, encourage_overlapping, solver=solver, column_costs=costs,
+                                       initial_placement=initial, limits=limits, progress=progress, demand_weights=demand_weights, presolve=presolve)
+        if solution['status'] in SOLVED:
+            return solution
+        # no placement from the solver (e.g. the time limit ran out before its first integer solution), a feasible
+        # greedy one (or the warm start, which is one) is returned instead when there is one
+        fallback_start = time.perf_counter()
+        if initial is None:
+            greedy = greedy_placement(coverage, max_sensors, coverage_requirement, column_costs=costs, demand_weights=demand_weights)
+            initial = greedy['placed'] if greedy['status'] == 'Feasible' else None
+        if initial is None:
+            return solution
+        return dict(solution, placed=initial, status='Feasible', gap=None, fallback={'solverStatus': solution['status'], 'placement': 'greedy'},
+                    solve_time=solution['solve_time'] + time.perf_counter() - fallback_start)
+
+    costs = np.tile([c.get('cost', 1.0) for c in configurations], len(lons))
+    heuristic = None
+    if solver == 'greedy' or warm_start:
+        # fast, unproven answer, returned as is for the 'greedy' solver or used to warm start the MILP
+        heuristic = greedy_placement(coverage, max_sensors, coverage_requirement, column_costs=costs)
+        heuristic_stats = {
+            'status': heuristic['status'],
+            'numSensors': f"{int(heuristic['placed'].sum())}",
+            'estCoverage': f"{(heuristic['covered'].sum() + pre_covered) / num_demand * 100:.2f}",
+            'totalCost': float(costs[heuristic['placed']].sum()),
+            'solveTime': round(heuristic['build_time'] + heuristic['solve_time'], 4),
+        }
+        if progress is not None and heuristic['status'] == 'Feasible':
+            # first placement for a streaming client to show while the MILP runs
+            sites = placed_sensor_sites(heuristic['placed'], lons, lats, configurations)
+            progress('incumbent', {
+                'source': 'greedy',
+                'numSensors': f"{len(sites)}",
+                'objective': float(costs[heuristic['placed']].sum()),
+                'geojson': export_to_geojson(filename=None, op_area=None, placed_sensors=[{'location': loc, 'config': config} for loc, config in sites]),
+            })
+        stopwatch.lap('solve' if solver == 'greedy' else 'heuristic')
+    if solver == 'greedy':
+        solution = heuristic
+    else:
+        initial = heuristic['placed'] if heuristic is not None and heuristic['status'] == 'Feasible' else None
+        solution = solve(coverage, costs, demand_weights, initial)
+        stopwatch.lap('solve')
+    # the model build is reported by the solver, the rest of the step is the solve (and its bookkeeping)
+    step = stopwatch.stages.pop('solve')
+    stopwatch.stages['build'] = min(solution['build_time'], step)
+    stopwatch.stages['solve'] = step - stopwatch.stages['build']
+    levels = [_level_stats(coverage, solution)]
+
+    # --- Step 4b: Coarse-to-fine refinement ---
+    # both grids are refined around the coverage boundary and the placed sensors, see refine.py
+
+    if refine_levels:
+        def solve_level(coverage, demand_weights, initial):
+            costs = np.tile([c.get('cost', 1.0) for c in configurations], coverage.num_locations)
+            if initial is None and solver != 'greedy':
+                # the previous placement no longer suffices on the finer demand, start from a greedy one instead
+                greedy = greedy_placement(coverage, max_sensors, coverage_requirement, column_costs=costs, demand_weights=demand_weights)
+                initial = greedy['placed'] if greedy['status'] == 'Feasible' else None
+            return solve(coverage, costs, demand_weights, initial)
+
+        problem, solves = refine(AOO, configurations, {
+            'candidates': (lons, lats), 'demand': (demand_lons, demand_lats), 'demand_weights': demand_weights,
+            'candidate_resolution_km': candidate_resolution_km, 'demand_resolution_km': demand_resolution_km,
+            'coverage': coverage, 'solution': solution,
+        }, solve_level, coverage_requirement, refine_levels)
+        lons, lats = problem['candidates']
+        demand_lons, demand_lats = problem['demand']
+        demand_weights, solution, coverage = problem['demand_weights'], problem['solution'], problem['coverage']
+        costs = np.tile([c.get('cost', 1.0) for c in configurations], len(lons))
+        levels += [_level_stats(coverage, solution) for coverage, solution in solves]
+        stopwatch.lap('refine')
 
     # --- Step 5: Process results and calculate area coverage ---
-
-    print(f"Status: {pulp.LpStatus[prob.status]}")
-    placed_sensors_polygons = []
-    placed_sensors_info = []
-    for l in range(num_locations):
-        for j in range(num_configs):
-            if pulp.value(x[l][j]) == 1:
-                loc = locations[l]
-                fan = create_fan_polygon(loc.x, loc.y, configurations[j]['range_km'], configurations[j]['azimuth_degree'], configurations[j]['fan_degree'])
-                placed_sensors_polygons.append(fan)
-                placed_sensors_info.append({'location': loc, 'config': configurations[j]})
-
-    print(f"Number of sensors placed: {len(placed_sensors_info)}")
-
-    estimated_coverage_perc = sum([pulp.value(y[i]) for i in range(num_locations)]) / num_locations
-    print(f"Estimated coverage percentage: {estimated_coverage_perc*100:.2f}%")
-
-    total_coverage_geom = unary_union(placed_sensors_polygons)
-    final_covered_area = AOO.intersection(total_coverage_geom)
-
-    area_coverage_percentage = (final_covered_area.area / AOO.area)
-    print(f"Actual Area Coverage: {area_coverage_percentage*100:.2f}%")
-    return placed_sensors_info, f'{len(placed_sensors_info)}', f'{estimated_coverage_perc*100:.2f}', f'{area_coverage_percentage*100:.2f}'
-
-@router.post("/optimise-polygon-coverage")
-async def optimise_polygon_coverage(request: Request):
-    # debug
-    print(f"Request: {request}")
-    
-    # Get request data
-    data = await request.json()
-    print("Received GeoJSON:", data)
-    
+    # a solve without a placement places nothing, the estimated coverage is what the placed fans cover
+
+    if solution['status'] not in SOLVED:
+        solution = dict(solution, placed=np.zeros(coverage.num_columns, dtype=bool))
+    solution = dict(solution, covered=coverage.cover_counts(solution['placed']) > 0)
+    placed_sensors_info, estimated_coverage_perc, area_coverage_percentage, area_coverage = evaluate_placement(
+        AOO, solution, lons, lats, configurations, demand_weights, raster_resolution_km, exact_area, existing_sensors, pre_covered)
+    num_sensors = len(placed_sensors_info)
+    stopwatch.lap('evaluate')
+    logger.info("Status: %s (solver: %s, sensors: %d, estimated coverage: %.2f%%, area coverage: %.2f%%, stages: %s)",
+                solution['status'], solver, num_sensors, estimated_coverage_perc * 100, area_coverage_percentage * 100,
+                ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in stopwatch.stages.items()))
+    placed_sensors_info += [{'location': loc, 'config': config, 'existing': True} for loc, config in existing_sensors]
+
+    stats = {
+        'solver': solver,
+        'status': solution['status'],
+        'totalCost': float(costs[solution['placed']].sum()),
+        'buildTime': round(sum(level['buildTime'] for level in levels), 4),
+        'solveTime': round(sum(level['solveTime'] for level in levels), 4),
+        'areaCoverage': area_coverage,
+        # size of the final solve's problem (the finest refinement level) and the seconds spent in each stage
+        'metrics': {
+            **{key: levels[-1][key] for key in ('candidates', 'demandPoints', 'nonZeros', 'variables', 'constraints', 'status', 'gap')},
+            'stages': {stage: round(seconds, 4) for stage, seconds in stopwatch.stages.items()},
+        },
+    }
+    if heuristic is not None:
+        stats['heuristic'] = heuristic_stats
+    if solution.get('fallback') is not None:
+        stats['fallback'] = solution['fallback']
+    if decompose != 'off' and solver != 'greedy':
+        stats['components'] = solution['components']
+        stats['lowerBound'] = solution['lower_bound']
+    if refine_levels:
+        stats['solves'] = levels
+    if solution.get('presolve') is not None:
+        # model size before and after the presolve of the final solve, see presolve.py
+        stats['presolve'] = solution['presolve']
+    if assets is not None:
+        stats['assets'] = asset_stats
+    return placed_sensors_info, f'{num_sensors}', f'{estimated_coverage_perc*100:.2f}', f'{area_coverage_percentage*100:.2f}', stats
+
+""" reads the optional solver options carried alongside the posted features """
+def parse_options(data):
+    try:
+        return OptimiseOptions(**(data.get('options') or {}))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+
+""" runs the optimisation for a posted FeatureCollection (options already validated), returns the response body,
+assets as AssetStore.optimiser_assets (looked up in this process's asset store when not given) """
+def optimise_feature_collection(data, progress=None, assets=None):
     # Coerce request JSON to match python library
-    OpAreaPolygons = geojson_to_multipolygon(data)
+    area_start = time.perf_counter()
+    OpAreaPolygons, area_stats = posted_area(data)
+    options = OptimiseOptions(**(data.get('options') or {}))
     
     # Calculate optimisation
     # 
-    placed_sensors, numSensors, estCoverage, accCoverage = calculateOptimise(OpAreaPolygons)
+    # repeated (or near-identical) areas with the same parameters are served from the result cache
+    if assets is None:
+        assets = asset_store.optimiser_assets(OpAreaPolygons, options)
+    key = result_cache_key(OpAreaPolygons, options, assets_digest(assets))
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # the area is keyed as posted, and simplified for sampling (vertex counts and time saved in stats.area)
+    AOO, simplify_stats = simplify_area(OpAreaPolygons, simplification_tolerance_km(options), sampling_spacings_km(options))
+    area_time = time.perf_counter() - area_start
+
+    configurations = catalog_configurations(options.sensor_catalog)
+    placed_sensors, numSensors, estCoverage, accCoverage, stats = calculateOptimise(
+        AOO,
+        solver=options.solver,
+        configurations=configurations,
+        resolution_km=options.resolution_km,
+        max_sensors=options.max_sensors,
+        coverage_requirement=options.coverage_requirement,
+        encourage_overlapping=options.encourage_overlapping,
+        decompose=options.decompose,
+        warm_start=options.warm_start,
+        presolve=options.presolve,
+        candidate_resolution_km=options.candidate_resolution_km,
+        demand_resolution_km=options.demand_resolution_km,
+        refine_levels=options.refine_levels,
+        raster_resolution_km=options.raster_resolution_km,
+        exact_area=options.exact_area,
+        limits={'time_limit_s': options.time_limit_s, 'gap_rel': options.gap_rel, 'threads': options.threads},
+        progress=progress,
+        assets=assets,
+    )
+    export_start = time.perf_counter()
     geoJsonDemo = export_to_geojson(filename=None, op_area=None,placed_sensors=placed_sensors)
-    print("Optimised Sensor GeoJSON:", data)
+    stats['area'] = {**area_stats, **simplify_stats}
+    stats['metrics']['stages'] = {'area': round(area_time, 4), **stats['metrics']['stages'], 'export': round(time.perf_counter() - export_start, 4)}
+    stats['metrics']['totalTime'] = round(time.perf_counter() - area_start, 4)
+    observe_optimisation(stats)
+    
+    result = {"status": "success", "geojson": geoJsonDemo, "numSensors": f'{numSensors}', "estCoverage": f'{estCoverage}', "accCoverage": f'{accCoverage}', "stats": stats}
+    if stats['status'] not in SOLVED:
+        # nothing placed: infeasible, or stopped by a limit before any placement (and no greedy one to fall back on)
+        result.update(status="failed", detail=f"no placement found (solver status: {stats['status']})")
+    if is_cacheable(result, options):
+        # resultKey names the result's vector tile layer, result:{resultKey} (see tiles.py), which only cached results have
+        result['resultKey'] = key
+        result_cache.put(key, result)
+    return result
+
+""" whether an optimisation response may be reused: not a failed one, nor a solve cut short by the time limit
+(it depends on machine load) """
+def is_cacheable(result, options):
+    return result['status'] == "success" and (options.time_limit_s is None or result['stats']['status'] == 'Optimal')
+
+""" cache key of a posted FeatureCollection (with its optimiser_assets), or None if it cannot be parsed """
+def feature_collection_cache_key(data, assets=None):
+    try:
+        return result_cache_key(geojson_to_multipolygon(data), OptimiseOptions(**(data.get('options') or {})), assets_digest(assets))
+    except Exception:
+        return None
+
+# ?format=compact answers with parametric sensor records instead of GeoJSON, ?precision= quantizes their
+# coordinates (see encoding.py), responses are gzip/brotli compressed when the client accepts it
+@router.post("/optimise-polygon-coverage")
+async def optimise_polygon_coverage(request: Request, format: Literal['geojson', 'compact'] = 'geojson', precision: Optional[int] = Query(default=None, ge=0, le=9)):
+    # Get request data, the payloads themselves are only logged at debug level (ENGINE_LOG_LEVEL=DEBUG)
+    data = await request.json()
+    logger.info("Received GeoJSON: %d features", len(data.get('features', [])))
+    logger.debug("Received GeoJSON: %s", data)
+    parse_options(data)
     
-    # You can add some dummy response here
-    # return JSONResponse({"status": "success", "received": data["geometry"]["type"]})
+    # CPU bound, run off the event loop so other endpoints stay responsive (see jobs.py for queued/cancellable runs)
+    result = await run_in_threadpool(optimise_feature_collection, data)
+    logger.info("Optimised Sensor GeoJSON: %s sensors", result['numSensors'])
+    logger.debug("Optimised Sensor GeoJSON: %s", result)
     
-    return JSONResponse({"status": "success", "geojson": geoJsonDemo, "numSensors": f'{numSensors}', "estCoverage": f'{estCoverage}', "accCoverage": f'{accCoverage}'})
+    return encoded_response(request, result, format=format, precision=precision)
     # return geoJsonDemo
 
+# as /optimise-polygon-coverage, but answers with Server-Sent Events while the solve runs:
+#   incumbent - a first placement (with warm_start or the greedy solver), numSensors, objective and geojson
+#   progress  - solver incumbent objective, bound, relative gap and elapsed seconds (CBC only, HiGHS reports once)
+#   result    - the /optimise-polygon-coverage response body
+#   error     - {"detail": ...} if the optimisation failed
+@router.post("/optimise-polygon-coverage/stream")
+async def stream_optimise_polygon_coverage(request: Request):
+    data = await request.json()
+    parse_options(data)
+    # an empty area is refused before the stream starts, as on /optimise-polygon-coverage
+    await run_in_threadpool(posted_area, data)
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+
+    def progress(event, payload):
+        loop.call_soon_threadsafe(events.put_nowait, (event, payload))
+
+    async def run():
+        try:
+            progress('result', await run_in_threadpool(optimise_feature_collection, data, progress))
+        except Exception as e:
+            progress('error', {'detail': str(e)})
+        finally:
+            loop.call_soon_threadsafe(events.put_nowait, None)
+
+    async def event_stream():
+        solve = asyncio.create_task(run())
+        while (item := await events.get()) is not None:
+            event, payload = item
+            yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        await solve
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# overlap heatmap of a placement: body {"area": FeatureCollection, "sensors": geojson of an optimisation response,
+# "options": {"resolution_km": 5, "exact": false}}, only the sensors' "Coverage Area" features are used
+@router.post("/coverage-heatmap")
+async def coverage_heatmap(request: Request):
+    data = await request.json()
+    try:
+        options = HeatmapOptions(**(data.get('options') or {}))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+    area = geojson_to_multipolygon(data.get('area') or {})
+    if area.is_empty:
+        raise HTTPException(status_code=422, detail="'area' has no polygons")
+    fan_features = [f for f in (data.get('sensors') or {}).get('features', []) if (f.get('properties') or {}).get('type') == 'Coverage Area']
+    fans = [shape(f['geometry']) for f in fan_features]
+
+    raster = await run_in_threadpool(evaluate_coverage, area, fans, options.resolution_km)
+    result = {
+        "status": "success",
+        "coveragePerc": f"{raster['coverage'] * 100:.2f}",
+        "areaKm2": round(raster['area_km2'], 1),
+        "coveredKm2": round(raster['covered_km2'], 1),
+        "maxOverlap": int(raster['counts'].max(initial=0)),
+        # marginal: area no other sensor covers, i.e. what removing this sensor would lose
+        "sensors": [
+            {"sensorId": (f.get('properties') or {}).get('sensor_id', i), "coveredKm2": round(covered, 1), "marginalKm2": round(marginal, 1)}
+            for i, (f, covered, marginal) in enumerate(zip(fan_features, raster['sensor_km2'], raster['marginal_km2']))
+        ],
+        "geojson": heatmap_geojson(raster),
+    }
+    if options.exact:
+        result["exactCoveragePerc"] = f"{exact_area_coverage(area, fans) * 100:.2f}"
+    return JSONResponse(result)
+
+# hit/miss counts and size of the optimisation result cache
+@router.get("/optimise-cache/stats")
+def get_result_cache_stats():
+    return result_cache.stats()
+
 """
 example data for fast responses for testing
 """
@@ -310,11 +591,14 @@ EXAMPLE_OPERATIONAL_AREA = MultiPolygon(
         ],[]],
     ]
 )
-EXAMPLE_PLACED_SENSORS, numSensors, estCoverage, accCoverage = calculateOptimise(EXAMPLE_OPERATIONAL_AREA)
-EXAMPLE_OPTIMISED_PLACEMENT_GEOJSON = export_to_geojson(filename=None, op_area=None,placed_sensors=EXAMPLE_PLACED_SENSORS)
+""" optimisation of EXAMPLE_OPERATIONAL_AREA, computed on first request rather than at import so startup stays fast """
+@lru_cache(maxsize=1)
+def example_optimised_placement():
+    placed_sensors, numSensors, estCoverage, accCoverage, stats = calculateOptimise(EXAMPLE_OPERATIONAL_AREA)
+    geojson = export_to_geojson(filename=None, op_area=None, placed_sensors=placed_sensors)
+    return {"status": "success", "geojson": geojson, "numSensors": f'{numSensors}', "estCoverage": f'{estCoverage}', "accCoverage": f'{accCoverage}', "stats": stats}
 
 # Serves an example result from the optimisation algorithm (used for fast testing only)
 @router.get("/opt-placement-example")
-def run_fill_operation():
-    # return EXAMPLE_OPTIMISED_PLACEMENT_GEOJSON
-    return JSONResponse({"status": "success", "geojson": EXAMPLE_OPTIMISED_PLACEMENT_GEOJSON, "numSensors": f'{numSensors}', "estCoverage": f'{estCoverage}', "accCoverage": f'{accCoverage}'})
\ No newline at end of file
+def run_fill_operation(request: Request, format: Literal['geojson', 'compact'] = 'geojson', precision: Optional[int] = Query(default=None, ge=0, le=9)):
+    return encoded_response(request, example_optimised_placement(), format=format, precision=precision)
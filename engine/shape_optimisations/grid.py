@@ -0,0 +1,106 @@
+import numpy as np
+import shapely
+from shapely.geometry import Point
+
+"""
+Grid sampling of operational areas
+
+The latitude-dependent grid is generated as NumPy arrays and masked against the prepared polygon in
+a single contains_xy call. Grid coordinates are accumulated step by step (as the original nested
+while loops did) so the sampled points are identical to the loop implementation
+"""
+
+EARTH_RADIUS_KM = 6371
+
+
+def _accumulate(start, step, stop):
+    """start, start + step, ... while <= stop, summed sequentially to match repeated += exactly"""
+    count = int(np.floor((stop - start) / step)) + 2 if stop >= start else 0
+    values = np.add.accumulate(np.concatenate([[start], np.full(max(count - 1, 0), step)]))[:count]
+    return values[values <= stop]
+
+
+def get_grid_points_in_polygon_km(polygon, resolution_km=10, as_points=False):
+    """
+    Samples a grid of roughly resolution_km spacing inside polygon, rows of constant latitude
+    with a longitude step that widens towards the poles
+
+    Args:
+        polygon (shapely.Polygon | shapely.MultiPolygon): area to sample
+        resolution_km (float): grid spacing in km
+        as_points (bool): return a list of shapely Points instead of coordinate arrays
+
+    Returns:
+        tuple(np.ndarray, np.ndarray): (lons, lats) of the grid points inside polygon, or a list of
+        Points when as_points is set
+    """
+    min_lon, min_lat, max_lon, max_lat = polygon.bounds
+    lat_step = (resolution_km / EARTH_RADIUS_KM) * (180 / np.pi)
+    row_lats = _accumulate(min_lat, lat_step, max_lat)
+
+    deg_lon_dist_km = (np.pi / 180) * EARTH_RADIUS_KM * np.cos(np.radians(row_lats))
+    safe_dist = np.where(deg_lon_dist_km > 0, deg_lon_dist_km, 1.0)
+    lon_steps = np.where(deg_lon_dist_km > 0, resolution_km / safe_dist, max_lon - min_lon + 1)
+
+    if len(row_lats) == 0:
+        lons = lats = np.zeros(0)
+    else:
+        # every row is accumulated along axis 1, rows narrower than the widest are masked off
+        max_cols = int(np.floor((max_lon - min_lon) / lon_steps.min())) + 2
+        steps = np.repeat(lon_steps[:, None], max_cols, axis=1)
+        steps[:, 0] = min_lon
+        row_lons = np.add.accumulate(steps, axis=1)
+        in_bounds = row_lons <= max_lon
+        lons = row_lons[in_bounds]
+        lats = np.broadcast_to(row_lats[:, None], row_lons.shape)[in_bounds]
+
+    shapely.prepare(polygon)
+    inside = shapely.contains_xy(polygon, lons, lats)
+    lons, lats = lons[inside], lats[inside]
+
+    if as_points:
+        return [Point(lon, lat) for lon, lat in zip(lons, lats)]
+    return lons, lats
+
+
+def get_anchored_grid_points(polygon, resolution_km, origin):
+    """
+    As get_grid_points_in_polygon_km, but on the grid through a fixed origin instead of the polygon's
+    south-west corner, so areas sampled with the same origin share the grid points they overlap on (and
+    an edited area keeps the points it had)
+
+    Row k lies at origin_lat + k * lat_step and its column m at origin_lon + m * lon_step(row), for any
+    (possibly negative) k and m
+
+    Args:
+        polygon (shapely.Polygon | shapely.MultiPolygon): area to sample
+        resolution_km (float): grid spacing in km
+        origin (tuple(float, float)): (lon, lat) of grid point (0, 0)
+
+    Returns:
+        tuple(np.ndarray, np.ndarray, np.ndarray): (lons, lats) of the grid points inside polygon and
+        their int64 keys, equal exactly when the (row, column) grid index is
+    """
+    origin_lon, origin_lat = origin
+    min_lon, min_lat, max_lon, max_lat = polygon.bounds
+    lat_step = (resolution_km / EARTH_RADIUS_KM) * (180 / np.pi)
+    k = np.arange(np.ceil((min_lat - origin_lat) / lat_step), np.floor((max_lat - origin_lat) / lat_step) + 1).astype(np.int64)
+    row_lats = origin_lat + k * lat_step
+
+    deg_lon_dist_km = (np.pi / 180) * EARTH_RADIUS_KM * np.cos(np.radians(row_lats))
+    lon_steps = resolution_km / np.where(deg_lon_dist_km > 0, deg_lon_dist_km, np.inf)
+    m_first = np.ceil((min_lon - origin_lon) / lon_steps)
+    m_last = np.floor((max_lon - origin_lon) / lon_steps)
+    # a row at a pole (infinite step) only keeps column 0, if that is within the bounds
+    m_first, m_last = np.nan_to_num(m_first, nan=0.0), np.nan_to_num(m_last, nan=-1.0)
+    counts = np.maximum(m_last - m_first + 1, 0).astype(np.int64)
+
+    row = np.repeat(np.arange(len(k)), counts)
+    m = (m_first[row] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)).astype(np.int64)
+    lons = origin_lon + m * np.where(np.isfinite(lon_steps), lon_steps, 0.0)[row]
+    lats = row_lats[row]
+    keys = (k[row] << 32) + m  # |m| < 2**31 for any grid spacing above a few metres
+
+    shapely.prepare(polygon)
+    inside = shapely.contains_xy(polygon, lons, lats)
+    return lons[inside], lats[inside], keys[inside]
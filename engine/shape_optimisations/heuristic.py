@@ -0,0 +1,199 @@
+import heapq
+import time
+import numpy as np
+
+"""
+Greedy max-coverage heuristic for the sensor placement problem
+
+Works on the same CoverageMatrix as the MILP and returns in a fraction of its time, without a proof
+of optimality:
+    1. lazy greedy (CELF): repeatedly place the column covering the most uncovered demand points per unit
+       cost. Marginal gains only shrink as points get covered, so a column's stale gain is an upper bound
+       and it is only re-evaluated when it reaches the top of the heap
+    2. local search: drop sensors that are not needed, then repeatedly remove the least useful sensor and
+       repair the coverage with improving 1-swaps (remove one sensor, place another), keeping the smaller
+       placement whenever the requirement is met again
+
+encourage_overlapping is not modelled, the result is also a valid warm start for the MILP in that case.
+"""
+
+MAX_SWAP_ROUNDS = 200
+
+
+class _State:
+    """ current placement, per demand point cover counts and the column/row indexes to update them """
+
+    def __init__(self, coverage, costs, weights, max_swaps):
+        self.coverage = coverage
+        self.swaps_left = max_swaps
+        self.costs = costs
+        self.weights = weights
+        order = np.argsort(coverage.cols, kind='stable')
+        self.col_rows = coverage.rows[order]
+        self.col_ptr = np.concatenate([[0], np.cumsum(np.bincount(coverage.cols, minlength=coverage.num_columns))])
+        self.row_ptr = coverage.row_pointers()
+        self.counts = np.zeros(coverage.num_demand, dtype=np.int64)
+        self.location_used = np.zeros(coverage.num_locations, dtype=bool)
+        self.placed = []
+        self.num_covered = 0.0  # covered demand weight
+
+    def rows_of(self, c):
+        return self.col_rows[self.col_ptr[c]:self.col_ptr[c + 1]]
+
+    def place(self, c):
+        self.num_covered += self.gain(c)
+        self.counts[self.rows_of(c)] += 1
+        self.location_used[c // self.coverage.num_configs] = True
+        self.placed.append(c)
+
+    def remove(self, c):
+        self.num_covered -= self.loss(c)
+        self.counts[self.rows_of(c)] -= 1
+        self.location_used[c // self.coverage.num_configs] = False
+        self.placed.remove(c)
+
+    def gain(self, c):
+        """ weight of the uncovered demand points column c would cover """
+        rows = self.rows_of(c)
+        return float(self.weights[rows[self.counts[rows] == 0]].sum())
+
+    def loss(self, c):
+        """ weight of the demand points only covered by placed column c """
+        rows = self.rows_of(c)
+        return float(self.weights[rows[self.counts[rows] == 1]].sum())
+
+    def snapshot(self):
+        return self.counts.copy(), self.location_used.copy(), list(self.placed), self.num_covered
+
+    def restore(self, snapshot):
+        counts, location_used, placed, num_covered = snapshot
+        self.counts, self.location_used, self.placed = counts.copy(), location_used.copy(), list(placed)
+        self.num_covered = num_covered
+
+
+def _lazy_greedy(state, required, max_sensors):
+    coverage, costs = state.coverage, state.costs
+    gains = np.bincount(coverage.cols, weights=state.weights[coverage.rows], minlength=coverage.num_columns)
+    # zero cost columns are free, so they go first
+    ratio = lambda gain, c: gain / costs[c] if costs[c] > 0 else np.inf * gain
+    heap = [(-ratio(gains[c], c), int(c)) for c in np.flatnonzero(gains)]
+    heapq.heapify(heap)
+    while heap and state.num_covered < required and len(state.placed) < max_sensors:
+        stale, c = heapq.heappop(heap)
+        if state.location_used[c // coverage.num_configs]:
+            continue
+        gain = state.gain(c)
+        if gain <= 0:
+            continue
+        fresh = -ratio(gain, c)
+        if heap and fresh > heap[0][0]:
+            heapq.heappush(heap, (fresh, c))  # no longer the best, re-queue with its current gain
+            continue
+        state.place(c)
+
+
+def _prune(state, required):
+    """ removes sensors whose points stay covered well enough without them, most expensive first """
+    for c in sorted(state.placed, key=lambda c: (-state.costs[c], state.loss(c))):
+        if state.num_covered - state.loss(c) >= required:
+            state.remove(c)
+
+
+def _best_swap(state):
+    """
+    best improving (remove q, place c) pair, c no more expensive than q
+
+    Returns:
+        tuple(int, int, float) | None: (q, c, change in covered weight)
+    """
+    coverage = state.coverage
+    uncovered = np.where(state.counts == 0, state.weights, 0.0)
+    base_gain = np.bincount(coverage.cols, weights=uncovered[coverage.rows], minlength=coverage.num_columns)
+    free = ~np.repeat(state.location_used, coverage.num_configs)
+    best = None
+    for q in state.placed:
+        rows = state.rows_of(q)
+        unique_rows = rows[state.counts[rows] == 1]
+        # points only q covers become uncovered once q is removed, adding to the gain of columns covering them
+        gain = base_gain.copy()
+        if len(unique_rows):
+            lengths = state.row_ptr[unique_rows + 1] - state.row_ptr[unique_rows]
+            covering = np.concatenate([coverage.cols[state.row_ptr[i]:state.row_ptr[i + 1]] for i in unique_rows])
+            gain += np.bincount(covering, weights=np.repeat(state.weights[unique_rows], lengths), minlength=coverage.num_columns)
+        allowed = free.copy()
+        location = q // coverage.num_configs
+        allowed[location * coverage.num_configs:(location + 1) * coverage.num_configs] = True
+        allowed[q] = False
+        allowed &= state.costs <= state.costs[q]
+        if not allowed.any():
+            continue
+        c = int(np.argmax(np.where(allowed, gain, -1)))
+        delta = gain[c] - state.weights[unique_rows].sum()
+        if delta > 1e-9 and (best is None or delta > best[2]):
+            best = (q, c, delta)
+    return best
+
+
+def _swap_until(state, required):
+    """ improving 1-swaps until the requirement is met, none is left or the swap budget is spent """
+    while state.num_covered < required and state.swaps_left > 0:
+        swap = _best_swap(state)
+        if swap is None:
+            break
+        q, c, _ = swap
+        state.remove(q)
+        state.place(c)
+        state.swaps_left -= 1
+    return state.num_covered >= required
+
+
+def greedy_placement(coverage, max_sensors, coverage_requirement, column_costs=None, demand_weights=None, max_swap_rounds=MAX_SWAP_ROUNDS):
+    """
+    Heuristic solution of the placement problem solved exactly by solvers.solve_placement
+
+    Args:
+        coverage (CoverageMatrix): demand point x placement column coverage
+        max_sensors (int): maximum number of sensors that may be placed
+        coverage_requirement (float): fraction (0-1) of demand points that must be covered
+        column_costs (np.ndarray | None): cost per placement column, defaults to 1 per sensor
+        demand_weights (np.ndarray | None): points each demand row stands for, defaults to 1 each
+        max_swap_rounds (int): cap on the 1-swaps made by the local search
+
+    Returns:
+        dict: as solve_placement, status is 'Feasible' when the requirement is met (not proven optimal)
+              and 'Not Solved' otherwise
+    """
+    build_start = time.perf_counter()
+    costs = np.ones(coverage.num_columns) if column_costs is None else np.asarray(column_costs, dtype=float)
+    weights = np.ones(coverage.num_demand) if demand_weights is None else np.asarray(demand_weights, dtype=float)
+    state = _State(coverage, costs, weights, max_swap_rounds)
+    required = coverage_requirement * weights.sum() - 1e-9
+    max_sensors = int(max_sensors)
+    build_time = time.perf_counter() - build_start
+
+    solve_start = time.perf_counter()
+    _lazy_greedy(state, required, max_sensors)
+    if state.num_covered < required:
+        # the sensor budget ran out first, swaps can still raise the coverage
+        _swap_until(state, required)
+    if state.num_covered >= required:
+        _prune(state, required)
+        # one sensor fewer: drop the least useful, repair with swaps, give up at the first failure
+        while state.placed and state.swaps_left > 0:
+            kept = state.snapshot()
+            state.remove(min(state.placed, key=lambda c: (state.loss(c), -state.costs[c])))
+            if not _swap_until(state, required):
+                state.restore(kept)
+                break
+            _prune(state, required)
+    solve_time = time.perf_counter() - solve_start
+
+    placed = np.zeros(coverage.num_columns, dtype=bool)
+    placed[state.placed] = True
+    return {
+        'placed': placed,
+        'covered': state.counts > 0,
+        'status': 'Feasible' if state.num_covered >= required else 'Not Solved',
+        'build_time': build_time,
+        'solve_time': solve_time,
+    }
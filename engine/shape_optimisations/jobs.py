@@ -0,0 +1,289 @@
+import os
+import time
+import uuid
+import queue
+import signal
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from typing import Literal, Optional
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.responses import JSONResponse
+from shape_optimisations.georouter import optimise_feature_collection, feature_collection_cache_key, parse_options, posted_area, is_cacheable
+from shape_optimisations.assets import asset_store
+from shape_optimisations.cache import result_cache
+from shape_optimisations.encoding import encoded_response
+from shape_optimisations.metrics import observe_optimisation
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+"""
+Asynchronous optimisation jobs
+
+A job is submitted and returns an id straight away, its status and result are polled separately.
+Each running job gets its own worker process (from a forkserver with the optimisation modules
+preloaded, so starting one is cheap) in a process group of its own, which means cancelling or timing
+out a running solve really stops it, the solver processes it started included. At most JOB_WORKERS
+jobs run at once, and at most JOB_MAX_QUEUED wait behind them
+"""
+
+JOB_WORKERS = int(os.environ.get("ENGINE_JOB_WORKERS", 2))
+JOB_MAX_QUEUED = int(os.environ.get("ENGINE_JOB_MAX_QUEUED", 16))
+JOB_TIMEOUT_S = float(os.environ.get("ENGINE_JOB_TIMEOUT_S", 600))
+JOB_HISTORY = 256  # finished jobs kept for polling before the oldest are forgotten
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, TIMED_OUT = "queued", "running", "done", "failed", "cancelled", "timed_out"
+FINISHED = (DONE, FAILED, CANCELLED, TIMED_OUT)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def _job_entry(conn, fn, args):
+    """ worker process body, the outcome is sent back over the pipe """
+    if hasattr(os, "setsid"):
+        # own process group, so stopping the job also stops what it started (e.g. the cbc process PuLP runs)
+        os.setsid()
+    try:
+        conn.send((DONE, fn(*args)))
+    except Exception as e:
+        conn.send((FAILED, repr(e)))
+    finally:
+        conn.close()
+
+
+def _stop(process):
+    """ kills a job's worker and its process group, the worker alone if it has no group of its own (yet) """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        process.kill()
+
+
+class JobManager:
+    """
+    Bounded, cancellable job runner, dispatcher threads are started on the first submit
+
+    Args:
+        max_workers (int): jobs running concurrently, each in its own process
+        max_queued (int): jobs allowed to wait for a worker before submit raises JobQueueFull
+        timeout_s (float): default wall-clock limit per job once it starts running
+        preload (list[str]): modules imported once by the forkserver that starts job processes
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, max_queued=JOB_MAX_QUEUED, timeout_s=JOB_TIMEOUT_S, preload=("shape_optimisations.georouter",)):
+        self.max_workers = max_workers
+        self.timeout_s = timeout_s
+        self._ctx = multiprocessing.get_context("forkserver")
+        self._ctx.set_forkserver_preload(list(preload))
+        self.max_queued = max_queued
+        # ids of submitted jobs for the dispatchers, cancelled ones stay in it until a dispatcher skips them, so
+        # max_queued is checked against the count of jobs still queued instead
+        self._pending = queue.Queue()
+        self._queued = 0
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _start_dispatchers(self):
+        if self._threads:
+            return
+        for i in range(self.max_workers):
+            t = threading.Thread(target=self._dispatch, name=f"job-dispatcher-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _forget_old(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in FINISHED]
+        for job_id in finished[:max(len(finished) - JOB_HISTORY, 0)]:
+            del self._jobs[job_id]
+
+    def _new_job(self, fn, args, timeout_s, on_done):
+        return {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "fn": fn,
+            "args": args,
+            "timeout_s": min(timeout_s or self.timeout_s, self.timeout_s),
+            "on_done": on_done,
+            "cancel": threading.Event(),
+            "result": None,
+            "error": None,
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+        }
+
+    def submit(self, fn, *args, timeout_s=None, on_done=None):
+        """
+        queues fn(*args) (fn must be importable by the worker), returns the job id
+
+        on_done(result) is called in this process once the job succeeds
+        """
+        job = self._new_job(fn, args, timeout_s, on_done)
+        job_id = job["id"]
+        with self._lock:
+            self._start_dispatchers()
+            if self._queued >= self.max_queued:
+                raise JobQueueFull(f"{self.max_queued} jobs already queued")
+            self._queued += 1
+            self._jobs[job_id] = job
+            self._pending.put_nowait(job_id)
+            self._forget_old()
+        return job_id
+
+    def add_finished(self, result):
+        """ records a job that is already done (e.g. answered from a cache), returns the job id """
+        job = self._new_job(None, None, None, None)
+        now = time.time()
+        job.update(status=DONE, result=result, started=now, finished=now)
+        with self._lock:
+            self._jobs[job["id"]] = job
+            self._forget_old()
+        return job["id"]
+
+    def _finish(self, job, status, result=None, error=None):
+        with self._lock:
+            job.update(status=status, result=result, error=error, finished=time.time(), fn=None, args=None)
+        if status == DONE and job["on_done"] is not None:
+            try:
+                job["on_done"](result)
+            except Exception:
+                logger.exception("Job %s on_done callback failed", job['id'])
+
+    def _dispatch(self):
+        while True:
+            job_id = self._pending.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job["status"] != QUEUED:
+                    continue
+                self._queued -= 1
+                job.update(status=RUNNING, started=time.time())
+            try:
+                self._run(job)
+            except Exception as e:
+                self._finish(job, FAILED, error=repr(e))
+
+    def _run(self, job):
+        receiver, sender = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(target=_job_entry, args=(sender, job["fn"], job["args"]), daemon=True)
+        process.start()
+        sender.close()
+        deadline = job["started"] + job["timeout_s"]
+        try:
+            while True:
+                if job["cancel"].is_set():
+                    _stop(process)
+                    self._finish(job, CANCELLED)
+                    return
+                if time.time() > deadline:
+                    _stop(process)
+                    self._finish(job, TIMED_OUT, error=f"exceeded {job['timeout_s']}s")
+                    return
+                if receiver.poll(0.1):
+                    status, payload = receiver.recv()
+                    if status == DONE:
+                        self._finish(job, DONE, result=payload)
+                    else:
+                        self._finish(job, FAILED, error=payload)
+                    return
+                if not process.is_alive() and not receiver.poll():
+                    self._finish(job, FAILED, error=f"worker exited with code {process.exitcode}")
+                    return
+        finally:
+            receiver.close()
+            process.join(timeout=5)
+
+    def cancel(self, job_id):
+        """ cancels a queued or running job, returns False if it had already finished """
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["status"] in FINISHED:
+                return False
+            job["cancel"].set()
+            if job["status"] == QUEUED:
+                self._queued -= 1
+                job.update(status=CANCELLED, finished=time.time(), fn=None, args=None)
+            return True
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs[job_id]
+            position = None
+            if job["status"] == QUEUED:
+                queued = [j for j in self._jobs.values() if j["status"] == QUEUED]
+                position = queued.index(job)
+            return {
+                "jobId": job["id"],
+                "status": job["status"],
+                "queuePosition": position,
+                "error": job["error"],
+                "submitted": job["submitted"],
+                "started": job["started"],
+                "finished": job["finished"],
+            }
+
+    def result(self, job_id):
+        with self._lock:
+            job = self._jobs[job_id]
+            return job["status"], job["result"]
+
+    def queue_depth(self):
+        with self._lock:
+            return self._queued
+
+
+job_manager = JobManager()
+
+
+def _get_status(job_id):
+    try:
+        return job_manager.status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+
+# submits an optimisation, body as for /optimise-polygon-coverage
+@router.post("/jobs/optimise-polygon-coverage")
+async def submit_optimisation_job(request: Request, timeout_s: Optional[float] = Query(default=None, gt=0)):
+    data = await request.json()
+    options = parse_options(data)
+    # the worker process has no asset store of its own, the assets the options use are looked up here
+    area, _ = posted_area(data)
+    assets = asset_store.optimiser_assets(area, options)
+    key = feature_collection_cache_key(data, assets)
+    cached = result_cache.get(key) if key is not None else None
+    if cached is not None:
+        return JSONResponse(_get_status(job_manager.add_finished(cached)), status_code=202)
+    # the worker's own cache entry and metrics die with its process, so the result is cached and recorded here too
+    def on_done(result):
+        observe_optimisation(result['stats'])
+        if key is not None and is_cacheable(result, options):
+            result_cache.put(key, result)
+    try:
+        job_id = job_manager.submit(optimise_feature_collection, data, None, assets, timeout_s=timeout_s, on_done=on_done)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return JSONResponse(_get_status(job_id), status_code=202)
+
+@router.get("/jobs/{job_id}")
+def get_job_status(job_id: str):
+    return _get_status(job_id)
+
+# the optimisation response, once the job is done (?format=compact and ?precision= as /optimise-polygon-coverage)
+@router.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str, request: Request, format: Literal['geojson', 'compact'] = 'geojson', precision: Optional[int] = Query(default=None, ge=0, le=9)):
+    status = _get_status(job_id)
+    if status["status"] != DONE:
+        raise HTTPException(status_code=409, detail=status)
+    return encoded_response(request, job_manager.result(job_id)[1], format=format, precision=precision)
+
+@router.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    _get_status(job_id)
+    job_manager.cancel(job_id)
+    return _get_status(job_id)
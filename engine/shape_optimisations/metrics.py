@@ -0,0 +1,207 @@
+import bisect
+import math
+import threading
+import time
+from fastapi import APIRouter, Response
+from shape_optimisations.cache import result_cache
+
+"""
+Prometheus metrics of the engine, served in the text exposition format at GET /metrics
+
+    engine_http_request_duration_seconds      histogram, per method, route template and status code,
+                                              measured until the last body chunk is sent (streams included)
+    engine_optimisations_total                counter, per solver and solution status
+    engine_optimisation_stage_seconds         histogram, per solver and pipeline stage (see calculateOptimise)
+    engine_optimisation_problem_size          histogram, per quantity: candidates, demand points, coverage
+                                              non-zeros, model variables and constraints
+    engine_optimisation_gap                   histogram, relative MIP gap of the final solve, per solver
+    engine_result_cache_events_total          counter, result cache hits/misses/evictions (read at scrape time)
+
+No client library is needed, a metric is a dict of label values to a number (or histogram buckets) behind
+a lock. Optimisations run by job workers are recorded when their result reaches this process (see jobs.py).
+"""
+
+LATENCY_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+STAGE_BUCKETS_S = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+SIZE_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+GAP_BUCKETS = (0, 0.0001, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# stats['metrics'] keys of the problem size, as their 'quantity' label
+PROBLEM_SIZE_QUANTITIES = {
+    'candidates': 'candidates',
+    'demandPoints': 'demand_points',
+    'nonZeros': 'nonzeros',
+    'variables': 'variables',
+    'constraints': 'constraints',
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), collect=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect  # () -> {label values tuple: value}, read at scrape time instead of recorded values
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """ (suffix, label values, extra label strings, value) of every sample """
+        values = self.collect() if self.collect is not None else self._snapshot()
+        return [("", key, (), value) for key, value in sorted(values.items())]
+
+    def _snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.labelnames, key, extra)} {_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS_S):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def _snapshot(self):
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+    def samples(self):
+        samples = []
+        for key, (counts, total) in sorted(self._snapshot().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(("_bucket", key, (f'le="{_number(bound)}"',), cumulative))
+            samples.append(("_sum", key, (), total))
+            samples.append(("_count", key, (), cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """ the metrics rendered by GET /metrics, in registration order """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = MetricsRegistry()
+
+request_duration = registry.register(Histogram(
+    "engine_http_request_duration_seconds", "HTTP request latency until the response body is sent",
+    ("method", "route", "status"), LATENCY_BUCKETS_S))
+optimisations = registry.register(Counter(
+    "engine_optimisations_total", "Optimisations run, by solver and solution status", ("solver", "status")))
+stage_duration = registry.register(Histogram(
+    "engine_optimisation_stage_seconds", "Seconds spent in each optimisation pipeline stage", ("solver", "stage"), STAGE_BUCKETS_S))
+problem_size = registry.register(Histogram(
+    "engine_optimisation_problem_size", "Size of the optimisation problem (of its final solve)", ("quantity",), SIZE_BUCKETS))
+optimality_gap = registry.register(Histogram(
+    "engine_optimisation_gap", "Relative MIP gap of the final solve, when the solver reports one", ("solver",), GAP_BUCKETS))
+registry.register(Counter(
+    "engine_result_cache_events_total", "Optimisation result cache hits, misses and evictions", ("event",),
+    collect=lambda: {(event,): count for event, count in result_cache.stats().items() if event in ("memoryHits", "diskHits", "misses", "evictions")}))
+
+
+def observe_optimisation(stats):
+    """ records the stats of a freshly computed optimisation (calculateOptimise's stats, with their 'metrics') """
+    metrics = stats.get('metrics')
+    if metrics is None:
+        return
+    solver = stats.get('solver')
+    optimisations.inc(solver=solver, status=metrics.get('status'))
+    for stage, seconds in metrics.get('stages', {}).items():
+        stage_duration.observe(seconds, solver=solver, stage=stage)
+    for key, quantity in PROBLEM_SIZE_QUANTITIES.items():
+        if metrics.get(key) is not None:
+            problem_size.observe(metrics[key], quantity=quantity)
+    if metrics.get('gap') is not None:
+        optimality_gap.observe(metrics['gap'], solver=solver)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request into engine_http_request_duration_seconds
+
+    Requests are labelled by their route template (e.g. /jobs/{job_id}) rather than their path, so the
+    number of label values stays bounded, requests no route matched are labelled 'unmatched'
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            request_duration.observe(time.perf_counter() - start, method=scope["method"],
+                                     route=getattr(route, "path", "unmatched"), status=status[0])
+
+
+router = APIRouter()
+
+# Prometheus scrape endpoint
+@router.get("/metrics")
+def get_metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
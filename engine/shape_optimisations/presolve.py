@@ -0,0 +1,171 @@
+import time
+import numpy as np
+from shape_optimisations.coverage import CoverageMatrix
+
+"""
+Presolve of the placement MILP: a smaller CoverageMatrix with the same optimum
+
+    empty columns      a (location, configuration) whose fan covers no demand point is never worth placing
+    dominated columns  column a is dropped when another configuration b at the same location covers every
+                       point a covers at no more cost. Any placement using a can use b instead (still one
+                       sensor at that location), so some optimum avoids a. Ties between identical columns
+                       keep the lowest index, so the relation is a strict order and every dropped column has
+                       a kept dominator. Columns at other locations are not compared: swapping onto a
+                       location that already holds a sensor would break the one sensor per location rows
+    identical rows     demand points covered by exactly the same kept columns are one row weighted by their
+                       combined demand weight (points no kept column covers become a single weighted row).
+                       Rows are grouped by a hash of their column set, and each row's set is then compared
+                       with its group's first row, so a hash collision splits the group rather than merging
+                       rows that differ
+
+Locations left with a single column need no one-sensor row, the solver backends only build those rows
+for locations with several columns (see CoverageMatrix.column_location). A placement on the reduced
+matrix is mapped back with expand_placed, and a warm start onto it with reduce_placement
+(a dropped column moves to its kept dominator, which covers more at no more cost).
+"""
+
+HASH_SEED = 0x5E2503
+
+
+def _row_signatures(rows, cols, num_rows, num_columns):
+    """ two 64-bit hashes and the length of each row's column set, equal for identical sets """
+    rng = np.random.default_rng(HASH_SEED)
+    first, second = (rng.integers(0, 2 ** 63, num_columns, dtype=np.uint64) for _ in range(2))
+    signatures = np.zeros((num_rows, 3), dtype=np.uint64)
+    # uint64 sums wrap, which is all a set hash needs
+    np.add.at(signatures[:, 0], rows, first[cols])
+    np.add.at(signatures[:, 1], rows, second[cols])
+    signatures[:, 2] = np.bincount(rows, minlength=num_rows)
+    return signatures
+
+
+def _identical_rows(rows, cols, num_rows, num_columns):
+    """
+    Groups rows with identical column sets (entries sorted by row, then column)
+
+    Returns:
+        tuple(np.ndarray, np.ndarray): first row of each group, and the group of each row
+    """
+    signatures = _row_signatures(rows, cols, num_rows, num_columns)
+    _, representative, row_map = np.unique(signatures, axis=0, return_index=True, return_inverse=True)
+    row_map = row_map.ravel()
+
+    # every row against the first row of its group, entry by entry
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=num_rows))])
+    lengths = np.diff(indptr)
+    first = representative[row_map]
+    differs = lengths != lengths[first]
+    entries = np.flatnonzero(~differs[rows])
+    offsets = entries - indptr[rows[entries]]
+    differs[rows[entries[cols[entries] != cols[indptr[first[rows[entries]]] + offsets]]]] = True
+    if not differs.any():
+        return representative, row_map
+
+    # hash collision: the rows of the affected groups are regrouped by their actual column sets
+    exact = np.zeros(num_rows, dtype=np.int64)
+    sets = {}
+    for i in np.flatnonzero(np.isin(row_map, row_map[differs])):
+        exact[i] = sets.setdefault((row_map[i], tuple(cols[indptr[i]:indptr[i + 1]])), len(sets))
+    _, representative, row_map = np.unique(np.stack([row_map, exact], axis=1), axis=0, return_index=True, return_inverse=True)
+    return representative, row_map.ravel()
+
+
+def _dominators(coverage, costs, sizes):
+    """ for each column, the kept column dominating it (itself when it is not dominated) """
+    num_columns = coverage.num_columns
+    location = coverage.column_location
+    # every pair of columns at the same location covering the same demand point, counted per point
+    group = coverage.rows * max(coverage.num_locations, 1) + location[coverage.cols]
+    order = np.argsort(group, kind='stable')
+    cols, group = coverage.cols[order], group[order]
+    starts = np.flatnonzero(np.concatenate([[True], group[1:] != group[:-1]]))
+    lengths = np.diff(np.concatenate([starts, [len(group)]]))
+    per_entry = np.repeat(lengths, lengths)
+    first = np.repeat(starts, lengths)
+    entry = np.repeat(np.arange(len(cols)), per_entry)
+    partner = np.repeat(first, per_entry) + np.arange(per_entry.sum()) - np.repeat(np.cumsum(per_entry) - per_entry, per_entry)
+    a, b = cols[entry], cols[partner]
+    distinct = a != b
+    pairs, shared = np.unique(a[distinct] * num_columns + b[distinct], return_counts=True)
+    a, b = np.divmod(pairs, num_columns)
+
+    # b dominates a: covers all of a at no more cost, and is strictly better or (identical) earlier
+    dominates = (shared == sizes[a]) & (costs[b] <= costs[a]) & ((sizes[b] > sizes[a]) | (costs[b] < costs[a]) | (b < a))
+    dominator = np.arange(num_columns)
+    a, b = a[dominates], b[dominates]
+    # one dominator per column, the largest, then follow chains to a column nothing dominates
+    best = np.lexsort((-sizes[b], a))
+    a, b = a[best], b[best]
+    head = np.concatenate([[True], a[1:] != a[:-1]]) if len(a) else np.zeros(0, dtype=bool)
+    dominator[a[head]] = b[head]
+    while True:
+        jumped = dominator[dominator]
+        if np.array_equal(jumped, dominator):
+            return dominator
+        dominator = jumped
+
+
+class Presolve:
+    """
+    Reduces a placement problem before its model is built
+
+    Args:
+        coverage (CoverageMatrix): demand point x placement column coverage
+        costs (np.ndarray): cost per placement column
+        weights (np.ndarray | None): demand weight per row (defaults to 1 each)
+
+    Attributes:
+        coverage (CoverageMatrix): reduced matrix, its columns carry their location (column_location)
+        costs, weights (np.ndarray): of the reduced columns and rows
+        columns (np.ndarray): original column of each reduced column
+        row_map (np.ndarray): reduced row of each original row
+        stats (dict): columns, demandRows and nonZeros as [before, after], and the presolve time
+    """
+
+    def __init__(self, coverage, costs, weights=None):
+        start = time.perf_counter()
+        num_columns, num_demand = coverage.num_columns, coverage.num_demand
+        costs = np.asarray(costs, dtype=float)
+        weights = np.ones(num_demand) if weights is None else np.asarray(weights, dtype=float)
+        sizes = np.bincount(coverage.cols, minlength=num_columns)
+
+        self.dominator = _dominators(coverage, costs, sizes)
+        kept = (self.dominator == np.arange(num_columns)) & (sizes > 0)
+        self.columns = np.flatnonzero(kept)
+        new_column = np.full(num_columns, -1, dtype=np.int64)
+        new_column[self.columns] = np.arange(len(self.columns))
+
+        entries = kept[coverage.cols]
+        rows, cols = coverage.rows[entries], new_column[coverage.cols[entries]]
+        representative, self.row_map = _identical_rows(rows, cols, num_demand, max(len(self.columns), 1))
+        # the entries of one row per identical set
+        first = np.zeros(num_demand, dtype=bool)
+        first[representative] = True
+        entries = first[rows]
+
+        self.coverage = CoverageMatrix(self.row_map[rows[entries]], cols[entries], len(representative), coverage.num_locations,
+                                       coverage.num_configs, column_location=coverage.column_location[self.columns])
+        self.costs = costs[self.columns]
+        self.weights = np.bincount(self.row_map, weights=weights, minlength=len(representative))
+        self.num_columns, self.num_demand = num_columns, num_demand
+        self.stats = {
+            'columns': [num_columns, len(self.columns)],
+            'demandRows': [num_demand, self.coverage.num_demand],
+            'nonZeros': [coverage.nnz, self.coverage.nnz],
+            'presolveTime': round(time.perf_counter() - start, 4),
+        }
+
+    def reduce_placement(self, placed):
+        """ an original placement on the reduced columns, dropped columns moved to their dominator """
+        placed = np.asarray(placed, dtype=bool)
+        reduced = np.zeros(len(self.columns), dtype=bool)
+        moved = self.dominator[np.flatnonzero(placed)]
+        position = np.searchsorted(self.columns, moved)
+        on_kept = (position < len(self.columns)) & (self.columns[np.minimum(position, len(self.columns) - 1)] == moved)
+        reduced[position[on_kept]] = True
+        return reduced
+
+    def expand_placed(self, placed):
+        expanded = np.zeros(self.num_columns, dtype=bool)
+        expanded[self.columns[placed]] = True
+        return expanded
@@ -0,0 +1,124 @@
+import numpy as np
+import shapely
+from shapely.geometry import box, mapping
+from shape_optimisations.grid import EARTH_RADIUS_KM
+
+"""
+Raster evaluation of placed sensor coverage
+
+Fans are burnt into a regular lon/lat grid over the operational area (cell centres tested with
+contains_xy, each fan only within its own bounding box), which gives the area coverage, per-cell overlap
+counts and every sensor's marginal contribution without building the polygon union of all fans. Cells
+are weighted by their true area (cos(latitude)), exact_area_coverage is the polygon overlay in an
+equal-area projection, kept for validation.
+"""
+
+KM_PER_DEGREE = EARTH_RADIUS_KM * np.pi / 180
+RASTER_RESOLUTION_KM = 5
+
+# heatmap fill per overlap count, the last colour is used for anything higher
+OVERLAP_COLOURS = ["#9E9E9E", "#2E7D32", "#F9A825", "#EF6C00", "#C62828"]
+
+
+def evaluate_coverage(AOO, fans, resolution_km=RASTER_RESOLUTION_KM):
+    """
+    Args:
+        AOO (shapely.Polygon | shapely.MultiPolygon): operational area
+        fans (list[shapely.Polygon]): coverage polygon of every placed sensor
+        resolution_km (float): raster cell size
+
+    Returns:
+        dict: 'coverage' (covered fraction of the area), 'area_km2', 'covered_km2', 'counts' (overlap count per
+              cell, -1 outside the area), 'west', 'south', 'lon_step', 'lat_step' (grid georeference),
+              'sensor_km2' and 'marginal_km2' (per fan: area it covers, area only it covers)
+    """
+    if AOO.is_empty:
+        # no cells to cover (the bounds of an empty geometry are NaN)
+        return {'coverage': 0.0, 'area_km2': 0.0, 'covered_km2': 0.0, 'counts': np.full((1, 1), -1, dtype=np.int32), 'west': 0.0, 'south': 0.0,
+                'lon_step': 0.0, 'lat_step': 0.0, 'sensor_km2': [0.0] * len(fans), 'marginal_km2': [0.0] * len(fans)}
+    west, south, east, north = AOO.bounds
+    lat_step = resolution_km / KM_PER_DEGREE
+    lon_step = resolution_km / (KM_PER_DEGREE * np.cos(np.radians((south + north) / 2)))
+    rows = max(int(np.ceil((north - south) / lat_step)), 1)
+    cols = max(int(np.ceil((east - west) / lon_step)), 1)
+    lats = south + (np.arange(rows) + 0.5) * lat_step
+    lons = west + (np.arange(cols) + 0.5) * lon_step
+    grid_lons, grid_lats = np.meshgrid(lons, lats)
+
+    shapely.prepare(AOO)
+    inside = shapely.contains_xy(AOO, grid_lons, grid_lats)
+    cell_km2 = (lat_step * KM_PER_DEGREE) * (lon_step * KM_PER_DEGREE * np.cos(np.radians(lats)))[:, None] * np.ones((1, cols))
+    cell_km2 = np.where(inside, cell_km2, 0.0)
+
+    counts = np.zeros((rows, cols), dtype=np.int32)
+    burnt = []
+    for fan in fans:
+        fan_west, fan_south, fan_east, fan_north = fan.bounds
+        r0, r1 = np.searchsorted(lats, [fan_south, fan_north])
+        c0, c1 = np.searchsorted(lons, [fan_west, fan_east])
+        window = (slice(r0, r1), slice(c0, c1))
+        shapely.prepare(fan)
+        hit = shapely.contains_xy(fan, grid_lons[window], grid_lats[window]) & inside[window]
+        counts[window] += hit
+        burnt.append((window, hit))
+
+    sensor_km2 = [float(cell_km2[window][hit].sum()) for window, hit in burnt]
+    marginal_km2 = [float(cell_km2[window][hit & (counts[window] == 1)].sum()) for window, hit in burnt]
+    area_km2 = float(cell_km2.sum())
+    covered_km2 = float(cell_km2[counts > 0].sum())
+    return {
+        'coverage': covered_km2 / area_km2 if area_km2 > 0 else 0.0,
+        'area_km2': area_km2,
+        'covered_km2': covered_km2,
+        'counts': np.where(inside, counts, -1),
+        'west': west,
+        'south': south,
+        'lon_step': lon_step,
+        'lat_step': lat_step,
+        'sensor_km2': sensor_km2,
+        'marginal_km2': marginal_km2,
+    }
+
+
+def _equal_area(geom):
+    """ sinusoidal projection (x = lon * cos(lat)), planar areas are proportional to true areas """
+    return shapely.transform(geom, lambda xy: np.column_stack([xy[:, 0] * np.cos(np.radians(xy[:, 1])), xy[:, 1]]))
+
+
+def exact_area_coverage(AOO, fans):
+    """ covered fraction of AOO from the polygon overlay of all fans (slow, for validation) """
+    if not fans:
+        return 0.0
+    covered = AOO.intersection(shapely.union_all(fans))
+    return _equal_area(covered).area / _equal_area(AOO).area
+
+
+def heatmap_geojson(raster):
+    """
+    Overlap counts as a GeoJSON FeatureCollection, each row's runs of equal cells merged into one rectangle
+
+    Features carry 'overlap' (number of sensors covering the cell) and 'fill'/'fill-opacity' styling
+    """
+    counts = raster['counts']
+    west, south, lon_step, lat_step = raster['west'], raster['south'], raster['lon_step'], raster['lat_step']
+    features = []
+    for r, row in enumerate(counts):
+        # run boundaries, where the count changes along the row
+        starts = np.flatnonzero(np.concatenate([[True], row[1:] != row[:-1]]))
+        ends = np.append(starts[1:], len(row))
+        for c0, c1 in zip(starts, ends):
+            overlap = int(row[c0])
+            if overlap < 0:
+                continue
+            cell = box(west + c0 * lon_step, south + r * lat_step, west + c1 * lon_step, south + (r + 1) * lat_step)
+            features.append({
+                "type": "Feature",
+                "geometry": mapping(cell),
+                "properties": {
+                    "type": "Coverage Overlap",
+                    "overlap": overlap,
+                    "fill": OVERLAP_COLOURS[min(overlap, len(OVERLAP_COLOURS) - 1)],
+                    "fill-opacity": 0.2 if overlap == 0 else 0.5,
+                },
+            })
+    return {"type": "FeatureCollection", "features": features}
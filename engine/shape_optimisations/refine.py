@@ -0,0 +1,151 @@
+import numpy as np
+import shapely
+from shapely.ops import unary_union
+from shape_optimisations.coverage import create_fan_polygon, compute_coverage
+from shape_optimisations.grid import get_grid_points_in_polygon_km, EARTH_RADIUS_KM
+
+"""
+Coarse-to-fine refinement of the candidate and demand grids
+
+A coarse solve gets the placement roughly right, what a finer grid changes is concentrated near the
+edge of the coverage (which fine demand points are in or out) and around the placed sensors (where a
+slightly moved site or a different azimuth does better). Each refinement level halves both grid
+spacings, but only there:
+    demand     - every fine point belongs to its nearest current demand point, which stands for all of
+                 them through its weight. Points whose cell the coverage boundary passes through are
+                 split into their fine points, the level is re-solved (warm started) and split again
+                 until the boundary of the solution only crosses split cells, so the solver cannot
+                 exploit a coarse point standing for partly uncovered ground
+    candidates - every previous candidate (so the previous placement stays available) plus the fine
+                 sites neighbouring each placed sensor
+"""
+
+KM_PER_DEGREE = EARTH_RADIUS_KM * np.pi / 180
+BAND_SPACINGS = 0.75  # cells within this many coarse spacings of the coverage boundary are split (half diagonal ~0.71)
+NEIGHBOURHOOD_SPACINGS = 0.75  # fine candidate sites within this many coarse spacings of a placed sensor (its 8 neighbours)
+MAX_SPLIT_ROUNDS = 6  # solves per level
+
+
+def _local_points(lons, lats, lat0):
+    """ points in a local equirectangular projection (degrees of latitude), so distances are roughly isotropic """
+    return shapely.points(np.asarray(lons) * np.cos(np.radians(lat0)), lats)
+
+
+def _local_geometry(geom, lat0):
+    scale = np.cos(np.radians(lat0))
+    local = shapely.transform(geom, lambda xy: xy * [scale, 1])
+    shapely.prepare(local)
+    return local
+
+
+class DemandRefinement:
+    """
+    Demand points of one refinement level, the previous level's points split into their fine points on demand
+
+    Args:
+        AOO (shapely.MultiPolygon): operational area
+        lons, lats (np.ndarray): demand points of the previous level
+        weights (np.ndarray | None): their weights, None for 1 each
+        fine_resolution_km (float): spacing of the fine demand grid
+    """
+
+    def __init__(self, AOO, lons, lats, weights, fine_resolution_km):
+        self.lat0 = AOO.centroid.y
+        self.lons, self.lats = lons, lats
+        self.weights = np.ones(len(lons)) if weights is None else np.asarray(weights, dtype=float)
+        self.fine_lons, self.fine_lats = get_grid_points_in_polygon_km(AOO, fine_resolution_km)
+        tree = shapely.STRtree(_local_points(lons, lats, self.lat0))
+        _, self.owner = tree.query_nearest(_local_points(self.fine_lons, self.fine_lats, self.lat0), all_matches=False)
+        self.children = np.bincount(self.owner, minlength=len(lons))
+        self.split = np.zeros(len(lons), dtype=bool)
+
+    def split_near(self, boundary, band_km):
+        """ splits the unsplit points within band_km of boundary, returns whether any was """
+        near = shapely.dwithin(_local_geometry(boundary, self.lat0), _local_points(self.lons, self.lats, self.lat0), band_km / KM_PER_DEGREE)
+        new = near & ~self.split & (self.children > 0)
+        self.split |= new
+        return bool(new.any())
+
+    def points(self):
+        """ (lons, lats, weights): unsplit points keep the weight of all their fine points, split ones share it out """
+        kept = ~self.split
+        fine = self.split[self.owner]
+        fine_weights = self.weights[self.owner[fine]] / self.children[self.owner[fine]]
+        return (np.concatenate([self.lons[kept], self.fine_lons[fine]]),
+                np.concatenate([self.lats[kept], self.fine_lats[fine]]),
+                np.concatenate([self.weights[kept], fine_weights]))
+
+
+def add_neighbour_candidates(AOO, candidate_lons, candidate_lats, site_lons, site_lats, fine_lons, fine_lats, radius_km):
+    """ appends the fine sites within radius_km of a placed sensor that are not candidates yet, existing order is kept """
+    lat0 = AOO.centroid.y
+    near = shapely.dwithin(_local_geometry(shapely.multipoints(shapely.points(site_lons, site_lats)), lat0),
+                           _local_points(fine_lons, fine_lats, lat0), radius_km / KM_PER_DEGREE)
+    existing = set(zip(np.round(candidate_lons, 7), np.round(candidate_lats, 7)))
+    is_new = np.array([(lon, lat) not in existing for lon, lat in zip(np.round(fine_lons, 7), np.round(fine_lats, 7))], dtype=bool)
+    added = near & is_new
+    return np.concatenate([candidate_lons, fine_lons[added]]), np.concatenate([candidate_lats, fine_lats[added]]), bool(added.any())
+
+
+def coverage_boundary(AOO, placed, lons, lats, configurations):
+    """ boundary of the placement's coverage inside AOO (None if nothing is placed) """
+    fans = []
+    for c in np.flatnonzero(placed):
+        l, j = divmod(int(c), len(configurations))
+        config = configurations[j]
+        fans.append(create_fan_polygon(lons[l], lats[l], config['range_km'], config['azimuth_degree'], config['fan_degree']))
+    if not fans:
+        return None
+    boundary = unary_union(fans).boundary.intersection(AOO)
+    return None if boundary.is_empty else boundary
+
+
+def refine(AOO, configurations, problem, solve, coverage_requirement, levels):
+    """
+    Runs the coarse-to-fine levels after the initial solve
+
+    Args:
+        AOO (shapely.MultiPolygon): operational area
+        configurations (list[dict]): sensor configurations
+        problem (dict): 'candidates' (lons, lats), 'demand' (lons, lats), 'demand_weights', 'candidate_resolution_km',
+                        'demand_resolution_km', 'coverage' and 'solution' of the initial solve
+        solve (callable): solve(coverage, demand_weights, initial_placement) -> solution dict, as solve_placement
+        coverage_requirement (float): fraction of the demand weight to cover, to check warm starts
+        levels (int): number of refinement levels
+
+    Returns:
+        tuple(dict, list[tuple(CoverageMatrix, dict)]): the final problem, and every solve made
+    """
+    problem = dict(problem)
+    solves = []
+    for _ in range(levels):
+        candidate_lons, candidate_lats = problem['candidates']
+        demand = DemandRefinement(AOO, *problem['demand'], problem['demand_weights'], problem['demand_resolution_km'] / 2)
+        fine_candidates = get_grid_points_in_polygon_km(AOO, problem['candidate_resolution_km'] / 2)
+        radius_km = NEIGHBOURHOOD_SPACINGS * problem['candidate_resolution_km']
+        band_km = BAND_SPACINGS * problem['demand_resolution_km']
+        solution = problem['solution']
+        for _ in range(MAX_SPLIT_ROUNDS):
+            boundary = coverage_boundary(AOO, solution['placed'], candidate_lons, candidate_lats, configurations)
+            if boundary is None:
+                break
+            sites = np.flatnonzero(solution['placed']) // len(configurations)
+            candidate_lons, candidate_lats, added = add_neighbour_candidates(
+                AOO, candidate_lons, candidate_lats, candidate_lons[sites], candidate_lats[sites], *fine_candidates, radius_km)
+            if not demand.split_near(boundary, band_km) and not added:
+                break
+            demand_lons, demand_lats, demand_weights = demand.points()
+            coverage = compute_coverage(candidate_lons, candidate_lats, configurations, demand_lons, demand_lats)
+            # previous candidates come first, so the previous placement warm starts the finer solve when it still suffices
+            initial = np.zeros(coverage.num_columns, dtype=bool)
+            initial[:len(solution['placed'])] = solution['placed']
+            covered = np.zeros(coverage.num_demand, dtype=bool)
+            covered[coverage.rows[initial[coverage.cols]]] = True
+            feasible = demand_weights[covered].sum() >= coverage_requirement * demand_weights.sum() - 1e-9
+            solution = solve(coverage, demand_weights, initial if feasible else None)
+            solves.append((coverage, solution))
+            problem.update(candidates=(candidate_lons, candidate_lats), demand=(demand_lons, demand_lats),
+                           demand_weights=demand_weights, coverage=coverage, solution=solution)
+        problem.update(candidate_resolution_km=problem['candidate_resolution_km'] / 2,
+                       demand_resolution_km=problem['demand_resolution_km'] / 2)
+    return problem, solves
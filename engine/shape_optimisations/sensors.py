@@ -0,0 +1,44 @@
+from models import SensorType
+
+"""
+Sensor catalog, the sensor types available to the optimiser
+
+Each (sensor type, azimuth) pair becomes one configuration dict consumed by the coverage and solver
+code: {'sensor_type', 'azimuth_degree', 'fan_degree', 'range_km', 'cost'}
+"""
+
+DEFAULT_AZIMUTHS = [0.0, 22.5, 45.0, 67.5, 90.0, 112.5, 135.0, 157.5, 180.0, 202.5, 225.0, 247.5, 270.0, 292.5, 315.0, 337.5]
+
+DEFAULT_SENSOR_CATALOG = [
+    SensorType(name='long_range', range_km=130, fan_degree=50, azimuths=DEFAULT_AZIMUTHS),
+    SensorType(name='wide_angle', range_km=70, fan_degree=130, azimuths=DEFAULT_AZIMUTHS),
+]
+
+
+def catalog_configurations(catalog=None):
+    """
+    Expands a sensor catalog into the list of placement configurations, azimuth major so the default
+    catalog gives the same ordering as the original module-level configurations
+
+    Args:
+        catalog (list[SensorType] | None): defaults to DEFAULT_SENSOR_CATALOG
+
+    Returns:
+        list[dict]: configuration dicts
+    """
+    catalog = DEFAULT_SENSOR_CATALOG if catalog is None else catalog
+    azimuths = sorted({a for sensor in catalog for a in sensor.azimuths})
+    configurations = []
+    for a in azimuths:
+        for sensor in catalog:
+            if a in sensor.azimuths:
+                configurations.append(
+                    {
+                        'sensor_type': sensor.name,
+                        'azimuth_degree': a,
+                        'fan_degree': sensor.fan_degree,
+                        'range_km': sensor.range_km,
+                        'cost': sensor.cost,
+                    }
+                )
+    return configurations
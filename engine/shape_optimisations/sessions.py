@@ -0,0 +1,279 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+import numpy as np
+from typing import Literal, Optional
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from shape_optimisations.georouter import parse_options, posted_area, export_to_geojson, evaluate_placement, apply_assets, require_demand_points, _Stopwatch, _level_stats
+from shape_optimisations.grid import get_anchored_grid_points
+from shape_optimisations.coverage import compute_coverage, update_coverage
+from shape_optimisations.solvers import solve_placement, SOLVED
+from shape_optimisations.heuristic import greedy_placement
+from shape_optimisations.sensors import catalog_configurations
+from shape_optimisations.encoding import encoded_response
+from shape_optimisations.assets import asset_store
+from shape_optimisations.areas import simplify_area, simplification_tolerance_km, sampling_spacings_km
+from shape_optimisations.metrics import observe_optimisation
+
+router = APIRouter()
+
+"""
+Incremental re-optimisation of an edited operational area
+
+A session keeps the grids, coverage matrix and placement of its last optimisation. Grids are sampled
+through a fixed origin (the first area's south-west corner, see grid.get_anchored_grid_points), so an
+edited area keeps every grid point its old and new shapes share. On resubmission only the grid points
+the edit added are tested against the fans (coverage.update_coverage), and the solve is warm started from
+the previous placement at the sites the edit kept (or from the greedy heuristic when that placement no
+longer meets the requirement). The options are fixed for the lifetime of a session, the assets they
+name (exclusion zones, existing sensors) are looked up again for every optimisation.
+
+At most SESSION_MAX sessions are kept, the least recently used is dropped first, as is any left idle
+for SESSION_TTL_S.
+"""
+
+SESSION_MAX = int(os.environ.get("ENGINE_SESSION_MAX", 32))
+SESSION_TTL_S = float(os.environ.get("ENGINE_SESSION_TTL_S", 3600))
+
+
+def _match_keys(keys, previous_keys):
+    """ index of each grid key in previous_keys, -1 where it is new """
+    if len(previous_keys) == 0:
+        return np.full(len(keys), -1)
+    order = np.argsort(previous_keys)
+    position = np.minimum(np.searchsorted(previous_keys, keys, sorter=order), len(previous_keys) - 1)
+    return np.where(previous_keys[order[position]] == keys, order[position], -1)
+
+
+class OptimisationSession:
+    """
+    Grids, coverage and placement of the last optimisation of one (edited) operational area
+
+    Args:
+        options (OptimiseOptions): solve parameters for every optimisation of the session, refine_levels
+                                   and decompose are not used
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.configurations = catalog_configurations(options.sensor_catalog)
+        self.lock = threading.Lock()
+        self.origin = None
+        self.candidates = None  # (lons, lats, grid keys)
+        self.demand = None
+        self.coverage = None
+        self.solution = None
+        self.coverage_requirement = None  # of the grids' remaining demand points, after existing sensors
+
+    def optimise(self, area, area_stats, area_time=0.0):
+        """
+        optimises the (edited) area, reusing what the previous optimisation computed, returns the response body
+
+        Args:
+            area (shapely.MultiPolygon): the posted area, as parsed by areas.parse_polygons
+            area_stats (dict): parse_polygons' report of it
+            area_time (float): seconds spent parsing it, counted in the 'area' stage
+        """
+        options = self.options
+        num_configs = len(self.configurations)
+        stopwatch = _Stopwatch()
+        # the area is simplified for sampling as on /optimise-polygon-coverage
+        AOO, simplify_stats = simplify_area(area, simplification_tolerance_km(options), sampling_spacings_km(options))
+        stopwatch.lap('area')
+        stopwatch.stages['area'] += area_time
+        if self.origin is None:
+            self.origin = AOO.bounds[:2]
+        candidates = get_anchored_grid_points(AOO, options.candidate_resolution_km or options.resolution_km, self.origin)
+        demand = get_anchored_grid_points(AOO, options.demand_resolution_km or options.resolution_km, self.origin)
+        require_demand_points(demand[0], options.demand_resolution_km or options.resolution_km)
+        stopwatch.lap('grid')
+        # as calculateOptimise, excluded sites and the demand points existing sensors cover are left out of the grids
+        coverage_requirement, existing_sensors, pre_covered, asset_stats = options.coverage_requirement, [], 0, None
+        assets = asset_store.optimiser_assets(AOO, options)
+        if assets is not None:
+            excluded, covered, coverage_requirement, asset_stats = apply_assets(assets, *candidates[:2], *demand[:2], coverage_requirement)
+            candidates = tuple(a[~excluded] for a in candidates)
+            demand = tuple(a[~covered] for a in demand)
+            existing_sensors, pre_covered = assets['existing_sensors'], asset_stats['preCoveredDemand']
+            stopwatch.lap('assets')
+        if self.coverage is None:
+            old_candidate, old_demand = np.full(len(candidates[0]), -1), np.full(len(demand[0]), -1)
+            coverage = compute_coverage(candidates[0], candidates[1], self.configurations, demand[0], demand[1])
+        else:
+            old_candidate, old_demand = _match_keys(candidates[2], self.candidates[2]), _match_keys(demand[2], self.demand[2])
+            coverage = update_coverage(self.coverage, candidates[0], candidates[1], self.configurations, demand[0], demand[1], old_candidate, old_demand)
+        coverage_time = sum(stopwatch.stages.get(stage, 0.0) for stage in ('grid', 'assets')) + stopwatch.lap('coverage')
+
+        costs = np.tile([c.get('cost', 1.0) for c in self.configurations], len(candidates[0]))
+        unchanged = (self.solution is not None and coverage_requirement == self.coverage_requirement and np.all(old_candidate >= 0) and np.all(old_demand >= 0)
+                     and len(old_candidate) == len(self.candidates[0]) and len(old_demand) == len(self.demand[0]))
+        initial, warm_start = None, None
+        if unchanged:
+            # the grids did not change (e.g. an edit finer than the spacing), nor does the optimum
+            solution = dict(self.solution)
+            solution['placed'] = np.zeros(coverage.num_columns, dtype=bool)
+            solution['placed'].reshape(-1, num_configs)[:] = self.solution['placed'].reshape(-1, num_configs)[old_candidate]
+            solution['covered'] = self.solution['covered'][old_demand]
+            solution['build_time'] = solution['solve_time'] = 0.0
+            warm_start = 'unchanged'
+        elif options.solver == 'greedy':
+            solution = greedy_placement(coverage, options.max_sensors, coverage_requirement, column_costs=costs)
+        else:
+            if self.solution is not None:
+                # previous placement at the kept sites, a warm start if it still meets the requirement on the new grid
+                kept = np.flatnonzero(old_candidate >= 0)
+                initial = np.zeros(coverage.num_columns, dtype=bool)
+                initial.reshape(-1, num_configs)[kept] = self.solution['placed'].reshape(-1, num_configs)[old_candidate[kept]]
+                covered = np.zeros(coverage.num_demand, dtype=bool)
+                covered[coverage.rows[initial[coverage.cols]]] = True
+                if initial.sum() <= options.max_sensors and covered.mean() >= coverage_requirement - 1e-9:
+                    warm_start = 'previous'
+                else:
+                    initial = None
+            if initial is None and (self.solution is not None or options.warm_start):
+                greedy = greedy_placement(coverage, options.max_sensors, coverage_requirement, column_costs=costs)
+                if greedy['status'] == 'Feasible':
+                    initial, warm_start = greedy['placed'], 'greedy'
+            solution = solve_placement(coverage, options.max_sensors, coverage_requirement, options.encourage_overlapping,
+                                       solver=options.solver, column_costs=costs, initial_placement=initial, presolve=options.presolve,
+                                       limits={'time_limit_s': options.time_limit_s, 'gap_rel': options.gap_rel, 'threads': options.threads})
+        # as calculateOptimise, the model build is reported by the solver, the rest of the step is the solve
+        step = stopwatch.lap('solve')
+        stopwatch.stages['build'] = min(solution['build_time'], step)
+        stopwatch.stages['solve'] = step - stopwatch.stages['build']
+        incremental = {
+            'newCandidates': int((old_candidate < 0).sum()),
+            'removedCandidates': 0 if self.candidates is None else len(self.candidates[0]) - int((old_candidate >= 0).sum()),
+            'newDemandPoints': int((old_demand < 0).sum()),
+            'removedDemandPoints': 0 if self.demand is None else len(self.demand[0]) - int((old_demand >= 0).sum()),
+            'coverageTime': round(coverage_time, 4),
+            'warmStart': warm_start,
+        }
+        if solution['status'] not in SOLVED:
+            solution = dict(solution, placed=np.zeros(coverage.num_columns, dtype=bool), covered=np.zeros(coverage.num_demand, dtype=bool))
+        self.candidates, self.demand, self.coverage, self.solution = candidates, demand, coverage, solution
+        self.coverage_requirement = coverage_requirement
+
+        placed_sensors, estimated_coverage, area_coverage_percentage, area_coverage = evaluate_placement(
+            AOO, solution, candidates[0], candidates[1], self.configurations, None, options.raster_resolution_km, options.exact_area, existing_sensors, pre_covered)
+        num_sensors = len(placed_sensors)
+        placed_sensors += [{'location': loc, 'config': config, 'existing': True} for loc, config in existing_sensors]
+        stopwatch.lap('evaluate')
+        geojson = export_to_geojson(filename=None, op_area=None, placed_sensors=placed_sensors)
+        stopwatch.lap('export')
+        level = _level_stats(coverage, solution)
+        result = {
+            "status": "success",
+            "geojson": geojson,
+            "numSensors": f"{num_sensors}",
+            "estCoverage": f"{estimated_coverage*100:.2f}",
+            "accCoverage": f"{area_coverage_percentage*100:.2f}",
+            "stats": {
+                'solver': options.solver,
+                'status': solution['status'],
+                'totalCost': float(costs[solution['placed']].sum()),
+                'buildTime': round(solution['build_time'], 4),
+                'solveTime': round(solution['solve_time'], 4),
+                'areaCoverage': area_coverage,
+                'incremental': incremental,
+                'area': {**area_stats, **simplify_stats},
+                'metrics': {
+                    **{key: level[key] for key in ('candidates', 'demandPoints', 'nonZeros', 'variables', 'constraints', 'status', 'gap')},
+                    'stages': {stage: round(seconds, 4) for stage, seconds in stopwatch.stages.items()},
+                    'totalTime': round(sum(stopwatch.stages.values()), 4),
+                },
+            },
+        }
+        if asset_stats is not None:
+            result['stats']['assets'] = asset_stats
+        if solution['status'] not in SOLVED:
+            # nothing placed, as optimise_feature_collection
+            result.update(status="failed", detail=f"no placement found (solver status: {solution['status']})")
+        observe_optimisation(result['stats'])
+        return result
+
+
+class SessionStore:
+    """
+    Bounded LRU of optimisation sessions, idle ones expire
+
+    Args:
+        max_sessions (int): sessions kept before the least recently used is dropped
+        ttl_s (float): idle seconds before a session expires
+    """
+
+    def __init__(self, max_sessions=SESSION_MAX, ttl_s=SESSION_TTL_S):
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self._sessions = OrderedDict()  # id -> (session, last used)
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._sessions and (len(self._sessions) > self.max_sessions or now - next(iter(self._sessions.values()))[1] > self.ttl_s):
+            self._sessions.popitem(last=False)
+
+    def create(self, options):
+        session_id = uuid.uuid4().hex
+        session = OptimisationSession(options)
+        with self._lock:
+            self._sessions[session_id] = (session, time.monotonic())
+            self._expire(time.monotonic())
+        return session_id, session
+
+    def get(self, session_id):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if session_id not in self._sessions:
+                return None
+            session, _ = self._sessions.pop(session_id)
+            self._sessions[session_id] = (session, now)
+            return session
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+
+sessions = SessionStore()
+
+
+def _optimise_session(session, posted):
+    with session.lock:
+        return session.optimise(*posted)
+
+""" (area, parse report, parse seconds) of a posted FeatureCollection, parsed as by optimise_feature_collection,
+which must have at least one polygon """
+def _posted_area(data):
+    start = time.perf_counter()
+    area, area_stats = posted_area(data)
+    return area, area_stats, time.perf_counter() - start
+
+# starts a session: same body and response as /optimise-polygon-coverage, plus the "sessionId" to PUT edits to
+@router.post("/optimise-polygon-coverage/sessions")
+async def create_optimise_session(request: Request, format: Literal['geojson', 'compact'] = 'geojson', precision: Optional[int] = Query(default=None, ge=0, le=9)):
+    data = await request.json()
+    options = parse_options(data)
+    posted = _posted_area(data)
+    session_id, session = sessions.create(options)
+    result = await run_in_threadpool(_optimise_session, session, posted)
+    return encoded_response(request, {"sessionId": session_id, **result}, format=format, precision=precision)
+
+# re-optimises the session for the edited FeatureCollection (its options are ignored, they are fixed per session)
+@router.put("/optimise-polygon-coverage/sessions/{session_id}")
+async def update_optimise_session(session_id: str, request: Request, format: Literal['geojson', 'compact'] = 'geojson', precision: Optional[int] = Query(default=None, ge=0, le=9)):
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found (it may have expired)")
+    posted = _posted_area(await request.json())
+    result = await run_in_threadpool(_optimise_session, session, posted)
+    return encoded_response(request, {"sessionId": session_id, **result}, format=format, precision=precision)
+
+@router.delete("/optimise-polygon-coverage/sessions/{session_id}")
+def delete_optimise_session(session_id: str):
+    if not sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"sessionId": session_id, "status": "deleted"}
@@ -1,10 +1,9 @@
 import numpy as np
 from shapely.geometry import Polygon, Point, mapping
 from shapely.ops import unary_union
-import matplotlib.pyplot as plt
-from matplotlib.patches import Patch, Wedge
 import pulp
 import json
+from shape_optimisations.grid import get_grid_points_in_polygon_km
 
 # --- Step 1: Helper functions ---
 
@@ -22,24 +21,6 @@ def create_fan_polygon(center_lon, center_lat, range_km, orientation_deg, fan_an
     fan_points = [(center_lon, center_lat)] + arc_points
     return Polygon(fan_points)
 
-def get_grid_points_in_polygon_km(polygon, resolution_km):
-    EARTH_RADIUS_KM = 6371
-    min_lon, min_lat, max_lon, max_lat = polygon.bounds
-    grid_points = []
-    lat_step = (resolution_km / EARTH_RADIUS_KM) * (180 / np.pi)
-    current_lat = min_lat
-    while current_lat <= max_lat:
-        deg_lon_dist_km = (np.pi / 180) * EARTH_RADIUS_KM * np.cos(np.radians(current_lat))
-        lon_step = resolution_km / deg_lon_dist_km if deg_lon_dist_km > 0 else max_lon - min_lon + 1
-        current_lon = min_lon
-        while current_lon <= max_lon:
-            point = Point(current_lon, current_lat)
-            if polygon.contains(point):
-                grid_points.append(point)
-            current_lon += lon_step
-        current_lat += lat_step
-    return grid_points
-
 # --- Step 2: Define problem parameters ---
 
 operational_area = Polygon([
@@ -48,7 +29,7 @@ operational_area = Polygon([
     (-20.414034, 59.679341),
 ])
 
-locations = get_grid_points_in_polygon_km(operational_area, 20)
+locations = get_grid_points_in_polygon_km(operational_area, 20, as_points=True)
 num_locations = len(locations)
 sensor_range_km = 120
 sensor_fov_deg = 90
@@ -0,0 +1,618 @@
+import os
+import re
+import time
+import select
+import tempfile
+import threading
+import numpy as np
+import pulp
+from shape_optimisations.presolve import Presolve
+
+"""
+Sensor placement MILP, assembled straight from a sparse CoverageMatrix
+
+Each demand point's coverage constraints only reference the placement columns whose fan contains it,
+so building the model costs O(nnz) rather than O(demand x locations x configs). The same model can be
+handed to different backends:
+    'pulp'  - PuLP expressions solved with CBC (the original path)
+    'highs' - matrix-native scipy.optimize.milp (HiGHS), no per-term Python objects
+
+Variables, per demand point i and placement column c (location l, configuration j):
+    x[c]       binary, configuration j placed at location l, minimised at its sensor type's cost
+    y[i]       binary, demand point i is covered
+    y_prime[i] integer, covered count (only built, and rewarded, when encourage_overlapping)
+
+A PlacementModel presolves its coverage first (see presolve.py): dominated columns are dropped and
+identical demand rows merged into weighted rows, and one-sensor-per-location rows are only built for
+locations left with several columns.
+
+An initial placement (e.g. from heuristic.greedy_placement) can warm start the solve: CBC takes it as
+its first incumbent, HiGHS (scipy exposes no initial solution) gets it as an objective cutoff row.
+
+Solver limits (a dict with any of 'time_limit_s', 'gap_rel', 'threads') stop the search early, the best
+placement found so far is then returned with status 'Feasible'. Stopped before finding any (or infeasible),
+nothing is placed: the variable values are then no placement. While CBC runs, its log is followed and
+each new incumbent or bound is passed to an optional progress callback, HiGHS only reports its result.
+
+The sensor budget and the coverage requirement are the right-hand sides of single rows, a PlacementModel
+keeps the built model so a series of solves (see sweep.py) only changes those two numbers.
+"""
+
+MAX_OVERLAP = 2
+SOLVED = ('Optimal', 'Feasible')  # statuses with a placement, any other solve places nothing
+PROGRESS_POLL_S = 0.2
+
+# CBC log lines carrying an incumbent objective and/or the best possible (bound) objective
+NUMBER = r"(-?\d+(?:\.\d+)?(?:e[-+]?\d+)?)"
+CBC_PROGRESS_PATTERNS = [
+    (re.compile(rf"Continuous objective value is {NUMBER}"), None, 1),
+    (re.compile(rf"Cbc0038I Solution found of {NUMBER}"), 1, None),
+    (re.compile(rf"Cbc0038I Mini branch and bound improved solution from {NUMBER} to {NUMBER}"), 2, None),
+    (re.compile(rf"Cbc0038I Rounding solution of {NUMBER}"), 1, None),
+    (re.compile(rf"Cbc00(?:04|12)I Integer solution of {NUMBER}"), 1, None),
+    (re.compile(rf"Cbc0010I After \d+ nodes, \d+ on tree, {NUMBER} best solution, best possible {NUMBER}"), 1, 2),
+    (re.compile(rf"Cbc000[15]I .*best objective {NUMBER},? \(best possible {NUMBER}\)"), 1, 2),
+]
+
+
+def _changed(new, old):
+    """ CBC prints the same value at different precisions, only real changes count """
+    if new is None or old is None:
+        return new is not old
+    return abs(new - old) > 1e-4 * max(abs(old), 1)
+
+
+class _CbcLogWatcher(threading.Thread):
+    """
+    follows the CBC log while it is written, calls progress('progress', {...}) (when given) on every change
+
+    CBC block-buffers its output into a regular file, so where available the log is a pseudo-terminal
+    (line buffered) and lines arrive as they are printed, otherwise the file is read when CBC exits
+    """
+
+    def __init__(self, log_dir, progress):
+        super().__init__(daemon=True)
+        self.progress = progress
+        self.stopped = threading.Event()
+        self.start_time = time.perf_counter()
+        self.objective = None
+        self.bound = None
+        self._pending = ""
+        try:
+            self._master, self._slave = os.openpty()
+            self.path = os.ttyname(self._slave)
+        except (AttributeError, OSError):
+            self._master = self._slave = None
+            self.path = os.path.join(log_dir, "cbc.log")
+
+    def _feed(self, text):
+        self._pending += text.replace("\r", "")
+        *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            self._parse(line)
+
+    def _parse(self, line):
+        for pattern, objective_group, bound_group in CBC_PROGRESS_PATTERNS:
+            match = pattern.search(line)
+            if match is None:
+                continue
+            objective = float(match.group(objective_group)) if objective_group else self.objective
+            bound = float(match.group(bound_group)) if bound_group else self.bound
+            if self.objective is not None and objective is not None and objective > self.objective:
+                objective = self.objective  # heuristics can report worse solutions than the incumbent
+            if _changed(objective, self.objective) or _changed(bound, self.bound):
+                self.objective, self.bound = objective, bound
+                if self.progress is not None:
+                    self.progress('progress', {
+                        'objective': objective,
+                        'bound': bound,
+                        'gap': self.gap,
+                        'elapsed': round(time.perf_counter() - self.start_time, 3),
+                    })
+            return
+
+    @property
+    def gap(self):
+        """ relative gap between the incumbent and the bound, None until both are known """
+        if self.objective is None or self.bound is None:
+            return None
+        return max(self.objective - self.bound, 0) / max(abs(self.objective), 1e-9)
+
+    def _read_available(self, timeout):
+        while select.select([self._master], [], [], timeout)[0]:
+            try:
+                chunk = os.read(self._master, 65536)
+            except OSError:
+                return
+            if not chunk:
+                return
+            self._feed(chunk.decode(errors="replace"))
+            timeout = 0
+
+    def run(self):
+        if self._master is None:
+            return
+        while not self.stopped.is_set():
+            self._read_available(PROGRESS_POLL_S)
+        self._read_available(0)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        if self._master is None:
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    self._feed(f.read())
+        else:
+            os.close(self._master)
+            os.close(self._slave)
+        self._feed("\n")
+
+
+def _cbc_solve(prob, limits, warm_start, progress):
+    """ solves prob with CBC under the given limits, returns its solution status name and relative MIP gap """
+    options = dict(
+        msg=False,
+        warmStart=warm_start,
+        timeLimit=limits.get('time_limit_s'),
+        gapRel=limits.get('gap_rel'),
+        threads=limits.get('threads'),
+    )
+    # the log is always followed, its last incumbent and bound give the gap a solve stopped short at
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        watcher = _CbcLogWatcher(tmp_dir, progress)
+        watcher.start()
+        try:
+            prob.solve(pulp.PULP_CBC_CMD(logPath=watcher.path, **options))
+        finally:
+            watcher.stop()
+    # CBC reports 'Optimal' when stopped by a limit with a solution in hand, sol_status tells them apart
+    if prob.sol_status == pulp.LpSolutionIntegerFeasible:
+        return 'Feasible', watcher.gap
+    status = pulp.LpStatus[prob.status]
+    # a proven optimum can still log a fractional bound (the integral objective rounds it up), its gap is 0
+    return status, 0.0 if status == 'Optimal' else watcher.gap
+
+
+def _shared_locations(coverage):
+    """ columns at locations holding several columns, grouped per location: the one sensor rows to build """
+    location = coverage.column_location
+    shared = np.flatnonzero(np.bincount(location)[location] > 1) if len(location) else np.zeros(0, dtype=np.int64)
+    order = np.argsort(location[shared], kind='stable')
+    shared = shared[order]
+    boundaries = np.flatnonzero(np.diff(location[shared])) + 1
+    return np.split(shared, boundaries) if len(shared) else []
+
+
+def _location_rows(coverage, sparse):
+    """ the one sensor per location rows as a sparse (shared locations x columns) matrix """
+    groups = _shared_locations(coverage)
+    cols = np.concatenate(groups) if groups else np.zeros(0, dtype=np.int64)
+    row = np.repeat(np.arange(len(groups)), [len(g) for g in groups])
+    return sparse.csr_matrix((np.ones(len(cols)), (row, cols)), shape=(len(groups), coverage.num_columns))
+
+
+class _PulpPlacement:
+    """ the placement MILP as a PuLP model, built once and solved by CBC for any budget and requirement """
+
+    def __init__(self, coverage, costs, encourage_overlapping, weights=None):
+        build_start = time.perf_counter()
+        num_demand = coverage.num_demand
+        indptr = coverage.row_pointers()
+        self.coverage = coverage
+        self.encourage_overlapping = encourage_overlapping
+
+        prob = pulp.LpProblem("Sensor_Placement", pulp.LpMinimize)
+        x = [pulp.LpVariable(f"Place_{c}", cat='Binary') for c in range(coverage.num_columns)]
+        y = [pulp.LpVariable(f"IsCovered_{i}", cat='Binary') for i in range(num_demand)]
+        # covered counts only matter to the objective when overlapping is encouraged
+        y_prime = [pulp.LpVariable(f"CoveredCount_{i}", upBound=MAX_OVERLAP, cat='Integer') for i in range(num_demand)] if encourage_overlapping else None
+        all_placements = pulp.lpSum(x)
+
+        # Objective: Minimise placed sensor cost, encouraging overlapping by subtracting the overlapping cover count
+        placement_cost = pulp.LpAffineExpression([(x[c], float(costs[c])) for c in range(coverage.num_columns)])
+        weights = np.ones(num_demand) if weights is None else np.asarray(weights, dtype=float)
+        if encourage_overlapping:
+            overlap = pulp.LpAffineExpression([(y_prime[i], float(weights[i])) for i in range(num_demand)]) - float(weights.sum())
+            prob += placement_cost - overlap, "Objective_func"
+            # Constraint: The covered count variable (y_prime) should  be greater than or equal to the is_covered variable
+            prob += pulp.lpSum(y_prime) >= pulp.lpSum(y)
+        else:
+            prob += placement_cost, "Objective_func"
+
+        # Constraint: Link covered_count (y_prime) and is_covered (y) to the placement variables covering each point
+        for i in range(num_demand):
+            covering = pulp.LpAffineExpression([(x[c], 1) for c in coverage.cols[indptr[i]:indptr[i + 1]]])
+            if encourage_overlapping:
+                prob += covering >= y_prime[i]
+            prob += covering >= y[i]
+
+        # Constraint: Don't exceed the maximum number of available sensors (right-hand side set per solve)
+        prob += all_placements <= 0, "Max_sensors"
+
+        # Constraint: Achieve the required percentage of grid point coverage (right-hand side set per solve)
+        prob += pulp.LpAffineExpression([(y[i], float(weights[i])) for i in range(num_demand)]) >= 0, "Coverage_requirement"
+
+        # Constraint: Ensure at most one sensor is placed at any given location (holding more than one column)
+        for columns in _shared_locations(coverage):
+            prob += pulp.lpSum(x[c] for c in columns) <= 1, f"One_Sensor_Per_Location_{coverage.column_location[columns[0]]}"
+        self.prob, self.x, self.y, self.y_prime = prob, x, y, y_prime
+        self.total_weight = float(weights.sum())
+        self.num_variables, self.num_constraints = prob.numVariables(), prob.numConstraints()
+        self.build_time = time.perf_counter() - build_start
+
+    def solve(self, max_sensors, coverage_requirement, initial=None, limits=None, progress=None):
+        update_start = time.perf_counter()
+        self.prob.constraints["Max_sensors"].changeRHS(max_sensors)
+        self.prob.constraints["Coverage_requirement"].changeRHS(coverage_requirement * self.total_weight)
+        if initial is not None:
+            counts = self.coverage.cover_counts(initial)
+            for c, v in enumerate(self.x):
+                v.setInitialValue(int(initial[c]))
+            for i in range(self.coverage.num_demand):
+                self.y[i].setInitialValue(int(counts[i] > 0))
+                if self.encourage_overlapping:
+                    self.y_prime[i].setInitialValue(int(min(counts[i], MAX_OVERLAP)))
+        update_time = time.perf_counter() - update_start
+
+        solve_start = time.perf_counter()
+        status, gap = _cbc_solve(self.prob, limits or {}, initial is not None, progress)
+        solve_time = time.perf_counter() - solve_start
+
+        placed = np.array([(v.varValue or 0) > 0.5 for v in self.x], dtype=bool)
+        covered = np.array([(v.varValue or 0) > 0.5 for v in self.y], dtype=bool)
+        return placed, covered, status, update_time, solve_time, gap
+
+
+# scipy.optimize.milp status codes mapped onto the PuLP status names reported by the 'pulp' backend
+HIGHS_STATUS = {0: 'Optimal', 1: 'Not Solved', 2: 'Infeasible', 3: 'Unbounded', 4: 'Undefined'}
+
+
+def _import_highs():
+    try:
+        from scipy.optimize import milp, LinearConstraint, Bounds
+        from scipy import sparse
+    except ImportError as e:
+        raise RuntimeError("the 'highs' solver backend requires scipy (pip install scipy)") from e
+    return milp, LinearConstraint, Bounds, sparse
+
+
+class _HighsPlacement:
+    """ the placement MILP as scipy.optimize.milp (HiGHS) arrays, built once, row bounds set per solve """
+
+    def __init__(self, coverage, costs, encourage_overlapping, weights=None):
+        milp, LinearConstraint, Bounds, sparse = _import_highs()
+        build_start = time.perf_counter()
+        num_demand, num_columns = coverage.num_demand, coverage.num_columns
+        A = coverage.to_scipy()
+        I = sparse.identity(num_demand, format='csr')
+        ones_x = sparse.csr_matrix(np.ones((1, num_columns)))
+        ones_y = sparse.csr_matrix(np.ones((1, num_demand)))
+        weights = np.ones(num_demand) if weights is None else np.asarray(weights, dtype=float)
+        weights_y = sparse.csr_matrix(weights[None, :])
+        per_location = _location_rows(coverage, sparse)
+        num_shared = per_location.shape[0]
+
+        # variable order is [x, y] (plus y_prime when overlapping is encouraged), rows mirror the constraints of the 'pulp' backend
+        if encourage_overlapping:
+            self.rows = sparse.bmat([
+                [None, -ones_y, ones_y],            # sum(y_prime) >= sum(y)
+                [A, None, -I],                      # A x >= y_prime
+                [A, -I, None],                      # A x >= y
+                [ones_x, None, None],               # sum(x) <= max_sensors
+                [None, weights_y, None],            # sum(w * y) >= coverage_requirement * sum(w)
+                [per_location, None, None],         # one sensor per location
+            ], format='csr')
+            self.lower = np.concatenate([[0], np.zeros(2 * num_demand), [-np.inf], [0], np.full(num_shared, -np.inf)])
+            self.upper = np.concatenate([[np.inf], np.full(2 * num_demand, np.inf), [0], [np.inf], np.ones(num_shared)])
+            self.budget_row = 1 + 2 * num_demand
+        else:
+            self.rows = sparse.bmat([
+                [A, -I],                            # A x >= y
+                [ones_x, None],                     # sum(x) <= max_sensors
+                [None, weights_y],                  # sum(w * y) >= coverage_requirement * sum(w)
+                [per_location, None],               # one sensor per location
+            ], format='csr')
+            self.lower = np.concatenate([np.zeros(num_demand), [-np.inf], [0], np.full(num_shared, -np.inf)])
+            self.upper = np.concatenate([np.full(num_demand, np.inf), [0], [np.inf], np.ones(num_shared)])
+            self.budget_row = num_demand
+        # the requirement row follows the budget row
+        self.requirement_row = self.budget_row + 1
+
+        num_overlap = num_demand if encourage_overlapping else 0
+        self.objective = np.concatenate([np.asarray(costs, dtype=float), np.zeros(num_demand), -weights[:num_overlap]])
+        self.bounds = Bounds(
+            np.concatenate([np.zeros(num_columns + num_demand), np.full(num_overlap, -np.inf)]),
+            np.concatenate([np.ones(num_columns + num_demand), np.full(num_overlap, MAX_OVERLAP)]),
+        )
+        self.integrality = np.ones(num_columns + num_demand + num_overlap)
+        self.coverage, self.encourage_overlapping, self.total_weight = coverage, encourage_overlapping, float(weights.sum())
+        self.num_variables, self.num_constraints = len(self.objective), self.rows.shape[0]
+        self.build_time = time.perf_counter() - build_start
+
+    def solve(self, max_sensors, coverage_requirement, initial=None, limits=None, progress=None):
+        milp, LinearConstraint, _, _ = _import_highs()
+        num_demand, num_columns = self.coverage.num_demand, self.coverage.num_columns
+        update_start = time.perf_counter()
+        upper, lower = self.upper.copy(), self.lower.copy()
+        upper[self.budget_row] = max_sensors
+        lower[self.requirement_row] = coverage_requirement * self.total_weight
+        constraints = [LinearConstraint(self.rows, lower, upper)]
+        if initial is not None and not self.encourage_overlapping:
+            # nothing costlier than the initial placement can be optimal, prunes the branch and bound early
+            constraints.append(LinearConstraint(self.objective, -np.inf, float(self.objective[:num_columns] @ initial) + 1e-6))
+        update_time = time.perf_counter() - update_start
+
+        solve_start = time.perf_counter()
+        res = milp(self.objective, integrality=self.integrality, bounds=self.bounds, constraints=constraints, options=_highs_options(limits))
+        solve_time = time.perf_counter() - solve_start
+        if progress is not None and res.x is not None:
+            progress('progress', {'objective': res.fun, 'bound': res.mip_dual_bound, 'gap': res.mip_gap, 'elapsed': round(solve_time, 3)})
+
+        if res.x is None:
+            placed, covered = np.zeros(num_columns, dtype=bool), np.zeros(num_demand, dtype=bool)
+        else:
+            placed = res.x[:num_columns] > 0.5
+            covered = res.x[num_columns:num_columns + num_demand] > 0.5
+        return placed, covered, _highs_status(res), update_time, solve_time, _highs_gap(res)
+
+
+def _highs_options(limits):
+    """ scipy.optimize.milp options for the solver limits, scipy has no thread setting so 'threads' is ignored """
+    limits = limits or {}
+    options = {}
+    if limits.get('time_limit_s') is not None:
+        options['time_limit'] = limits['time_limit_s']
+    if limits.get('gap_rel') is not None:
+        options['mip_rel_gap'] = limits['gap_rel']
+    return options
+
+
+def _highs_status(res):
+    # status 1 is an iteration/time limit, a solution found before it is still usable
+    if res.status == 1 and res.x is not None:
+        return 'Feasible'
+    return HIGHS_STATUS.get(res.status, 'Undefined')
+
+
+def _highs_gap(res):
+    gap = getattr(res, 'mip_gap', None)
+    return None if res.x is None or gap is None else float(gap)
+
+
+class _PulpMaxCoverage:
+    """ most (weighted) demand points covered within a sensor budget, PuLP model with the budget set per solve """
+
+    def __init__(self, coverage, weights=None):
+        build_start = time.perf_counter()
+        indptr = coverage.row_pointers()
+        weights = np.ones(coverage.num_demand) if weights is None else np.asarray(weights, dtype=float)
+
+        prob = pulp.LpProblem("Max_Coverage", pulp.LpMaximize)
+        x = [pulp.LpVariable(f"Place_{c}", cat='Binary') for c in range(coverage.num_columns)]
+        y = [pulp.LpVariable(f"IsCovered_{i}", cat='Binary') for i in range(coverage.num_demand)]
+        prob += pulp.LpAffineExpression([(y[i], float(weights[i])) for i in range(coverage.num_demand)]), "Covered_points"
+        prob += pulp.lpSum(x) <= 0, "Sensor_budget"
+        for i in range(coverage.num_demand):
+            prob += pulp.LpAffineExpression([(x[c], 1) for c in coverage.cols[indptr[i]:indptr[i + 1]]]) >= y[i]
+        for columns in _shared_locations(coverage):
+            prob += pulp.lpSum(x[c] for c in columns) <= 1, f"One_Sensor_Per_Location_{coverage.column_location[columns[0]]}"
+        self.coverage, self.prob, self.x, self.y = coverage, prob, x, y
+        self.num_variables, self.num_constraints = prob.numVariables(), prob.numConstraints()
+        self.build_time = time.perf_counter() - build_start
+
+    def solve(self, sensor_budget, initial=None, limits=None):
+        update_start = time.perf_counter()
+        self.prob.constraints["Sensor_budget"].changeRHS(sensor_budget)
+        if initial is not None:
+            counts = self.coverage.cover_counts(initial)
+            for c, v in enumerate(self.x):
+                v.setInitialValue(int(initial[c]))
+            for i, v in enumerate(self.y):
+                v.setInitialValue(int(counts[i] > 0))
+        update_time = time.perf_counter() - update_start
+
+        solve_start = time.perf_counter()
+        status, gap = _cbc_solve(self.prob, limits or {}, initial is not None, None)
+        solve_time = time.perf_counter() - solve_start
+
+        placed = np.array([(v.varValue or 0) > 0.5 for v in self.x], dtype=bool)
+        covered = np.array([(v.varValue or 0) > 0.5 for v in self.y], dtype=bool)
+        return placed, covered, status, update_time, solve_time, gap
+
+
+class _HighsMaxCoverage:
+    """ as _PulpMaxCoverage, scipy.optimize.milp (HiGHS) arrays with the budget row bound set per solve """
+
+    def __init__(self, coverage, weights=None):
+        _, _, _, sparse = _import_highs()
+        build_start = time.perf_counter()
+        num_demand, num_columns = coverage.num_demand, coverage.num_columns
+        weights = np.ones(num_demand) if weights is None else np.asarray(weights, dtype=float)
+        per_location = _location_rows(coverage, sparse)
+        self.rows = sparse.bmat([
+            [coverage.to_scipy(), -sparse.identity(num_demand)],                                             # A x >= y
+            [sparse.csr_matrix(np.ones((1, num_columns))), None],                                             # sum(x) <= budget
+            [per_location, None],                                                                             # one sensor per location
+        ], format='csr')
+        self.lower = np.concatenate([np.zeros(num_demand), [-np.inf], np.full(per_location.shape[0], -np.inf)])
+        self.upper = np.concatenate([np.full(num_demand, np.inf), [0], np.ones(per_location.shape[0])])
+        self.budget_row = num_demand
+        self.objective = np.concatenate([np.zeros(num_columns), -weights])
+        self.coverage, self.weights = coverage, weights
+        self.num_variables, self.num_constraints = len(self.objective), self.rows.shape[0]
+        self.build_time = time.perf_counter() - build_start
+
+    def solve(self, sensor_budget, initial=None, limits=None):
+        milp, LinearConstraint, Bounds, _ = _import_highs()
+        num_demand, num_columns = self.coverage.num_demand, self.coverage.num_columns
+        update_start = time.perf_counter()
+        upper = self.upper.copy()
+        upper[self.budget_row] = sensor_budget
+        constraints = [LinearConstraint(self.rows, self.lower, upper)]
+        if initial is not None:
+            # nothing covering less than the initial placement can be optimal
+            covered_weight = float(self.weights[self.coverage.cover_counts(initial) > 0].sum())
+            constraints.append(LinearConstraint(self.objective, -np.inf, -covered_weight + 1e-6))
+        update_time = time.perf_counter() - update_start
+
+        solve_start = time.perf_counter()
+        res = milp(self.objective, integrality=np.ones(num_columns + num_demand), bounds=Bounds(0, 1), constraints=constraints, options=_highs_options(limits))
+        solve_time = time.perf_counter() - solve_start
+
+        if res.x is None:
+            placed, covered = np.zeros(num_columns, dtype=bool), np.zeros(num_demand, dtype=bool)
+        else:
+            placed, covered = res.x[:num_columns] > 0.5, res.x[num_columns:] > 0.5
+        return placed, covered, _highs_status(res), update_time, solve_time, _highs_gap(res)
+
+
+SOLVER_BACKENDS = {
+    'pulp': _PulpPlacement,
+    'highs': _HighsPlacement,
+}
+
+MAX_COVERAGE_BACKENDS = {
+    'pulp': _PulpMaxCoverage,
+    'highs': _HighsMaxCoverage,
+}
+
+
+def _unreduced_size(coverage, objective, encourage_overlapping):
+    """ (variables, constraints) of the model built on the coverage as given """
+    num_columns, num_demand, num_shared = coverage.num_columns, coverage.num_demand, len(_shared_locations(coverage))
+    if objective == 'max_coverage':
+        return num_columns + num_demand, num_demand + 1 + num_shared
+    if encourage_overlapping:
+        return num_columns + 2 * num_demand, 2 * num_demand + 3 + num_shared
+    return num_columns + num_demand, num_demand + 2 + num_shared
+
+
+def _solution(model, placed, covered, status, build_time, solve_time, gap):
+    return {
+        'placed': placed,
+        'covered': covered,
+        'status': status,
+        'build_time': build_time,
+        'solve_time': solve_time,
+        'gap': gap,
+        'variables': model.num_variables,
+        'constraints': model.num_constraints,
+    }
+
+
+class PlacementModel:
+    """
+    A placement model built once and re-solved for other sensor budgets and coverage requirements,
+    only the right-hand sides of those two rows change between solves
+
+    Args:
+        coverage (CoverageMatrix): demand point x placement column coverage
+        solver (str): key of SOLVER_BACKENDS
+        objective (str): 'min_cost' (cheapest placement meeting the requirement within the budget, as
+                         solve_placement) or 'max_coverage' (most demand weight within the budget, as
+                         solve_max_coverage, the requirement is ignored)
+        encourage_overlapping, column_costs, demand_weights: as solve_placement ('min_cost' only)
+        presolve (bool): build the model on the presolved coverage (see presolve.py), placements and
+                         solutions stay in terms of the given coverage
+
+    Attributes:
+        build_time (float): seconds spent presolving and building the model
+        num_variables, num_constraints (int): size of the built model
+        presolve_stats (dict | None): the presolve's stats plus 'variables' and 'constraints' as [before, after]
+    """
+
+    def __init__(self, coverage, solver='pulp', objective='min_cost', encourage_overlapping=False, column_costs=None, demand_weights=None, presolve=True):
+        if solver not in SOLVER_BACKENDS:
+            raise ValueError(f"Unknown solver '{solver}', expected one of {list(SOLVER_BACKENDS)}")
+        if objective not in ('min_cost', 'max_coverage'):
+            raise ValueError(f"Unknown objective '{objective}', expected 'min_cost' or 'max_coverage'")
+        self.objective = objective
+        self.coverage = coverage
+        costs = np.ones(coverage.num_columns) if column_costs is None or objective == 'max_coverage' else np.asarray(column_costs, dtype=float)
+        self._presolve = Presolve(coverage, costs, demand_weights) if presolve else None
+        if self._presolve is not None:
+            before = _unreduced_size(coverage, objective, encourage_overlapping)
+            coverage, costs, demand_weights = self._presolve.coverage, self._presolve.costs, self._presolve.weights
+        if objective == 'min_cost':
+            self._model = SOLVER_BACKENDS[solver](coverage, costs, encourage_overlapping, demand_weights)
+        else:
+            self._model = MAX_COVERAGE_BACKENDS[solver](coverage, demand_weights)
+        self.build_time = self._model.build_time
+        self.num_variables, self.num_constraints = self._model.num_variables, self._model.num_constraints
+
+        self.presolve_stats = None
+        if self._presolve is not None:
+            self.build_time += self._presolve.stats['presolveTime']
+            self.presolve_stats = dict(self._presolve.stats, variables=[before[0], self.num_variables], constraints=[before[1], self.num_constraints])
+
+    def solve(self, max_sensors, coverage_requirement=None, initial_placement=None, limits=None, progress=None):
+        """
+        Args:
+            max_sensors (int): sensor budget
+            coverage_requirement (float | None): fraction of the demand weight to cover ('min_cost' only)
+            initial_placement, limits, progress: as solve_placement, the initial placement must be feasible for
+                                                 this budget and requirement (progress is 'min_cost' only)
+
+        Returns:
+            dict: as solve_placement, 'build_time' only counts updating the model for this solve
+        """
+        if self._presolve is not None and initial_placement is not None:
+            initial_placement = self._presolve.reduce_placement(initial_placement)
+        if self.objective == 'min_cost':
+            solution = _solution(self, *self._model.solve(max_sensors, coverage_requirement, initial=initial_placement, limits=limits, progress=progress))
+        else:
+            solution = _solution(self, *self._model.solve(max_sensors, initial=initial_placement, limits=limits))
+        if self._presolve is not None:
+            solution['placed'] = self._presolve.expand_placed(solution['placed'])
+            solution['presolve'] = self.presolve_stats
+        if solution['status'] not in SOLVED:
+            solution['placed'] = np.zeros(self.coverage.num_columns, dtype=bool)
+        # what the placement covers, the covered variables only bound it from below
+        solution['covered'] = self.coverage.cover_counts(solution['placed']) > 0
+        return solution
+
+
+def solve_placement(coverage, max_sensors, coverage_requirement, encourage_overlapping=False, solver='pulp', column_costs=None, initial_placement=None, limits=None, progress=None, demand_weights=None, presolve=True):
+    """
+    Builds and solves the sensor placement MILP for a CoverageMatrix
+
+    Args:
+        coverage (CoverageMatrix): demand point x placement column coverage
+        max_sensors (int): maximum number of sensors that may be placed
+        coverage_requirement (float): fraction (0-1) of demand points that must be covered
+        encourage_overlapping (bool): reward demand points covered by up to MAX_OVERLAP sensors
+        solver (str): key of SOLVER_BACKENDS
+        column_costs (np.ndarray | None): objective cost per placement column, defaults to 1 per sensor
+        initial_placement (np.ndarray | None): bool per placement column, a feasible placement to warm start from
+        limits (dict | None): optional 'time_limit_s', 'gap_rel' (relative MIP gap) and 'threads'
+        progress (callable | None): progress(event, payload), called with 'progress' events
+                                    {objective, bound, gap, elapsed} as the solve improves
+        demand_weights (np.ndarray | None): how many points each demand row stands for, the requirement is
+                                            then a fraction of the total weight (defaults to 1 each)
+        presolve (bool): drop dominated columns and merge identical demand rows before building the model
+
+    Returns:
+        dict: 'placed' (bool per placement column, none unless the status is in SOLVED), 'covered' (bool per
+              demand point covered by the placement), 'status',
+              'build_time' and 'solve_time' (seconds), 'gap' (relative MIP gap, None when unknown),
+              'variables' and 'constraints' (model size), and 'presolve' (PlacementModel.presolve_stats)
+              when presolved
+    """
+    model = PlacementModel(coverage, solver, 'min_cost', encourage_overlapping, column_costs, demand_weights, presolve)
+    solution = model.solve(max_sensors, coverage_requirement, initial_placement=initial_placement, limits=limits, progress=progress)
+    solution['build_time'] += model.build_time
+    return solution
+
+
+def solve_max_coverage(coverage, sensor_budget, solver='pulp', presolve=True, limits=None):
+    """
+    Covers as many demand points as possible with at most sensor_budget sensors
+
+    Returns:
+        dict: as solve_placement
+    """
+    model = PlacementModel(coverage, solver, 'max_coverage', presolve=presolve)
+    solution = model.solve(sensor_budget, limits=limits)
+    solution['build_time'] += model.build_time
+    return solution
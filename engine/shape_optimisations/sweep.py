@@ -0,0 +1,197 @@
+import json
+import time
+import numpy as np
+from typing import Literal, Optional
+from fastapi import APIRouter, Request, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from models import OptimiseOptions, SweepOptions
+from shape_optimisations.georouter import posted_area, require_demand_points, parse_options, export_to_geojson, placed_sensor_sites
+from shape_optimisations.coverage import create_fan_polygon, compute_coverage
+from shape_optimisations.grid import get_grid_points_in_polygon_km
+from shape_optimisations.solvers import PlacementModel, SOLVED
+from shape_optimisations.heuristic import greedy_placement
+from shape_optimisations.raster import evaluate_coverage
+from shape_optimisations.sensors import catalog_configurations
+from shape_optimisations.encoding import encoded_response
+from shape_optimisations.areas import simplify_area, simplification_tolerance_km, sampling_spacings_km
+
+router = APIRouter()
+
+"""
+Parameter sweeps over one precomputed model
+
+The grid, the coverage matrix and the MILP are built once, each point of the sweep only changes the
+right-hand side of one row (the coverage requirement or the sensor budget, see solvers.PlacementModel)
+and is warm started from the previous point's placement. The points are solved in the order that keeps
+that placement feasible:
+    coverage requirements - highest first, a placement meeting a higher requirement meets the lower ones
+    sensor budgets        - smallest first, a placement within a smaller budget fits the larger ones
+Across all points the Pareto front of (sensors placed, coverage) is returned with each front placement.
+"""
+
+
+def sweep_placements(coverage, coverage_requirements=None, sensor_budgets=None, solver='pulp', max_sensors=99, encourage_overlapping=False, column_costs=None, limits=None, warm_start=False, presolve=True):
+    """
+    Solves the placement problem for each coverage requirement (cheapest placement within max_sensors) or
+    each sensor budget (most demand points covered), exactly one of the two lists is given
+
+    Args:
+        coverage (CoverageMatrix): demand point x placement column coverage
+        solver (str): 'pulp', 'highs' or 'greedy' (heuristic per point, nothing to reuse)
+        warm_start (bool): also seed the first point with the greedy heuristic
+        (others as solve_placement)
+
+    Returns:
+        tuple(float, list[tuple(float, dict)]): seconds spent building the model, and (swept value, solution)
+        in solve order, each solution as solve_placement plus 'warm_started'
+    """
+    by_requirement = coverage_requirements is not None
+    values = sorted(set(coverage_requirements), reverse=True) if by_requirement else sorted(set(int(b) for b in sensor_budgets))
+
+    model = None
+    build_start = time.perf_counter()
+    if solver != 'greedy':
+        objective = 'min_cost' if by_requirement else 'max_coverage'
+        model = PlacementModel(coverage, solver, objective, encourage_overlapping, column_costs if by_requirement else None, presolve=presolve)
+    build_time = time.perf_counter() - build_start
+
+    def greedy(value):
+        if by_requirement:
+            return greedy_placement(coverage, max_sensors, value, column_costs=column_costs)
+        solution = greedy_placement(coverage, value, 1.0)
+        # any placement within the budget answers the max-coverage question, the heuristic just cannot prove it best
+        solution['status'] = 'Feasible'
+        return solution
+
+    solves = []
+    previous = None
+    for value in values:
+        if model is None:
+            solution = greedy(value)
+            solution['warm_started'] = False
+            solves.append((value, solution))
+            continue
+        # the previous point's placement is feasible here by the solve order
+        initial = previous
+        if initial is None and warm_start:
+            seed = greedy(value)
+            initial = seed['placed'] if seed['status'] in SOLVED else None
+        if by_requirement:
+            solution = model.solve(max_sensors, value, initial_placement=initial, limits=limits)
+        else:
+            solution = model.solve(value, initial_placement=initial, limits=limits)
+        solution['warm_started'] = initial is not None
+        solves.append((value, solution))
+        if solution['status'] in SOLVED:
+            previous = solution['placed']
+    return build_time, solves
+
+
+def pareto_front(points):
+    """
+    Args:
+        points (list[tuple(int, float)]): (sensors placed, coverage) per solved point
+
+    Returns:
+        list[int]: indices of the points no other point beats on both (fewer or equal sensors and more
+                   coverage), by number of sensors, the first of any duplicates is kept
+    """
+    order = sorted(range(len(points)), key=lambda i: (points[i][0], -points[i][1], i))
+    front = []
+    for i in order:
+        if not front or points[i][1] > points[front[-1]][1] + 1e-12:
+            front.append(i)
+    return front
+
+
+""" runs a sweep for a posted FeatureCollection with 'options' and 'sweep' members (both validated), returns the response body """
+def sweep_feature_collection(data):
+    options = OptimiseOptions(**(data.get('options') or {}))
+    area, parse_stats = posted_area(data)
+    AOO, area_stats = simplify_area(area, simplification_tolerance_km(options), sampling_spacings_km(options))
+    sweep = SweepOptions(**data['sweep'])
+    configurations = catalog_configurations(options.sensor_catalog)
+
+    # one grid and coverage matrix for every point of the sweep
+    coverage_start = time.perf_counter()
+    lons, lats = get_grid_points_in_polygon_km(AOO, options.candidate_resolution_km or options.resolution_km)
+    demand_lons, demand_lats = get_grid_points_in_polygon_km(AOO, options.demand_resolution_km or options.resolution_km)
+    require_demand_points(demand_lons, options.demand_resolution_km or options.resolution_km)
+    coverage = compute_coverage(lons, lats, configurations, demand_lons, demand_lats)
+    costs = np.tile([c.get('cost', 1.0) for c in configurations], len(lons))
+    coverage_time = time.perf_counter() - coverage_start
+
+    build_time, solves = sweep_placements(
+        coverage,
+        coverage_requirements=sweep.coverage_requirements,
+        sensor_budgets=sweep.max_sensors,
+        solver=options.solver,
+        max_sensors=options.max_sensors,
+        encourage_overlapping=options.encourage_overlapping,
+        column_costs=costs,
+        limits={'time_limit_s': options.time_limit_s, 'gap_rel': options.gap_rel, 'threads': options.threads},
+        warm_start=options.warm_start,
+        presolve=options.presolve,
+    )
+
+    # the covered share from the placement itself, the MILP only needs to mark enough points covered
+    covered_share = []
+    for _, solution in solves:
+        covered = np.zeros(coverage.num_demand, dtype=bool)
+        covered[coverage.rows[solution['placed'][coverage.cols]]] = True
+        covered_share.append(covered.mean())
+    solved = [i for i, (_, solution) in enumerate(solves) if solution['status'] in SOLVED]
+    front = [solved[i] for i in pareto_front([(int(solves[i][1]['placed'].sum()), covered_share[i]) for i in solved])]
+
+    parameter = 'coverageRequirement' if sweep.coverage_requirements is not None else 'maxSensors'
+    points, placements = [], []
+    for i, (value, solution) in enumerate(solves):
+        sites = placed_sensor_sites(solution['placed'], lons, lats, configurations)
+        points.append({
+            parameter: value,
+            'status': solution['status'],
+            'numSensors': f"{len(sites)}",
+            'estCoverage': f"{covered_share[i] * 100:.2f}",
+            'totalCost': float(costs[solution['placed']].sum()),
+            'warmStarted': solution['warm_started'],
+            'solveTime': round(solution['build_time'] + solution['solve_time'], 4),
+            'pareto': i in front,
+        })
+        placements.append(sites)
+    for i in front:
+        fans = [create_fan_polygon(loc.x, loc.y, config['range_km'], config['azimuth_degree'], config['fan_degree']) for loc, config in placements[i]]
+        points[i]['accCoverage'] = f"{evaluate_coverage(AOO, fans, options.raster_resolution_km)['coverage'] * 100:.2f}"
+
+    return {
+        "status": "success",
+        "parameter": parameter,
+        "points": points,
+        "front": [dict(points[i], geojson=export_to_geojson(filename=None, op_area=None, placed_sensors=[{'location': loc, 'config': config} for loc, config in placements[i]]))
+                  for i in front],
+        "stats": {
+            'solver': options.solver,
+            'candidates': coverage.num_locations,
+            'demandPoints': coverage.num_demand,
+            'coverageTime': round(coverage_time, 4),
+            'buildTime': round(build_time, 4),
+            'solveTime': round(sum(solution['solve_time'] for _, solution in solves), 4),
+            'area': {**parse_stats, **area_stats},
+        },
+    }
+
+""" reads the 'sweep' member, which the sweep endpoint requires """
+def parse_sweep(data):
+    try:
+        return SweepOptions(**(data.get('sweep') or {}))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+
+# body: FeatureCollection with 'options' (as /optimise-polygon-coverage, refine_levels and decompose are not
+# used) and 'sweep': {"coverage_requirements": [...]} or {"max_sensors": [...]}
+@router.post("/optimise-polygon-coverage/sweep")
+async def sweep_polygon_coverage(request: Request, format: Literal['geojson', 'compact'] = 'geojson', precision: Optional[int] = Query(default=None, ge=0, le=9)):
+    data = await request.json()
+    parse_options(data)
+    parse_sweep(data)
+    return encoded_response(request, await run_in_threadpool(sweep_feature_collection, data), format=format, precision=precision)
@@ -0,0 +1,305 @@
+import os
+import struct
+import threading
+from collections import OrderedDict
+from typing import Literal
+import numpy as np
+import shapely
+from fastapi import APIRouter, Request, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from shapely.geometry import box, mapping, shape
+from shape_optimisations.cache import result_cache
+from shape_optimisations.catalog import etag_matches, zoom_tolerance, _etag
+from shape_optimisations.encoding import compressed_response, dumps
+from shape_optimisations.environment import TileCache
+
+router = APIRouter()
+
+"""
+Vector tiles of the engine's cached layers, so a client only loads (and parses) what is in view
+
+    GET /tiles/{layer}/{z}/{x}/{y}             Mapbox Vector Tile (protobuf, spec version 2)
+    GET /tiles/{layer}/{z}/{x}/{y}?format=geojson   the same features as a GeoJSON FeatureCollection, lon/lat
+
+A layer is named '{source}' or '{source}:{name}', each source (see layer_sources) looks the layer up and
+returns its features with a version that changes when they do:
+    result:{resultKey}   an optimisation result in the result cache (its sensors and coverage fans)
+    area:{name}          a pre-loaded operational area, coloured-polygons the example coloured polygons
+                         (both registered by main.py)
+
+A layer is projected to web-mercator and indexed once per version, and simplified once per zoom level to
+SIMPLIFY_PIXELS (as the area catalog). A tile clips the features its index finds to the tile plus a
+BUFFER_UNITS margin, so fill and stroke render without seams, then snaps them to the EXTENT grid. No
+client library is needed for the protobuf, MVT only uses varints, packed varints and nested messages.
+Encoded tiles are kept in an LRU of ENGINE_TILE_CACHE_MB and carry ETags.
+"""
+
+TILE_CACHE_MB = float(os.environ.get("ENGINE_TILE_CACHE_MB", 64))
+LAYER_CACHE_SIZE = 16  # projected, indexed layers kept
+EXTENT = 4096  # MVT coordinate units per tile side
+BUFFER_UNITS = 64  # margin around a tile, in EXTENT units
+MAX_ZOOM = 24
+COORDINATE_DECIMALS = 6  # of the geojson format
+MVT_CONTENT_TYPE = "application/vnd.mapbox-vector-tile"
+MAX_LATITUDE = 85.05112878
+
+# MVT geometry types and commands
+POINT, LINESTRING, POLYGON = 1, 2, 3
+MOVE_TO, LINE_TO, CLOSE_PATH = 1, 2, 7
+
+
+def _result_source(key):
+    result = result_cache.peek(key) if key else None
+    if result is None:
+        return None
+    return key, result['geojson']['features']
+
+
+# source -> callable(name or None) -> (version, GeoJSON features) or None when there is no such layer
+layer_sources = {'result': _result_source}
+
+
+def _to_mercator(coords):
+    """ lon/lat to web-mercator (0-1 across the world, y down from the north edge) """
+    lat = np.radians(np.clip(coords[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+    return np.stack([(coords[:, 0] + 180) / 360, (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2], axis=1)
+
+
+def _to_lonlat(coords):
+    return np.stack([coords[:, 0] * 360 - 180, np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * coords[:, 1]))))], axis=1)
+
+
+class VectorLayer:
+    """
+    Features of one layer version, in web-mercator, indexed and simplified per zoom level
+
+    Args:
+        name (str): layer name, also the MVT layer name
+        features (list[dict]): GeoJSON features (properties may be missing)
+    """
+
+    def __init__(self, name, features):
+        self.name = name
+        features = [f for f in features if f.get('geometry')]
+        self.properties = [f.get('properties') or {} for f in features]
+        geometries = np.array([shape(f['geometry']) for f in features], dtype=object)
+        self.geometries = shapely.transform(geometries, _to_mercator)
+        self.tree = shapely.STRtree(self.geometries)
+        self._simplified = {}
+        self._lock = threading.Lock()
+
+    def simplified(self, zoom):
+        with self._lock:
+            if zoom not in self._simplified:
+                # zoom_tolerance is in degrees of longitude, the mercator x spans 360 of them
+                self._simplified[zoom] = shapely.simplify(self.geometries, zoom_tolerance(zoom) / 360, preserve_topology=True)
+            return self._simplified[zoom]
+
+    def clipped(self, z, x, y):
+        """ (feature index, geometry in EXTENT units of the tile) of every feature in the tile and its buffer """
+        n = 2 ** z
+        margin = BUFFER_UNITS / EXTENT
+        bounds = ((x - margin) / n, (y - margin) / n, (x + 1 + margin) / n, (y + 1 + margin) / n)
+        idx = np.sort(self.tree.query(box(*bounds)))
+        clipped = shapely.clip_by_rect(self.simplified(z)[idx], *bounds)
+        tile = shapely.transform(clipped, lambda c: (c * n - (x, y)) * EXTENT)
+        # integer tile coordinates, parts collapsing on that grid are dropped
+        snapped = shapely.set_precision(tile, 1.0)
+        keep = ~shapely.is_empty(snapped)
+        return idx[keep], snapped[keep]
+
+    def mvt(self, z, x, y):
+        idx, geometries = self.clipped(z, x, y)
+        encoder = _LayerEncoder(self.name)
+        for i, geometry in zip(idx, geometries):
+            encoder.add(int(i), self.properties[i], geometry)
+        return _message(3, encoder.encode())
+
+    def geojson(self, z, x, y):
+        idx, geometries = self.clipped(z, x, y)
+        n = 2 ** z
+        lonlat = shapely.transform(geometries, lambda c: _to_lonlat((c / EXTENT + (x, y)) / n).round(COORDINATE_DECIMALS))
+        return {
+            'type': 'FeatureCollection',
+            'features': [{'type': 'Feature', 'id': int(i), 'properties': self.properties[i], 'geometry': mapping(g)} for i, g in zip(idx, lonlat)],
+        }
+
+
+def _varint(value):
+    """ protobuf varint bytes of a non-negative integer """
+    value = int(value)
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append(value & 0x7F | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def _packed_varints(values):
+    return b"".join(_varint(v) for v in values)
+
+
+def _message(field, payload):
+    """ length-delimited field (wire type 2): a string, bytes, packed values or a nested message """
+    return _varint(field << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _zigzag(values):
+    values = np.asarray(values, dtype=np.int64)
+    return (values << 1) ^ (values >> 63)
+
+
+def _value(value):
+    """ MVT Value message of a property """
+    if isinstance(value, bool):
+        return _varint(7 << 3) + _varint(int(value))
+    if isinstance(value, (int, np.integer)) and -2 ** 63 <= value < 2 ** 64:
+        return _varint(5 << 3) + _varint(value) if value >= 0 else _varint(6 << 3) + _varint(int(_zigzag(value)))
+    if isinstance(value, (float, np.floating)):
+        return _varint(3 << 3 | 1) + struct.pack("<d", float(value))
+    # strings, and nested values as their JSON
+    return _message(1, (value if isinstance(value, str) else dumps(value).decode()).encode())
+
+
+def _command(command, count):
+    return command & 0x7 | count << 3
+
+
+class _LayerEncoder:
+    """ one MVT Layer message: features with tags into shared key and value tables """
+
+    def __init__(self, name):
+        self.name = name
+        self.features = []
+        self.keys, self.values = {}, {}
+        self.cursor = np.zeros(2, dtype=np.int64)
+
+    def _tags(self, properties):
+        tags = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            encoded = _value(value)
+            tags += [self.keys.setdefault(key, len(self.keys)), self.values.setdefault(encoded, len(self.values))]
+        return tags
+
+    def _path(self, coords, closed):
+        """ commands of a MoveTo then LineTo path, relative to the end of the previous one """
+        coords = coords.astype(np.int64)
+        deltas = np.diff(np.concatenate([self.cursor[None], coords]), axis=0)
+        self.cursor = coords[-1]
+        params = _zigzag(deltas)
+        commands = [_command(MOVE_TO, 1), *params[0], _command(LINE_TO, len(coords) - 1), *params[1:].ravel()]
+        return commands + [_command(CLOSE_PATH, 1)] if closed else commands
+
+    def add(self, feature_id, properties, geometry):
+        self.cursor = np.zeros(2, dtype=np.int64)
+        parts = shapely.get_parts(geometry)
+        dimension = max(shapely.get_dimensions(parts))
+        parts = parts[shapely.get_dimensions(parts) == dimension]
+        commands = []
+        if dimension == 0:
+            kind = POINT
+            coords = shapely.get_coordinates(parts).astype(np.int64)
+            deltas = np.diff(np.concatenate([np.zeros((1, 2), dtype=np.int64), coords]), axis=0)
+            commands = [_command(MOVE_TO, len(coords)), *_zigzag(deltas).ravel()]
+        elif dimension == 1:
+            kind = LINESTRING
+            for part in parts:
+                coords = shapely.get_coordinates(part)
+                if len(coords) >= 2:
+                    commands += self._path(coords, closed=False)
+        else:
+            kind = POLYGON
+            # exterior rings positive by the surveyor's formula in tile coordinates (clockwise on screen), holes negative
+            for polygon in shapely.orient_polygons(parts, exterior_cw=False):
+                for ring in [polygon.exterior, *polygon.interiors]:
+                    coords = shapely.get_coordinates(ring)[:-1]
+                    if len(coords) >= 3:
+                        commands += self._path(coords, closed=True)
+        if not commands:
+            return
+        self.features.append(
+            _varint(1 << 3) + _varint(feature_id)
+            + _message(2, _packed_varints(self._tags(properties)))
+            + _varint(3 << 3) + _varint(kind)
+            + _message(4, _packed_varints(commands))
+        )
+
+    def encode(self):
+        return (_varint(15 << 3) + _varint(2) + _message(1, self.name.encode())
+                + b"".join(_message(2, feature) for feature in self.features)
+                + b"".join(_message(3, key.encode()) for key in self.keys)
+                + b"".join(_message(4, value) for value in self.values)
+                + _varint(5 << 3) + _varint(EXTENT))
+
+
+class LayerCache:
+    """ the VectorLayer of each layer's current version, least recently used evicted past max_layers """
+
+    def __init__(self, max_layers=LAYER_CACHE_SIZE):
+        self.max_layers = max_layers
+        self._layers = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, layer):
+        """ (version, VectorLayer) of a layer name, None if its source has no such layer """
+        source, _, name = layer.partition(':')
+        if source not in layer_sources:
+            return None
+        found = layer_sources[source](name or None)
+        if found is None:
+            return None
+        version, features = found
+        key = (layer, version)
+        with self._lock:
+            if key in self._layers:
+                self._layers.move_to_end(key)
+                return version, self._layers[key]
+        built = VectorLayer(layer, features)
+        with self._lock:
+            self._layers[key] = built
+            while len(self._layers) > self.max_layers:
+                self._layers.popitem(last=False)
+        return version, built
+
+
+layer_cache = LayerCache()
+tile_cache = TileCache(int(TILE_CACHE_MB * 1024 * 1024))
+
+# tile z/x/y of a layer (see the module docstring for layer names) as a Mapbox Vector Tile, or ?format=geojson
+@router.get("/tiles/{layer}/{z}/{x}/{y}")
+async def get_layer_tile(request: Request, layer: str, z: int, x: int, y: str, format: Literal['mvt', 'geojson'] = 'mvt'):
+    # y may carry the tile's extension, as in .../{y}.mvt or .../{y}.pbf
+    y, _, extension = y.partition('.')
+    if not y.isdigit() or extension not in ('', 'mvt', 'pbf', 'geojson', 'json'):
+        raise HTTPException(status_code=404, detail="Tile not found")
+    y = int(y)
+    format = 'geojson' if extension in ('geojson', 'json') else format
+    if not (0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    found = await run_in_threadpool(layer_cache.get, layer)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Layer not found")
+    version, vector_layer = found
+    key = (layer, version, z, x, y, format)
+    etag = _etag(*key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    content = tile_cache.get(key)
+    if content is None:
+        if format == 'mvt':
+            content = await run_in_threadpool(vector_layer.mvt, z, x, y)
+        else:
+            content = dumps(await run_in_threadpool(vector_layer.geojson, z, x, y))
+        tile_cache.put(key, content)
+    if format == 'mvt':
+        return compressed_response(request, content, media_type=MVT_CONTENT_TYPE, headers=headers)
+    return compressed_response(request, content, media_type="application/geo+json", headers=headers)
+
+# size and hit/miss counts of the vector tile LRU
+@router.get("/tiles/cache/stats")
+def get_tile_cache_stats():
+    return tile_cache.stats()
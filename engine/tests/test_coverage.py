@@ -0,0 +1,60 @@
+import glob
+import json
+import os
+import numpy as np
+import pytest
+from shapely.geometry import MultiPolygon, Point
+from shape_optimisations.areas import as_feature_collection, parse_polygons
+from shape_optimisations.coverage import compute_coverage, create_fan_polygon
+from shape_optimisations.grid import get_grid_points_in_polygon_km
+from shape_optimisations.sensors import catalog_configurations
+
+"""
+compute_coverage against the per-fan Polygon.contains(Point) loop calculateOptimise originally ran,
+on the bundled areas at several grid resolutions
+"""
+
+AREAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "geojson", "areas")
+AREA_FILES = sorted(glob.glob(os.path.join(AREAS_DIR, "*.geojson")))
+RESOLUTIONS_KM = (60, 40)
+
+
+def load_area(path):
+    with open(path) as f:
+        parts, _ = parse_polygons(as_feature_collection(json.load(f)))
+    return MultiPolygon(list(parts))
+
+
+def loop_coverage(candidate_lons, candidate_lats, configurations, demand_lons, demand_lats):
+    """ the original dense (demand, location, config) tensor, one fan and one contains test at a time """
+    demand_points = [Point(lon, lat) for lon, lat in zip(demand_lons, demand_lats)]
+    covers = np.zeros((len(demand_points), len(candidate_lons), len(configurations)))
+    for l, (lon, lat) in enumerate(zip(candidate_lons, candidate_lats)):
+        for j, config in enumerate(configurations):
+            fan = create_fan_polygon(lon, lat, config['range_km'], config['azimuth_degree'], config['fan_degree'])
+            for i, point in enumerate(demand_points):
+                if fan.contains(point):
+                    covers[i, l, j] = 1
+    return covers
+
+
+@pytest.mark.parametrize("resolution_km", RESOLUTIONS_KM)
+@pytest.mark.parametrize("path", AREA_FILES, ids=lambda path: os.path.splitext(os.path.basename(path))[0])
+def test_compute_coverage_matches_contains_loop(path, resolution_km):
+    lons, lats = get_grid_points_in_polygon_km(load_area(path), resolution_km)
+    configurations = catalog_configurations()
+    coverage = compute_coverage(lons, lats, configurations)
+    expected = loop_coverage(lons, lats, configurations, lons, lats)
+    assert expected.any()
+    np.testing.assert_array_equal(coverage.to_dense(), expected)
+
+
+@pytest.mark.parametrize("path", AREA_FILES, ids=lambda path: os.path.splitext(os.path.basename(path))[0])
+def test_compute_coverage_matches_contains_loop_on_separate_demand_grid(path):
+    area = load_area(path)
+    candidate_lons, candidate_lats = get_grid_points_in_polygon_km(area, RESOLUTIONS_KM[0])
+    demand_lons, demand_lats = get_grid_points_in_polygon_km(area, RESOLUTIONS_KM[1])
+    configurations = catalog_configurations()
+    coverage = compute_coverage(candidate_lons, candidate_lats, configurations, demand_lons, demand_lats)
+    expected = loop_coverage(candidate_lons, candidate_lats, configurations, demand_lons, demand_lats)
+    np.testing.assert_array_equal(coverage.to_dense(), expected)
@@ -0,0 +1,139 @@
+import struct
+import zlib
+import numpy as np
+import pytest
+from scipy.io import netcdf_file
+from shape_optimisations.environment import (EnvironmentalDataset, OVERVIEW_MIN, ingest_netcdf, web_mercator_tile_centres,
+                                             write_synthetic_netcdf)
+
+"""
+Ingestion of a small synthetic NetCDF (write_synthetic_netcdf) into the memory-mapped cache, and the grids
+and tiles served from it
+"""
+
+LAT_RANGE, LON_RANGE, RESOLUTION_DEG = (50.0, 70.0), (-30.0, 10.0), 0.083
+DEPTHS = (0.5, 5.1)
+
+
+@pytest.fixture(scope="module")
+def synthetic(tmp_path_factory):
+    """ (path, ingested dataset, meta.json) of a synthetic file with two overview levels """
+    directory = tmp_path_factory.mktemp("environment")
+    path = write_synthetic_netcdf(str(directory / "synthetic.nc"), num_times=2, depths=DEPTHS, lat_range=LAT_RANGE,
+                                  lon_range=LON_RANGE, resolution_deg=RESOLUTION_DEG)
+    meta = ingest_netcdf(path, str(directory / "cache" / "synthetic"))
+    return path, EnvironmentalDataset("synthetic", str(directory / "cache" / "synthetic")), meta
+
+
+def decoded_source(path):
+    """ so(time, depth, lat, lon) of the file unpacked by hand, NaN at its fill value """
+    with netcdf_file(path, 'r', mmap=False, maskandscale=False) as f:
+        so = f.variables['so']
+        raw = np.array(so.data)
+        values = raw * so.scale_factor + so.add_offset
+        return np.where(raw == so._FillValue, np.nan, values)
+
+
+def decode_png(content):
+    """ (h, w, 4) uint8 pixels of an unfiltered RGBA PNG, as encode_png writes them """
+    assert content[:8] == b"\x89PNG\r\n\x1a\n"
+    position, chunks = 8, {}
+    while position < len(content):
+        length, = struct.unpack(">I", content[position:position + 4])
+        kind = content[position + 4:position + 8]
+        chunks[kind] = chunks.get(kind, b"") + content[position + 8:position + 8 + length]
+        position += 12 + length
+    width, height = struct.unpack(">II", chunks[b"IHDR"][:8])
+    rows = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8).reshape(height, 1 + width * 4)
+    return rows[:, 1:].reshape(height, width, 4)
+
+
+def test_ingest_matches_source_with_fill_values_as_nan(synthetic):
+    path, dataset, meta = synthetic
+    source = decoded_source(path)
+    info = meta['variables']['so']
+    assert info['shape'] == list(source.shape)
+    assert meta['depths'] == pytest.approx(DEPTHS)
+    assert meta['times'][0].startswith('2023-12-04')  # 27000 days after 1950-01-01
+    level0 = np.asarray(dataset.levels('so')[0])
+    np.testing.assert_array_equal(np.isnan(level0), np.isnan(source))
+    assert np.isnan(level0).any() and not np.isnan(level0).all()
+    np.testing.assert_allclose(level0, source, rtol=1e-6, equal_nan=True)
+    assert info['min'] == pytest.approx(np.nanmin(source), rel=1e-6)
+    assert info['max'] == pytest.approx(np.nanmax(source), rel=1e-6)
+
+
+def test_overview_levels_are_block_means(synthetic):
+    _, dataset, meta = synthetic
+    levels = dataset.levels('so')
+    assert meta['variables']['so']['levels'] == len(levels) == 2
+    assert max(levels[0].shape[-2:]) > OVERVIEW_MIN >= max(levels[-1].shape[-2:])
+    fine, coarse = np.asarray(levels[0]), np.asarray(levels[1])
+    rows, cols = fine.shape[-2:]
+    assert coarse.shape[-2:] == ((rows + 1) // 2, (cols + 1) // 2)
+    # a block with land in it averages its sea cells only, an all-land block stays NaN
+    for t, d, r, c in [(0, 0, 10, 20), (1, 1, 60, 100)] + [tuple(i) for i in np.argwhere(np.isnan(coarse))[:3]]:
+        block = fine[t, d, 2 * r:2 * r + 2, 2 * c:2 * c + 2]
+        if np.isnan(block).all():
+            assert np.isnan(coarse[t, d, r, c])
+        else:
+            assert coarse[t, d, r, c] == pytest.approx(np.nanmean(block), rel=1e-6)
+
+
+def test_grid_window_of_bbox(synthetic):
+    path, dataset, _ = synthetic
+    west, south, east, north = -10.0, 55.0, -5.0, 58.0
+    grid = dataset.grid('so', time_index=1, depth_index=1, bbox=(west, south, east, north), precision=6)
+    assert grid['level'] == 0 and grid['stride'] == 1
+    rows, cols = grid['shape']
+    lats = grid['lat']['first'] + grid['lat']['step'] * np.arange(rows)
+    lons = grid['lon']['first'] + grid['lon']['step'] * np.arange(cols)
+    half = RESOLUTION_DEG / 2
+    assert lats[0] > lats[-1]  # north first
+    assert north - half <= lats[0] <= north + half and south - half <= lats[-1] <= south + half
+    assert west - half <= lons[0] <= west + half and east - half <= lons[-1] <= east + half
+    # the window's cells are the source cells at those centres
+    source = decoded_source(path)[1, 1]
+    r = np.rint((lats - LAT_RANGE[0]) / RESOLUTION_DEG).astype(int)
+    c = np.rint((lons - LON_RANGE[0]) / RESOLUTION_DEG).astype(int)
+    values = np.array([np.nan if v is None else v for v in grid['values']]).reshape(rows, cols)
+    np.testing.assert_allclose(values, source[np.ix_(r, c)], atol=1e-5, equal_nan=True)
+
+
+def test_grid_null_where_no_data(synthetic):
+    _, dataset, _ = synthetic
+    grid = dataset.grid('so')
+    level = np.asarray(dataset.levels('so')[grid['level']])[0, 0][::-1]
+    assert grid['shape'] == list(level.shape)
+    assert [v is None for v in grid['values']] == list(np.isnan(level).ravel())
+
+
+@pytest.mark.parametrize("max_cells", [50, 100, OVERVIEW_MIN])
+def test_grid_respects_max_cells(synthetic, max_cells):
+    _, dataset, _ = synthetic
+    grid = dataset.grid('so', max_cells=max_cells)
+    assert max(grid['shape']) <= max_cells
+    coarsest = np.asarray(dataset.levels('so')[-1], dtype=float)[0, 0]
+    if max(coarsest.shape) > max_cells:
+        # every stride-th cell of the coarsest level, spaced stride cells apart
+        stride = grid['stride']
+        assert stride > 1
+        expected = np.round(coarsest[::stride, ::stride][::-1], 3)
+        values = np.array([np.nan if v is None else v for v in grid['values']]).reshape(grid['shape'])
+        np.testing.assert_allclose(values, expected, equal_nan=True)
+        assert grid['lon']['step'] == pytest.approx(RESOLUTION_DEG * 2 ** grid['level'] * stride, rel=1e-3)
+
+
+def test_tile_png(synthetic):
+    _, dataset, _ = synthetic
+    z, x, y = 2, 1, 1  # lon -90..0, lat 0..66.5, the south-west of the dataset
+    pixels = decode_png(dataset.tile('so', 0, 0, z, x, y))
+    assert pixels.shape == (256, 256, 4)
+    lons, lats = web_mercator_tile_centres(z, x, y)
+    inside = ((lats > LAT_RANGE[0] + 0.2) & (lats < LAT_RANGE[1] - 0.2))[:, None] & ((lons > LON_RANGE[0] + 0.2) & (lons < LON_RANGE[1] - 0.2))[None, :]
+    outside = ((lats < LAT_RANGE[0] - 0.2) | (lats > LAT_RANGE[1] + 0.2))[:, None] | ((lons < LON_RANGE[0] - 0.2) | (lons > LON_RANGE[1] + 0.2))[None, :]
+    alpha = pixels[..., 3]
+    assert (alpha[outside] == 0).all()
+    # sea inside the dataset is opaque and coloured, its land disks (fill values) transparent
+    assert (alpha[inside] == 255).mean() > 0.5 and (alpha[inside] == 0).any()
+    assert len(np.unique(pixels[inside & (alpha == 255)][:, :3], axis=0)) > 10
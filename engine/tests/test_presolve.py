@@ -0,0 +1,108 @@
+import glob
+import json
+import os
+import numpy as np
+import pytest
+from shapely.geometry import MultiPolygon
+from shape_optimisations import presolve
+from shape_optimisations.areas import as_feature_collection, parse_polygons
+from shape_optimisations.coverage import compute_coverage
+from shape_optimisations.grid import get_grid_points_in_polygon_km
+from shape_optimisations.presolve import Presolve
+from shape_optimisations.sensors import catalog_configurations
+from shape_optimisations.solvers import solve_max_coverage, solve_placement
+
+"""
+Presolve keeps the optimum: the bundled areas solved with presolve on and off reach the same objective,
+and the placement found on the presolved model is feasible for the original one
+"""
+
+AREAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "geojson", "areas")
+AREA_FILES = sorted(glob.glob(os.path.join(AREAS_DIR, "*.geojson")))
+AREA_IDS = [os.path.splitext(os.path.basename(path))[0] for path in AREA_FILES]
+RESOLUTION_KM = 60
+DEMAND_RESOLUTION_KM = 25  # finer than the candidate sites, so demand rows merge
+MAX_SENSORS = 99
+COVERAGE_REQUIREMENT = 0.9
+
+
+@pytest.fixture(scope="module", params=AREA_FILES, ids=AREA_IDS)
+def problem(request):
+    """ (coverage, column costs) of a bundled area, long range sensors costing more than wide angle ones """
+    with open(request.param) as f:
+        parts, _ = parse_polygons(as_feature_collection(json.load(f)))
+    area = MultiPolygon(list(parts))
+    lons, lats = get_grid_points_in_polygon_km(area, RESOLUTION_KM)
+    demand_lons, demand_lats = get_grid_points_in_polygon_km(area, DEMAND_RESOLUTION_KM)
+    configurations = catalog_configurations()
+    coverage = compute_coverage(lons, lats, configurations, demand_lons, demand_lats)
+    costs = np.tile([1.5 if c['sensor_type'] == 'long_range' else 1.0 for c in configurations], len(lons))
+    return coverage, costs
+
+
+def assert_feasible(coverage, solution, max_sensors, coverage_requirement):
+    placed = solution['placed']
+    assert placed.sum() <= max_sensors
+    assert np.bincount(coverage.column_location[placed], minlength=coverage.num_locations).max(initial=0) <= 1
+    covered = coverage.cover_counts(placed) > 0
+    np.testing.assert_array_equal(solution['covered'], covered)
+    assert covered.mean() >= coverage_requirement - 1e-9
+
+
+def assert_rows_identical(coverage, reduced):
+    """ the original rows merged into each presolved row have the same kept columns """
+    kept = np.zeros(coverage.num_columns, dtype=bool)
+    kept[reduced.columns] = True
+    sets = [frozenset() for _ in range(coverage.num_demand)]
+    entries = kept[coverage.cols]
+    for row, col in zip(coverage.rows[entries], coverage.cols[entries]):
+        sets[row] = sets[row] | {int(col)}
+    first = {}
+    for row, merged in enumerate(reduced.row_map):
+        assert sets[first.setdefault(merged, row)] == sets[row]
+    assert len(first) == reduced.coverage.num_demand
+
+
+@pytest.mark.parametrize("solver", ["highs", "pulp"])
+def test_presolve_keeps_min_cost_optimum(problem, solver):
+    coverage, costs = problem
+    solutions = [solve_placement(coverage, MAX_SENSORS, COVERAGE_REQUIREMENT, solver=solver, column_costs=costs, presolve=on) for on in (True, False)]
+    for solution in solutions:
+        assert solution['status'] == 'Optimal'
+        assert_feasible(coverage, solution, MAX_SENSORS, COVERAGE_REQUIREMENT)
+    with_presolve, without = (costs[solution['placed']].sum() for solution in solutions)
+    assert with_presolve == pytest.approx(without)
+    assert solutions[0]['presolve']['columns'][1] <= solutions[0]['presolve']['columns'][0]
+
+
+def test_presolve_keeps_max_coverage_optimum(problem):
+    coverage, _ = problem
+    solutions = [solve_max_coverage(coverage, 3, solver='highs', presolve=on) for on in (True, False)]
+    for solution in solutions:
+        assert solution['status'] == 'Optimal'
+        assert_feasible(coverage, solution, 3, 0.0)
+    assert solutions[0]['covered'].sum() == solutions[1]['covered'].sum()
+
+
+def test_merged_rows_are_identical(problem):
+    coverage, costs = problem
+    reduced = Presolve(coverage, costs)
+    assert reduced.coverage.num_demand < coverage.num_demand
+    assert_rows_identical(coverage, reduced)
+    assert reduced.weights.sum() == coverage.num_demand
+
+
+def test_hash_collisions_do_not_merge_rows(problem, monkeypatch):
+    coverage, costs = problem
+    # every row set of the same size hashes alike, so only the set comparison keeps them apart
+    def colliding_signatures(rows, cols, num_rows, num_columns):
+        signatures = np.zeros((num_rows, 3), dtype=np.uint64)
+        signatures[:, 2] = np.bincount(rows, minlength=num_rows)
+        return signatures
+    expected = Presolve(coverage, costs)
+    monkeypatch.setattr(presolve, "_row_signatures", colliding_signatures)
+    reduced = Presolve(coverage, costs)
+    assert_rows_identical(coverage, reduced)
+    assert reduced.coverage.num_demand == expected.coverage.num_demand
+    solution = solve_placement(coverage, MAX_SENSORS, COVERAGE_REQUIREMENT, solver='highs', column_costs=costs)
+    assert_feasible(coverage, solution, MAX_SENSORS, COVERAGE_REQUIREMENT)
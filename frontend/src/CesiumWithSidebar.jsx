@@ -45,6 +45,8 @@ export default function CesiumWithSidebar() {
 
     // Optimisation
     const sandBoxResultsRef = useRef(null);
+    // optimisation session on the engine, resubmitted edits are re-optimised incrementally
+    const optimiseSessionRef = useRef(null);
     const [showSensorLocations, setShowSensorLocations] = useState(false);
 
     useEffect(() => {
@@ -156,12 +158,25 @@ export default function CesiumWithSidebar() {
         console.log("features: ", features)
 
         try {
-            const response = await fetch("http://localhost:8000/optimise-polygon-coverage", {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify(featureCollection),
-            });
+            const sessionsUrl = "http://localhost:8000/optimise-polygon-coverage/sessions";
+            let response = null;
+            if (optimiseSessionRef.current) {
+                response = await fetch(`${sessionsUrl}/${optimiseSessionRef.current}`, {
+                    method: "PUT",
+                    headers: { "Content-Type": "application/json" },
+                    body: JSON.stringify(featureCollection),
+                });
+            }
+            // no session yet, or it expired on the engine
+            if (!response || response.status === 404) {
+                response = await fetch(sessionsUrl, {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body: JSON.stringify(featureCollection),
+                });
+            }
             const geojsonResponse = await response.json();
+            optimiseSessionRef.current = geojsonResponse.sessionId;
             console.log("Backend result:", geojsonResponse);
 
             // uncomment for fast API testing